@@ -22,7 +22,12 @@ from bookmarks.models import (
     Toast,
     UserProfile,
 )
-from bookmarks.services.bookmarks import archive_bookmark, unarchive_bookmark
+from bookmarks.services.bookmarks import (
+    archive_bookmark,
+    delete_bookmark,
+    unarchive_bookmark,
+)
+from bookmarks.services.tags import get_tag_ids_for_bookmarks, update_tag_counts
 
 
 # Custom paginator to paginate through Huey tasks
@@ -142,10 +147,21 @@ class AdminBookmark(admin.ModelAdmin):
         del actions["delete_selected"]
         return actions
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Update the counts of removed tags, and of current tags, which might
+        # have been added, or whose bookmark was archived or shared
+        previous_tag_ids = {tag.id for tag in form.initial.get("tags", [])}
+        current_tag_ids = get_tag_ids_for_bookmarks([form.instance.id])
+        update_tag_counts(previous_tag_ids.union(current_tag_ids))
+
+    def delete_model(self, request, obj):
+        delete_bookmark(obj)
+
     def delete_selected_bookmarks(self, request, queryset: QuerySet):
         bookmarks_count = queryset.count()
         for bookmark in queryset:
-            bookmark.delete()
+            delete_bookmark(bookmark)
         self.message_user(
             request,
             ngettext(
@@ -0,0 +1,69 @@
+from collections import OrderedDict
+
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from bookmarks import queries
+from bookmarks.models import BookmarkSearch
+from bookmarks.pagination import KeysetPaginator
+
+
+class BookmarkPagination(LimitOffsetPagination):
+    """
+    Extends limit/offset pagination with an opt-in cursor pagination mode,
+    which is enabled with the `pagination=cursor` query parameter. In cursor
+    mode, the next and previous links contain an opaque cursor that encodes
+    the sort values of the last or first bookmark of the page. Fetching the
+    next page then costs the same, regardless of how deep into the results it
+    is. Cursor mode does not return a count, as that would require running
+    the full query for every page.
+
+    Cursor mode supports all sorts except relevance, for which it falls back
+    to limit/offset pagination.
+    """
+
+    mode_query_param = "pagination"
+    cursor_query_param = "cursor"
+    cursor_page = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = None
+        if request.query_params.get(self.mode_query_param) == "cursor":
+            search = BookmarkSearch.from_request(request, request.query_params)
+            ordering = queries.get_keyset_ordering(search)
+
+        if not ordering:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        paginator = KeysetPaginator(queryset, ordering, self.limit)
+        self.cursor_page = paginator.get_page(
+            request.query_params.get(self.cursor_query_param)
+        )
+        return list(self.cursor_page)
+
+    def get_paginated_response(self, data):
+        if self.cursor_page is None:
+            return super().get_paginated_response(data)
+
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self._get_cursor_link(self.cursor_page.next_cursor)),
+                    (
+                        "previous",
+                        self._get_cursor_link(self.cursor_page.previous_cursor),
+                    ),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def _get_cursor_link(self, cursor: str | None):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.offset_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
@@ -1,9 +1,9 @@
-import gzip
 import logging
 import os
 
 from django.conf import settings
 from django.http import Http404, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny
@@ -11,6 +11,7 @@ from rest_framework.response import Response
 from rest_framework.routers import DefaultRouter, SimpleRouter
 
 from bookmarks import queries
+from bookmarks.api.pagination import BookmarkPagination
 from bookmarks.api.serializers import (
     BookmarkAssetSerializer,
     BookmarkBundleSerializer,
@@ -26,12 +27,22 @@ from bookmarks.models import (
     Tag,
     User,
 )
-from bookmarks.services import assets, auto_tagging, bookmarks, bundles, website_loader
+from bookmarks.services import (
+    asset_codecs,
+    assets,
+    auto_tagging,
+    bookmarks,
+    bundles,
+    website_loader,
+)
 from bookmarks.type_defs import HttpRequest
+from bookmarks.utils import accepts_gzip
 from bookmarks.views import access
 
 logger = logging.getLogger(__name__)
 
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
 
 class BookmarkViewSet(
     viewsets.GenericViewSet,
@@ -43,6 +54,7 @@ class BookmarkViewSet(
 ):
     request: HttpRequest
     serializer_class = BookmarkSerializer
+    pagination_class = BookmarkPagination
 
     def get_permissions(self):
         # Allow unauthenticated access to shared bookmarks.
@@ -83,6 +95,9 @@ class BookmarkViewSet(
             "disable_html_snapshot": disable_html_snapshot,
         }
 
+    def perform_destroy(self, instance):
+        bookmarks.delete_bookmark(instance)
+
     @action(methods=["get"], detail=False)
     def archived(self, request: HttpRequest):
         return self.list(request)
@@ -194,15 +209,23 @@ class BookmarkAssetViewSet(
         try:
             file_path = os.path.join(settings.LD_ASSET_FOLDER, asset.file)
             content_type = asset.content_type
+            # Send gzipped files as stored to clients that accept gzip
+            gzip_passthrough = asset.gzip and accepts_gzip(request)
             file_stream = (
-                gzip.GzipFile(file_path, mode="rb")
-                if asset.gzip
-                else open(file_path, "rb")  # noqa: SIM115
+                open(file_path, "rb")  # noqa: SIM115
+                if gzip_passthrough
+                else asset_codecs.open_asset_file(asset, file_path)
+            )
+            response = StreamingHttpResponse(
+                _read_chunks(file_stream), content_type=content_type
             )
-            response = StreamingHttpResponse(file_stream, content_type=content_type)
             response["Content-Disposition"] = (
                 f'attachment; filename="{asset.download_name}"'
             )
+            if asset.gzip:
+                patch_vary_headers(response, ["Accept-Encoding"])
+            if gzip_passthrough:
+                response["Content-Encoding"] = "gzip"
             return response
         except FileNotFoundError:
             raise Http404("Asset file does not exist") from None
@@ -295,6 +318,16 @@ class BookmarkBundleViewSet(
 # DRF routers do not support nested view sets such as /bookmarks/<id>/assets/<id>/
 # Instead create separate routers for each view set and manually register them in urls.py
 # The default router is only used to allow reversing a URL for the API root
+def _read_chunks(file):
+    # Read fixed-size chunks, as readers of some codecs can't be iterated, and
+    # close the file once the response has been sent
+    try:
+        while chunk := file.read(DOWNLOAD_CHUNK_SIZE):
+            yield chunk
+    finally:
+        file.close()
+
+
 default_router = DefaultRouter()
 
 bookmark_router = SimpleRouter()
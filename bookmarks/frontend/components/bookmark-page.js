@@ -102,7 +102,8 @@ class BookmarkPage extends HeadlessElement {
 
     // Update total number of bookmarks
     const totalHolder = this.querySelector("[data-bookmarks-total]");
-    const total = totalHolder?.dataset.bookmarksTotal || 0;
+    // The total is not available if keyset pagination skips counting
+    const total = totalHolder?.dataset.bookmarksTotal ?? "";
     const totalSpan = this.selectAcross.querySelector("span.total");
     totalSpan.textContent = total;
   }
@@ -0,0 +1,87 @@
+import os
+import time
+
+from bs4 import BeautifulSoup
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bookmarks.services import asset_codecs
+from bookmarks.services.head_parser import parse_head
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures how long extracting website metadata takes for a corpus of "
+        "saved pages, compared to parsing the pages into a BeautifulSoup tree. "
+        "Uses the HTML snapshots in the asset folder by default."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "paths",
+            nargs="*",
+            help="HTML files, optionally compressed, or folders containing them",
+        )
+        parser.add_argument(
+            "--rounds",
+            type=int,
+            default=5,
+            help="Number of times each page is parsed",
+        )
+
+    def handle(self, *args, **options):
+        files = self._collect_files(options["paths"] or [settings.LD_ASSET_FOLDER])
+        if not files:
+            raise CommandError("No HTML files found")
+
+        pages = [self._read_head(file) for file in files]
+        rounds = options["rounds"]
+        head_parser_duration = self._measure(parse_head, pages, rounds)
+        soup_duration = self._measure(
+            lambda page: BeautifulSoup(page, "html.parser"), pages, rounds
+        )
+
+        self.stdout.write(f"pages: {len(pages)}, rounds: {rounds}")
+        for name, duration in [
+            ("head parser", head_parser_duration),
+            ("beautifulsoup", soup_duration),
+        ]:
+            per_page = duration / (len(pages) * rounds) * 1000
+            self.stdout.write(f"{name}: {duration:.3f}s total, {per_page:.3f}ms/page")
+
+    def _collect_files(self, paths):
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                for entry in sorted(os.scandir(path), key=lambda entry: entry.name):
+                    if entry.is_file() and self._is_html_file(entry.name):
+                        files.append(entry.path)
+            elif os.path.isfile(path):
+                files.append(path)
+            else:
+                raise CommandError(f"Path '{path}' does not exist")
+        return files
+
+    def _is_html_file(self, name: str):
+        codec = asset_codecs.get_file_codec(name)
+        if codec:
+            name = name.removesuffix(f".{codec.extension}")
+        return name.endswith((".html", ".htm"))
+
+    def _read_head(self, file: str) -> str:
+        codec = asset_codecs.get_file_codec(file)
+        with codec.open_reader(file) if codec else open(file, "rb") as f:
+            content = f.read()
+        # Parse the same part of the document that is loaded for websites
+        end_of_head = b"</head>"
+        index = content.find(end_of_head)
+        if index >= 0:
+            content = content[: index + len(end_of_head)]
+        return content.decode("utf-8", errors="replace")
+
+    def _measure(self, parse, pages, rounds):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for page in pages:
+                parse(page)
+        return time.perf_counter() - start
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from bookmarks.services import metadata_cache
+
+
+class Command(BaseCommand):
+    help = "Shows hit and miss statistics of the website metadata cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Reset the statistics after showing them",
+        )
+
+    def handle(self, *args, **options):
+        stats = metadata_cache.get_stats()
+        lookups = sum(stats.values())
+        hits = stats[metadata_cache.STAT_HIT] + stats[metadata_cache.STAT_FAILURE_HIT]
+        hit_rate = hits / lookups * 100 if lookups else 0
+
+        for stat in metadata_cache.STATS:
+            self.stdout.write(f"{stat}: {stats[stat]}")
+        self.stdout.write(f"hit rate: {hit_rate:.1f}%")
+
+        if options.get("reset"):
+            metadata_cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS("Successfully reset statistics"))
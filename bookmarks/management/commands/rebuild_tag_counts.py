@@ -0,0 +1,26 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from bookmarks.services.tags import rebuild_tag_counts
+
+
+class Command(BaseCommand):
+    help = "Recalculates the bookmark counts of tags"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=str,
+            help="Only recalculate the counts for tags of the user with this username",
+        )
+
+    def handle(self, *args, **options):
+        user = None
+        username = options.get("user")
+        if username:
+            user = User.objects.filter(username=username).first()
+            if user is None:
+                raise CommandError(f"User '{username}' does not exist")
+
+        rebuild_tag_counts(user)
+        self.stdout.write(self.style.SUCCESS("Successfully rebuilt tag counts"))
@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from bookmarks.models import BookmarkAsset
+from bookmarks.services import asset_codecs
+from bookmarks.services.assets import recompress_asset
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompresses the files of existing assets with a different codec. "
+        "Assets that are stored without compression are left as is."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--codec",
+            type=str,
+            default=settings.LD_ASSET_CODEC,
+            help="Codec to recompress assets with, defaults to LD_ASSET_CODEC",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            help="Maximum number of assets to recompress",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            codec = asset_codecs.get_codec(options["codec"])
+        except ImproperlyConfigured as error:
+            raise CommandError(str(error)) from error
+
+        assets = (
+            BookmarkAsset.objects.filter(status=BookmarkAsset.STATUS_COMPLETE)
+            .exclude(file="")
+            .exclude(codec=codec.name)
+            .order_by("id")
+        )
+        limit = options.get("limit")
+
+        recompressed = 0
+        failed = 0
+        for asset in assets.iterator():
+            if limit is not None and recompressed + failed >= limit:
+                break
+            current_codec = asset_codecs.get_asset_codec(asset)
+            if current_codec is None or current_codec.name == codec.name:
+                continue
+            try:
+                recompress_asset(asset, codec)
+                recompressed += 1
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f"Failed to recompress asset {asset.id}: {error}")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Recompressed {recompressed} assets with {codec.name}, {failed} failed"
+            )
+        )
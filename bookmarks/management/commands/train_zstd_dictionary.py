@@ -0,0 +1,76 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bookmarks.models import BookmarkAsset
+from bookmarks.services import asset_codecs
+
+
+class Command(BaseCommand):
+    help = (
+        "Trains a zstd dictionary on existing HTML snapshots. New assets that "
+        "are compressed with the zstd codec use the most recently trained "
+        "dictionary."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--samples",
+            type=int,
+            default=500,
+            help="Maximum number of snapshots to train the dictionary on",
+        )
+        parser.add_argument(
+            "--sample-size",
+            type=int,
+            default=131072,
+            help="Maximum number of bytes to use from each snapshot",
+        )
+        parser.add_argument(
+            "--dictionary-size",
+            type=int,
+            default=112640,
+            help="Size of the dictionary in bytes",
+        )
+
+    def handle(self, *args, **options):
+        samples = self._load_samples(options["samples"], options["sample_size"])
+        if not samples:
+            raise CommandError("No HTML snapshots found")
+
+        try:
+            dictionary = asset_codecs.zstandard.train_dictionary(
+                options["dictionary_size"], samples
+            )
+        except asset_codecs.zstandard.ZstdError as error:
+            raise CommandError(f"Failed to train dictionary: {error}") from error
+
+        filepath = asset_codecs.save_dictionary(dictionary)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Trained dictionary {dictionary.dict_id()} on {len(samples)} "
+                f"snapshots: {filepath}"
+            )
+        )
+
+    def _load_samples(self, max_samples: int, sample_size: int) -> list[bytes]:
+        assets = BookmarkAsset.objects.filter(
+            asset_type=BookmarkAsset.TYPE_SNAPSHOT,
+            content_type=BookmarkAsset.CONTENT_TYPE_HTML,
+            status=BookmarkAsset.STATUS_COMPLETE,
+        ).order_by("-date_created")
+
+        samples = []
+        for asset in assets.iterator():
+            if len(samples) >= max_samples:
+                break
+            filepath = os.path.join(settings.LD_ASSET_FOLDER, asset.file)
+            try:
+                with asset_codecs.open_asset_file(asset, filepath) as f:
+                    sample = f.read(sample_size)
+            except OSError:
+                continue
+            if sample:
+                samples.append(sample)
+        return samples
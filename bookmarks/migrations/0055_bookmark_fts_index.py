@@ -0,0 +1,31 @@
+from django.db import migrations
+
+from bookmarks.services import search_index
+
+
+def create_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        search_index.create_fts_index(cursor)
+    search_index.reset_cache()
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        search_index.drop_fts_index(cursor)
+    search_index.reset_cache()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bookmarks", "0054_bookmarkbundle_filter_shared_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+from bookmarks.services import search_index
+
+
+def create_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        search_index.create_search_vector(cursor)
+    search_index.reset_cache()
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        search_index.drop_search_vector(cursor)
+    search_index.reset_cache()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bookmarks", "0055_bookmark_fts_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_vector, drop_search_vector),
+    ]
@@ -0,0 +1,53 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_tag_counts(apps, schema_editor):
+    Tag = apps.get_model("bookmarks", "Tag")
+    Bookmark = apps.get_model("bookmarks", "Bookmark")
+    BookmarkTag = Bookmark.tags.through
+
+    def count_subquery(condition):
+        counts = (
+            BookmarkTag.objects.filter(condition, tag_id=OuterRef("pk"))
+            .values("tag_id")
+            .annotate(count=Count("id"))
+            .values("count")
+        )
+        return Coalesce(Subquery(counts), 0)
+
+    Tag.objects.update(
+        active_count=count_subquery(Q(bookmark__is_archived=False)),
+        archived_count=count_subquery(Q(bookmark__is_archived=True)),
+        shared_count=count_subquery(Q(bookmark__shared=True)),
+    )
+
+
+def reverse_populate_tag_counts(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bookmarks", "0056_bookmark_search_vector"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tag",
+            name="active_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="tag",
+            name="archived_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="tag",
+            name="shared_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_tag_counts, reverse_populate_tag_counts),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bookmarks", "0057_tag_counts"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bookmarkasset",
+            name="codec",
+            field=models.CharField(blank=True, default="", max_length=16),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bookmarks", "0058_bookmarkasset_codec"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="bookmarkasset",
+            name="file",
+            field=models.CharField(blank=True, db_index=True, max_length=2048),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bookmarks", "0059_bookmarkasset_file_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bookmarkasset",
+            name="date_claimed",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
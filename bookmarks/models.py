@@ -22,6 +22,23 @@ class Tag(models.Model):
     name = models.CharField(max_length=64)
     date_added = models.DateTimeField()
     owner = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Denormalized bookmark counts, maintained by services.tags.update_tag_counts
+    active_count = models.PositiveIntegerField(default=0)
+    archived_count = models.PositiveIntegerField(default=0)
+    shared_count = models.PositiveIntegerField(default=0)
+
+    COUNT_FIELDS = ["active_count", "archived_count", "shared_count"]
+
+    def save(self, *args, **kwargs):
+        # Counts are updated with separate queries, so don't overwrite them with
+        # potentially stale values when saving an existing tag
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in Tag.COUNT_FIELDS
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
@@ -139,13 +156,19 @@ class BookmarkAsset(models.Model):
 
     bookmark = models.ForeignKey(Bookmark, on_delete=models.CASCADE)
     date_created = models.DateTimeField(auto_now_add=True, null=False)
-    file = models.CharField(max_length=2048, blank=True, null=False)
+    file = models.CharField(max_length=2048, blank=True, null=False, db_index=True)
     file_size = models.IntegerField(null=True)
     asset_type = models.CharField(max_length=64, blank=False, null=False)
     content_type = models.CharField(max_length=128, blank=False, null=False)
     display_name = models.CharField(max_length=2048, blank=True, null=False)
     status = models.CharField(max_length=64, blank=False, null=False)
     gzip = models.BooleanField(default=False, null=False)
+    # Compression codec of the file, empty for assets that were stored before
+    # codecs were recorded, which use the gzip flag instead
+    codec = models.CharField(max_length=16, blank=True, null=False, default="")
+    # Set while a worker creates the snapshot of a pending asset, so that other
+    # workers and processes don't pick up the same asset
+    date_claimed = models.DateTimeField(null=True, blank=True)
 
     @property
     def download_name(self):
@@ -169,15 +192,34 @@ class BookmarkAsset(models.Model):
         return self.display_name or f"Bookmark Asset #{self.pk}"
 
 
+def delete_unreferenced_asset_file(file: str):
+    # Files can be shared by assets with the same content when deduplication is
+    # enabled, so only delete a file once no asset references it anymore
+    if not file or BookmarkAsset.objects.filter(file=file).exists():
+        return
+    filepath = os.path.join(settings.LD_ASSET_FOLDER, file)
+    if not os.path.isfile(filepath):
+        return
+    # Another process might be storing an asset that reuses the file. Move the
+    # file out of the way before checking the references again, so that the
+    # other process either restores the file, or this process keeps it.
+    deleted_filepath = f"{filepath}.deleted"
+    try:
+        os.replace(filepath, deleted_filepath)
+        if BookmarkAsset.objects.filter(file=file).exists():
+            os.replace(deleted_filepath, filepath)
+        else:
+            os.remove(deleted_filepath)
+    except FileNotFoundError:
+        # Deleted by another process at the same time
+        pass
+    except Exception as error:
+        logger.error(f"Failed to delete asset file: {filepath}", exc_info=error)
+
+
 @receiver(post_delete, sender=BookmarkAsset)
 def bookmark_asset_deleted(sender, instance, **kwargs):
-    if instance.file:
-        filepath = os.path.join(settings.LD_ASSET_FOLDER, instance.file)
-        if os.path.isfile(filepath):
-            try:
-                os.remove(filepath)
-            except Exception as error:
-                logger.error(f"Failed to delete asset file: {filepath}", exc_info=error)
+    delete_unreferenced_asset_file(instance.file)
 
 
 class BookmarkBundle(models.Model):
@@ -228,6 +270,7 @@ class BookmarkSearch:
     SORT_MODIFIED_DESC = "modified_desc"
     SORT_TITLE_ASC = "title_asc"
     SORT_TITLE_DESC = "title_desc"
+    SORT_RELEVANCE = "relevance"
 
     FILTER_SHARED_OFF = "off"
     FILTER_SHARED_SHARED = "yes"
@@ -310,6 +353,19 @@ class BookmarkSearch:
     def has_modified_preferences(self):
         return len(self.modified_preferences) > 0
 
+    @property
+    def has_filters(self):
+        # Whether the search narrows down the bookmarks of a view, ignoring
+        # sort order and the user filter of the shared view
+        return bool(
+            self.q
+            or self.bundle
+            or self.modified_since
+            or self.added_since
+            or self.shared != BookmarkSearch.FILTER_SHARED_OFF
+            or self.unread != BookmarkSearch.FILTER_UNREAD_OFF
+        )
+
     @property
     def query_params(self):
         query_params = {}
@@ -0,0 +1,167 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+
+class KeysetPage:
+    def __init__(
+        self,
+        object_list: list,
+        next_cursor: str | None,
+        previous_cursor: str | None,
+    ):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Paginates a query set by filtering for the sort values of the first or last
+    item of the current page, instead of skipping rows with an offset. That
+    keeps deep pages as fast as the first page, and avoids counting the total
+    number of items, unless requested.
+
+    The ordering must be unique, which can be ensured by using the primary key
+    as the last field. Cursors are opaque strings that encode the sort values
+    and the direction in which to paginate. Cursors that were created for a
+    different ordering are ignored, and return the first page.
+    """
+
+    def __init__(self, query_set: QuerySet, ordering: list[str], per_page: int):
+        # The paginator defines the ordering, so undo any reversed ordering
+        if not query_set.query.standard_ordering:
+            query_set = query_set.reverse()
+        self.query_set = query_set
+        self.ordering = ordering
+        self.per_page = per_page
+
+    @cached_property
+    def count(self) -> int:
+        return self.query_set.count()
+
+    def get_page(self, cursor: str | None) -> KeysetPage:
+        position = self._decode_cursor(cursor)
+        if position is None:
+            return self._get_page_after(None, is_first_page=True)
+
+        values, reverse = position
+        try:
+            if reverse:
+                return self._get_page_before(values)
+            return self._get_page_after(values, is_first_page=False)
+        except ValidationError:
+            # Cursor contains values that are not valid for the sort fields
+            return self._get_page_after(None, is_first_page=True)
+
+    def _get_page_after(self, values: list | None, is_first_page: bool) -> KeysetPage:
+        query_set = self.query_set.order_by(*self.ordering)
+        if values is not None:
+            query_set = query_set.filter(self._build_condition(values, reverse=False))
+
+        items = list(query_set[: self.per_page + 1])
+        has_next = len(items) > self.per_page
+        items = items[: self.per_page]
+
+        next_cursor = (
+            self._encode_cursor(items[-1], reverse=False)
+            if has_next and items
+            else None
+        )
+        previous_cursor = (
+            self._encode_cursor(items[0], reverse=True)
+            if not is_first_page and items
+            else None
+        )
+        # Allow navigating back from an empty page, for example if the items
+        # of the page were deleted in the meantime
+        if not is_first_page and not items:
+            previous_cursor = self._encode_values(values, reverse=True)
+
+        return KeysetPage(items, next_cursor, previous_cursor)
+
+    def _get_page_before(self, values: list) -> KeysetPage:
+        reversed_ordering = [_reverse_field(field) for field in self.ordering]
+        query_set = self.query_set.order_by(*reversed_ordering).filter(
+            self._build_condition(values, reverse=True)
+        )
+
+        items = list(query_set[: self.per_page + 1])
+        has_previous = len(items) > self.per_page
+        items = list(reversed(items[: self.per_page]))
+
+        next_cursor = self._encode_cursor(items[-1], reverse=False) if items else None
+        previous_cursor = (
+            self._encode_cursor(items[0], reverse=True)
+            if has_previous and items
+            else None
+        )
+
+        return KeysetPage(items, next_cursor, previous_cursor)
+
+    def _build_condition(self, values: list, reverse: bool) -> Q:
+        # For an ordering of (a, b, c) this creates the condition
+        # a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            descending = field.startswith("-")
+            if reverse:
+                descending = not descending
+            field_name = field.lstrip("-")
+            lookup = "lt" if descending else "gt"
+
+            term = Q(**{f"{field_name}__{lookup}": values[index]})
+            for previous_index in range(index):
+                previous_field_name = self.ordering[previous_index].lstrip("-")
+                term &= Q(**{previous_field_name: values[previous_index]})
+            condition |= term
+
+        return condition
+
+    def _encode_cursor(self, item, reverse: bool) -> str:
+        values = [getattr(item, field.lstrip("-")) for field in self.ordering]
+        return self._encode_values(values, reverse)
+
+    def _encode_values(self, values: list, reverse: bool) -> str:
+        values = [
+            value.isoformat() if isinstance(value, datetime.datetime) else value
+            for value in values
+        ]
+        payload = {"o": ",".join(self.ordering), "v": values, "r": reverse}
+        json_payload = json.dumps(payload, separators=(",", ":"))
+        return base64.urlsafe_b64encode(json_payload.encode()).decode()
+
+    def _decode_cursor(self, cursor: str | None) -> tuple[list, bool] | None:
+        if not cursor:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if payload["o"] != ",".join(self.ordering):
+                return None
+            values = payload["v"]
+            if len(values) != len(self.ordering):
+                return None
+            return values, bool(payload["r"])
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            return None
+
+
+def _reverse_field(field: str) -> str:
+    return field[1:] if field.startswith("-") else f"-{field}"
@@ -15,6 +15,7 @@ from bookmarks.models import (
     UserProfile,
     parse_tag_string,
 )
+from bookmarks.services import search_index
 from bookmarks.services.search_query_parser import (
     AndExpression,
     NotExpression,
@@ -60,12 +61,7 @@ def query_shared_bookmarks(
 def _convert_ast_to_q_object(ast_node: SearchExpression, profile: UserProfile) -> Q:
     if isinstance(ast_node, TermExpression):
         # Search across title, description, notes, URL
-        conditions = (
-            Q(title__icontains=ast_node.term)
-            | Q(description__icontains=ast_node.term)
-            | Q(notes__icontains=ast_node.term)
-            | Q(url__icontains=ast_node.term)
-        )
+        conditions = search_index.term_condition(ast_node.term)
 
         # In lax mode, also search in tag names
         if profile.tag_search == UserProfile.TAG_SEARCH_LAX:
@@ -146,12 +142,7 @@ def _filter_search_query_legacy(
 
     # Filter for search terms and tags
     for term in query["search_terms"]:
-        conditions = (
-            Q(title__icontains=term)
-            | Q(description__icontains=term)
-            | Q(notes__icontains=term)
-            | Q(url__icontains=term)
-        )
+        conditions = search_index.term_condition(term)
 
         if profile.tag_search == UserProfile.TAG_SEARCH_LAX:
             conditions = conditions | Exists(
@@ -177,13 +168,7 @@ def _filter_bundle(query_set: QuerySet, bundle: BookmarkBundle) -> QuerySet:
     # Search terms
     search_terms = parse_query_string(bundle.search)["search_terms"]
     for term in search_terms:
-        conditions = (
-            Q(title__icontains=term)
-            | Q(description__icontains=term)
-            | Q(notes__icontains=term)
-            | Q(url__icontains=term)
-        )
-        query_set = query_set.filter(conditions)
+        query_set = query_set.filter(search_index.term_condition(term))
 
     # Any tags - at least one tag must match
     any_tags = parse_tag_string(bundle.any_tags, " ")
@@ -296,6 +281,17 @@ def _base_bookmarks_query(
             query_set = query_set.order_by(order_field)
         elif search.sort == BookmarkSearch.SORT_TITLE_DESC:
             query_set = query_set.order_by(order_field).reverse()
+    elif search.sort == BookmarkSearch.SORT_RELEVANCE:
+        # Rank by how well the bookmark matches the search terms, bookmarks
+        # with the same score are sorted by date added. If the query does not
+        # contain any terms, this is the same as the default sort.
+        rank = _search_rank_expression(search.q, profile)
+        if rank is not None:
+            query_set = query_set.annotate(search_rank=rank).order_by(
+                "-search_rank", "-date_added"
+            )
+        else:
+            query_set = query_set.order_by("-date_added")
     elif search.sort == BookmarkSearch.SORT_ADDED_ASC:
         query_set = query_set.order_by("date_added")
     elif search.sort == BookmarkSearch.SORT_MODIFIED_ASC:
@@ -309,9 +305,61 @@ def _base_bookmarks_query(
     return query_set
 
 
+def get_keyset_ordering(search: BookmarkSearch) -> list[str] | None:
+    """
+    Returns a unique ordering for the sort of the bookmark search, which can be
+    used for keyset pagination. Returns None if the sort does not support
+    keyset pagination.
+    """
+    if (
+        search.sort == BookmarkSearch.SORT_TITLE_ASC
+        or search.sort == BookmarkSearch.SORT_TITLE_DESC
+    ):
+        # Comparisons with the ICU collation can not be expressed with lookups
+        if settings.USE_SQLITE and settings.USE_SQLITE_ICU_EXTENSION:
+            return None
+        if search.sort == BookmarkSearch.SORT_TITLE_ASC:
+            return ["effective_title", "id"]
+        return ["-effective_title", "-id"]
+    elif search.sort == BookmarkSearch.SORT_RELEVANCE:
+        return None
+    elif search.sort == BookmarkSearch.SORT_ADDED_ASC:
+        return ["date_added", "id"]
+    elif search.sort == BookmarkSearch.SORT_MODIFIED_ASC:
+        return ["date_modified", "id"]
+    elif search.sort == BookmarkSearch.SORT_MODIFIED_DESC:
+        return ["-date_modified", "-id"]
+    else:
+        return ["-date_added", "-id"]
+
+
+def _search_rank_expression(query_string: str, profile: UserProfile):
+    if profile.legacy_search:
+        # Legacy search combines all terms with AND
+        ast = None
+        for term in parse_query_string(query_string)["search_terms"]:
+            term_expression = TermExpression(term)
+            ast = AndExpression(ast, term_expression) if ast else term_expression
+    else:
+        try:
+            ast = parse_search_query(query_string)
+        except SearchQueryParseError:
+            return None
+
+    if not ast:
+        return None
+
+    return search_index.rank_expression(ast)
+
+
 def query_bookmark_tags(
     user: User, profile: UserProfile, search: BookmarkSearch
 ) -> QuerySet:
+    # Without filters, tags can be determined from the materialized counts,
+    # instead of joining all bookmarks of the user
+    if not search.has_filters:
+        return Tag.objects.filter(owner=user, active_count__gt=0)
+
     bookmarks_query = query_bookmarks(user, profile, search)
 
     query_set = Tag.objects.filter(bookmark__in=bookmarks_query)
@@ -322,6 +370,9 @@ def query_bookmark_tags(
 def query_archived_bookmark_tags(
     user: User, profile: UserProfile, search: BookmarkSearch
 ) -> QuerySet:
+    if not search.has_filters:
+        return Tag.objects.filter(owner=user, archived_count__gt=0)
+
     bookmarks_query = query_archived_bookmarks(user, profile, search)
 
     query_set = Tag.objects.filter(bookmark__in=bookmarks_query)
@@ -335,6 +386,14 @@ def query_shared_bookmark_tags(
     search: BookmarkSearch,
     public_only: bool,
 ) -> QuerySet:
+    if not search.has_filters:
+        conditions = Q(shared_count__gt=0) & Q(owner__profile__enable_sharing=True)
+        if public_only:
+            conditions = conditions & Q(owner__profile__enable_public_sharing=True)
+        if user:
+            conditions = conditions & Q(owner=user)
+        return Tag.objects.filter(conditions)
+
     bookmarks_query = query_shared_bookmarks(user, profile, search, public_only)
 
     query_set = Tag.objects.filter(bookmark__in=bookmarks_query)
@@ -0,0 +1,144 @@
+import gzip
+import os
+
+import zstandard
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+# Codecs for compressing asset files. Each asset records the codec it was
+# stored with, so that changing the codec only applies to new assets, and
+# existing assets can be recompressed in the background.
+#
+# The zstd codec can use a dictionary that is trained on existing HTML
+# snapshots, which considerably improves compression of pages that share a lot
+# of markup, scripts and styles. Dictionaries are stored by their ID, which zstd
+# also writes into each compressed file, so that files compressed with an older
+# dictionary can still be read after training a new one.
+
+GZIP = "gzip"
+ZSTD = "zstd"
+DICTIONARY_EXTENSION = ".zdict"
+# Maximum size of a zstd frame header, which contains the dictionary ID
+ZSTD_FRAME_HEADER_SIZE_MAX = 18
+
+
+class AssetCodec:
+    name: str
+    extension: str
+
+    def open_reader(self, filepath: str):
+        raise NotImplementedError
+
+    def open_writer(self, filepath: str):
+        raise NotImplementedError
+
+
+class GzipCodec(AssetCodec):
+    name = GZIP
+    extension = "gz"
+
+    def open_reader(self, filepath: str):
+        return gzip.open(filepath, "rb")
+
+    def open_writer(self, filepath: str):
+        return gzip.open(filepath, "wb", compresslevel=9)
+
+
+class ZstdCodec(AssetCodec):
+    name = ZSTD
+    extension = "zst"
+
+    def open_reader(self, filepath: str):
+        file = open(filepath, "rb")  # noqa: SIM115
+        try:
+            header = file.read(ZSTD_FRAME_HEADER_SIZE_MAX)
+            dict_id = zstandard.get_frame_parameters(header).dict_id
+            file.seek(0)
+            decompressor = zstandard.ZstdDecompressor(
+                dict_data=load_dictionary(dict_id) if dict_id else None
+            )
+            return decompressor.stream_reader(file, closefd=True)
+        except Exception:
+            file.close()
+            raise
+
+    def open_writer(self, filepath: str):
+        compressor = zstandard.ZstdCompressor(
+            level=settings.LD_ASSET_ZSTD_LEVEL, dict_data=load_latest_dictionary()
+        )
+        file = open(filepath, "wb")  # noqa: SIM115
+        return compressor.stream_writer(file, closefd=True)
+
+
+def get_codec(name: str) -> AssetCodec:
+    if name == GZIP:
+        return GzipCodec()
+    if name == ZSTD:
+        return ZstdCodec()
+    raise ImproperlyConfigured(f"Unknown asset codec: {name}")
+
+
+def get_default_codec() -> AssetCodec:
+    return get_codec(settings.LD_ASSET_CODEC)
+
+
+def get_asset_codec(asset) -> AssetCodec | None:
+    """Returns the codec of the asset file, or None if it is not compressed."""
+    if asset.codec:
+        return get_codec(asset.codec)
+    # Assets from before codecs were recorded are either gzipped or stored as is
+    if asset.gzip:
+        return GzipCodec()
+    return None
+
+
+def get_file_codec(filepath: str) -> AssetCodec | None:
+    """Returns the codec matching the file extension, or None if there is none."""
+    for codec_class in [GzipCodec, ZstdCodec]:
+        if filepath.endswith(f".{codec_class.extension}"):
+            return get_codec(codec_class.name)
+    return None
+
+
+def open_asset_file(asset, filepath: str):
+    codec = get_asset_codec(asset)
+    return codec.open_reader(filepath) if codec else open(filepath, "rb")
+
+
+def load_dictionary(dict_id: int):
+    filepath = _get_dictionary_path(dict_id)
+    if not os.path.exists(filepath):
+        raise FileNotFoundError(f"zstd dictionary {dict_id} does not exist")
+    with open(filepath, "rb") as f:
+        return zstandard.ZstdCompressionDict(f.read())
+
+
+def load_latest_dictionary():
+    folder = settings.LD_ASSET_ZSTD_DICTIONARY_FOLDER
+    if not os.path.isdir(folder):
+        return None
+
+    entries = [
+        entry
+        for entry in os.scandir(folder)
+        if entry.is_file() and entry.name.endswith(DICTIONARY_EXTENSION)
+    ]
+    if not entries:
+        return None
+    latest = max(entries, key=lambda entry: entry.stat().st_mtime_ns)
+    with open(latest.path, "rb") as f:
+        return zstandard.ZstdCompressionDict(f.read())
+
+
+def save_dictionary(dictionary) -> str:
+    os.makedirs(settings.LD_ASSET_ZSTD_DICTIONARY_FOLDER, exist_ok=True)
+    filepath = _get_dictionary_path(dictionary.dict_id())
+    with open(filepath, "wb") as f:
+        f.write(dictionary.as_bytes())
+    return filepath
+
+
+def _get_dictionary_path(dict_id: int) -> str:
+    return os.path.join(
+        settings.LD_ASSET_ZSTD_DICTIONARY_FOLDER, f"{dict_id}{DICTIONARY_EXTENSION}"
+    )
@@ -1,15 +1,16 @@
-import gzip
+import contextlib
+import hashlib
 import logging
 import os
 import shutil
 
-import requests
 from django.conf import settings
 from django.core.files.uploadedfile import UploadedFile
 from django.utils import formats, timezone
 
-from bookmarks.models import Bookmark, BookmarkAsset
-from bookmarks.services import singlefile
+from bookmarks.models import Bookmark, BookmarkAsset, delete_unreferenced_asset_file
+from bookmarks.services import asset_codecs, http_client, metadata_cache, singlefile
+from bookmarks.services.fetch_scheduler import FetchRateLimited
 from bookmarks.services.website_loader import (
     detect_content_type,
     fake_request_headers,
@@ -37,48 +38,57 @@ def create_snapshot_asset(bookmark: Bookmark) -> BookmarkAsset:
     return asset
 
 
-def create_snapshot(asset: BookmarkAsset):
+def create_snapshot(asset: BookmarkAsset, home_dir: str | None = None):
     try:
         url = asset.bookmark.url
-        content_type = detect_content_type(url)
+        content_type = _get_content_type(url)
 
         if is_pdf_content_type(content_type):
             _create_pdf_snapshot(asset)
         else:
-            _create_html_snapshot(asset)
+            _create_html_snapshot(asset, home_dir)
+    except FetchRateLimited:
+        # Keep the asset pending, so that it is picked up again later
+        raise
     except Exception as error:
         asset.status = BookmarkAsset.STATUS_FAILURE
         asset.save()
         raise error
 
 
-def _create_html_snapshot(asset: BookmarkAsset):
-    # Create snapshot into temporary file
-    temp_filename = _generate_asset_filename(asset, asset.bookmark.url, "tmp")
-    temp_filepath = os.path.join(settings.LD_ASSET_FOLDER, temp_filename)
-    singlefile.create_snapshot(asset.bookmark.url, temp_filepath)
-
-    # Store as gzip in asset folder
-    filename = _generate_asset_filename(asset, asset.bookmark.url, "html.gz")
-    filepath = os.path.join(settings.LD_ASSET_FOLDER, filename)
-    with (
-        open(temp_filepath, "rb") as temp_file,
-        gzip.open(filepath, "wb") as gz_file,
-    ):
-        shutil.copyfileobj(temp_file, gz_file)
-
-    # Remove temporary file
-    os.remove(temp_filepath)
-
-    # Update display name for HTML
-    timestamp = formats.date_format(asset.date_created, "SHORT_DATE_FORMAT")
-
-    asset.status = BookmarkAsset.STATUS_COMPLETE
-    asset.content_type = BookmarkAsset.CONTENT_TYPE_HTML
-    asset.display_name = f"HTML snapshot from {timestamp}"
-    asset.file = filename
-    asset.gzip = True
-    asset.save()
+def _get_content_type(url: str) -> str | None:
+    # Use the content type that was recorded when loading the website metadata,
+    # which is usually cached from creating the bookmark, instead of
+    # requesting the page again. Only look at the cache, loading the metadata
+    # would fetch the whole page, which is more expensive than detecting the
+    # content type.
+    metadata = metadata_cache.get(url)
+    if metadata and metadata != metadata_cache.FAILURE_MARKER and metadata.content_type:
+        return metadata.content_type
+    return detect_content_type(url)
+
+
+def _create_html_snapshot(asset: BookmarkAsset, home_dir: str | None = None):
+    # Compress the snapshot while single-file creates it
+    codec = asset_codecs.get_default_codec()
+    chunks = singlefile.stream_snapshot(asset.bookmark.url, home_dir)
+    with _store_asset_file(
+        asset,
+        asset.bookmark.url,
+        "html",
+        chunks,
+        codec,
+        normalize_head=singlefile.strip_saved_date,
+    ) as filename:
+        # Update display name for HTML
+        timestamp = formats.date_format(asset.date_created, "SHORT_DATE_FORMAT")
+
+        asset.status = BookmarkAsset.STATUS_COMPLETE
+        asset.content_type = BookmarkAsset.CONTENT_TYPE_HTML
+        asset.display_name = f"HTML snapshot from {timestamp}"
+        asset.file = filename
+        set_asset_codec(asset, codec)
+        asset.save()
 
     asset.bookmark.latest_snapshot = asset
     asset.bookmark.date_modified = timezone.now()
@@ -89,14 +99,12 @@ def _create_pdf_snapshot(asset: BookmarkAsset):
     url = asset.bookmark.url
     max_size = settings.LD_SNAPSHOT_PDF_MAX_SIZE
 
-    # Download PDF to temporary file
-    temp_filename = _generate_asset_filename(asset, url, "tmp")
-    temp_filepath = os.path.join(settings.LD_ASSET_FOLDER, temp_filename)
-
     headers = fake_request_headers()
     timeout = 60
 
-    with requests.get(url, headers=headers, stream=True, timeout=timeout) as response:
+    with http_client.get(
+        url, headers=headers, stream=True, timeout=timeout
+    ) as response:
         response.raise_for_status()
 
         # Check Content-Length header if available
@@ -106,59 +114,55 @@ def _create_pdf_snapshot(asset: BookmarkAsset):
                 f"PDF size ({content_length} bytes) exceeds limit ({max_size} bytes)"
             )
 
-        # Download in chunks, tracking size
-        downloaded_size = 0
-        with open(temp_filepath, "wb") as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                downloaded_size += len(chunk)
-                if downloaded_size > max_size:
-                    raise PdfTooLargeError(f"PDF size exceeds limit ({max_size} bytes)")
-                f.write(chunk)
-
-    # Store as gzip in asset folder
-    filename = _generate_asset_filename(asset, url, "pdf.gz")
-    filepath = os.path.join(settings.LD_ASSET_FOLDER, filename)
-    with (
-        open(temp_filepath, "rb") as temp_file,
-        gzip.open(filepath, "wb") as gz_file,
-    ):
-        shutil.copyfileobj(temp_file, gz_file)
-
-    # Remove temporary file
-    os.remove(temp_filepath)
+        # Compress the PDF while downloading it
+        codec = asset_codecs.get_default_codec()
+        chunks = _iter_pdf_chunks(response, max_size)
+        with _store_asset_file(asset, url, "pdf", chunks, codec) as filename:
+            # Update display name for PDF
+            timestamp = formats.date_format(asset.date_created, "SHORT_DATE_FORMAT")
 
-    # Update display name for PDF
-    timestamp = formats.date_format(asset.date_created, "SHORT_DATE_FORMAT")
-
-    asset.status = BookmarkAsset.STATUS_COMPLETE
-    asset.content_type = BookmarkAsset.CONTENT_TYPE_PDF
-    asset.display_name = f"PDF download from {timestamp}"
-    asset.file = filename
-    asset.gzip = True
-    asset.save()
+            asset.status = BookmarkAsset.STATUS_COMPLETE
+            asset.content_type = BookmarkAsset.CONTENT_TYPE_PDF
+            asset.display_name = f"PDF download from {timestamp}"
+            asset.file = filename
+            set_asset_codec(asset, codec)
+            asset.save()
 
     asset.bookmark.latest_snapshot = asset
     asset.bookmark.date_modified = timezone.now()
     asset.bookmark.save()
 
 
-def upload_snapshot(bookmark: Bookmark, html: bytes):
-    asset = create_snapshot_asset(bookmark)
-    filename = _generate_asset_filename(asset, asset.bookmark.url, "html.gz")
-    filepath = os.path.join(settings.LD_ASSET_FOLDER, filename)
+def _iter_pdf_chunks(response, max_size: int):
+    # Download in chunks, tracking size
+    downloaded_size = 0
+    for chunk in response.iter_content(chunk_size=8192):
+        downloaded_size += len(chunk)
+        if downloaded_size > max_size:
+            raise PdfTooLargeError(f"PDF size exceeds limit ({max_size} bytes)")
+        yield chunk
 
-    with gzip.open(filepath, "wb") as gz_file:
-        gz_file.write(html)
 
-    # Only save the asset if the file was written successfully
-    timestamp = formats.date_format(asset.date_created, "SHORT_DATE_FORMAT")
-
-    asset.status = BookmarkAsset.STATUS_COMPLETE
-    asset.content_type = BookmarkAsset.CONTENT_TYPE_HTML
-    asset.display_name = f"HTML snapshot from {timestamp}"
-    asset.file = filename
-    asset.gzip = True
-    asset.save()
+def upload_snapshot(bookmark: Bookmark, html: bytes):
+    asset = create_snapshot_asset(bookmark)
+    codec = asset_codecs.get_default_codec()
+    with _store_asset_file(
+        asset,
+        asset.bookmark.url,
+        "html",
+        [html],
+        codec,
+        normalize_head=singlefile.strip_saved_date,
+    ) as filename:
+        # Only save the asset if the file was written successfully
+        timestamp = formats.date_format(asset.date_created, "SHORT_DATE_FORMAT")
+
+        asset.status = BookmarkAsset.STATUS_COMPLETE
+        asset.content_type = BookmarkAsset.CONTENT_TYPE_HTML
+        asset.display_name = f"HTML snapshot from {timestamp}"
+        asset.file = filename
+        set_asset_codec(asset, codec)
+        asset.save()
 
     asset.bookmark.latest_snapshot = asset
     asset.bookmark.date_modified = timezone.now()
@@ -180,28 +184,22 @@ def upload_asset(bookmark: Bookmark, upload_file: UploadedFile):
         )
         name, extension = os.path.splitext(upload_file.name)
 
-        # automatically gzip the file if it is not already gzipped
+        # automatically compress the file if it is not already gzipped
+        codec = None
         if upload_file.content_type != "application/gzip":
-            filename = _generate_asset_filename(
-                asset, name, extension.lstrip(".") + ".gz"
-            )
-            filepath = os.path.join(settings.LD_ASSET_FOLDER, filename)
-            with gzip.open(filepath, "wb", compresslevel=9) as f:
-                for chunk in upload_file.chunks():
-                    f.write(chunk)
-            asset.gzip = True
-            asset.file = filename
-            asset.file_size = os.path.getsize(filepath)
-        else:
-            filename = _generate_asset_filename(asset, name, extension.lstrip("."))
-            filepath = os.path.join(settings.LD_ASSET_FOLDER, filename)
-            with open(filepath, "wb") as f:
-                for chunk in upload_file.chunks():
-                    f.write(chunk)
-            asset.file = filename
-            asset.file_size = upload_file.size
+            codec = asset_codecs.get_default_codec()
+            set_asset_codec(asset, codec)
 
-        asset.save()
+        with _store_asset_file(
+            asset, name, extension.lstrip("."), upload_file.chunks(), codec
+        ) as filename:
+            asset.file = filename
+            if codec:
+                filepath = os.path.join(settings.LD_ASSET_FOLDER, filename)
+                asset.file_size = os.path.getsize(filepath)
+            else:
+                asset.file_size = upload_file.size
+            asset.save()
 
         asset.bookmark.date_modified = timezone.now()
         asset.bookmark.save()
@@ -218,6 +216,66 @@ def upload_asset(bookmark: Bookmark, upload_file: UploadedFile):
         raise e
 
 
+def set_asset_codec(asset: BookmarkAsset, codec: asset_codecs.AssetCodec):
+    asset.codec = codec.name
+    # Keep the gzip flag for clients and code that only know about gzip
+    asset.gzip = codec.name == asset_codecs.GZIP
+
+
+def recompress_asset(asset: BookmarkAsset, codec: asset_codecs.AssetCodec):
+    """
+    Stores the file of the asset using a different codec. The new file is
+    written completely before the asset is updated and the old file removed,
+    so that the asset stays readable if recompressing fails.
+    """
+    current_codec = asset_codecs.get_asset_codec(asset)
+    current_file = asset.file
+    current_filepath = os.path.join(settings.LD_ASSET_FOLDER, current_file)
+    base_filename = current_file
+    if current_codec and base_filename.endswith(f".{current_codec.extension}"):
+        base_filename = base_filename.removesuffix(f".{current_codec.extension}")
+    filename = f"{base_filename}.{codec.extension}"
+    filepath = os.path.join(settings.LD_ASSET_FOLDER, filename)
+
+    # Content-addressed files are named by the hash of the uncompressed
+    # content, so another asset might already have stored the new file
+    if not (settings.LD_ASSET_DEDUPLICATION and os.path.exists(filepath)):
+        _recompress_file(current_codec, current_filepath, codec, filepath)
+
+    asset.file = filename
+    set_asset_codec(asset, codec)
+    asset.save()
+
+    # A reused file might have been deleted by another process after its last
+    # asset was removed, before this asset referenced it
+    if not os.path.exists(filepath):
+        _recompress_file(current_codec, current_filepath, codec, filepath)
+
+    if current_file != filename:
+        delete_unreferenced_asset_file(current_file)
+
+
+def _recompress_file(
+    current_codec: asset_codecs.AssetCodec | None,
+    current_filepath: str,
+    codec: asset_codecs.AssetCodec,
+    filepath: str,
+):
+    temp_filepath = f"{filepath}.tmp"
+    try:
+        with (
+            current_codec.open_reader(current_filepath)
+            if current_codec
+            else open(current_filepath, "rb") as f,
+            codec.open_writer(temp_filepath) as compressed_file,
+        ):
+            shutil.copyfileobj(f, compressed_file)
+        os.replace(temp_filepath, filepath)
+    finally:
+        if os.path.exists(temp_filepath):
+            os.remove(temp_filepath)
+
+
 def remove_asset(asset: BookmarkAsset):
     # If this asset is the latest_snapshot for a bookmark, try to find the next most recent snapshot
     bookmark = asset.bookmark
@@ -240,6 +298,83 @@ def remove_asset(asset: BookmarkAsset):
     bookmark.save()
 
 
+# Number of bytes at the start of a file that are normalized before hashing
+NORMALIZED_HEAD_SIZE = 64 * 1024
+
+
+@contextlib.contextmanager
+def _store_asset_file(
+    asset: BookmarkAsset,
+    name: str,
+    extension: str,
+    chunks,
+    codec: asset_codecs.AssetCodec | None = None,
+    normalize_head=None,
+):
+    """
+    Writes the content to the asset folder, compressed with the codec if given,
+    and yields the filename. The content is written to a temporary file that
+    is renamed once it is complete, so that a failed or aborted write never
+    leaves a partial asset file. With deduplication enabled, the file is named
+    by the hash of its content, and an existing file with the same content is
+    reused instead of storing another copy. The start of the content can be
+    normalized before hashing, to ignore parts that differ between otherwise
+    identical files.
+
+    The asset must be saved with the filename before the context exits. Until
+    then, a reused file is not referenced by the asset, and might be deleted
+    by another process that removes the last asset using it. In that case the
+    file is restored when the context exits.
+    """
+    if codec:
+        extension = f"{extension}.{codec.extension}"
+    filename = _generate_asset_filename(asset, name, extension)
+    filepath = os.path.join(settings.LD_ASSET_FOLDER, filename)
+
+    temp_filepath = f"{filepath}.tmp"
+    try:
+        content_hash = _write_asset_file(temp_filepath, chunks, codec, normalize_head)
+        if settings.LD_ASSET_DEDUPLICATION:
+            filename = f"{content_hash}.{extension}"
+            filepath = os.path.join(settings.LD_ASSET_FOLDER, filename)
+        if settings.LD_ASSET_DEDUPLICATION and os.path.exists(filepath):
+            logger.info(f"Reusing existing asset file with same content: {filename}")
+        else:
+            os.replace(temp_filepath, filepath)
+
+        yield filename
+
+        if os.path.exists(temp_filepath) and not os.path.exists(filepath):
+            logger.info(f"Restoring asset file that was deleted: {filename}")
+            os.replace(temp_filepath, filepath)
+    finally:
+        if os.path.exists(temp_filepath):
+            os.remove(temp_filepath)
+
+
+def _write_asset_file(
+    filepath: str, chunks, codec: asset_codecs.AssetCodec | None, normalize_head
+) -> str:
+    # Hash the uncompressed content, as compressed files are not reproducible,
+    # for example gzip stores the modification time
+    content_hash = hashlib.sha256()
+    # Collect the start of the content, which is hashed once it is normalized
+    head = bytearray() if normalize_head else None
+    with codec.open_writer(filepath) if codec else open(filepath, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+            if head is None:
+                content_hash.update(chunk)
+                continue
+            head += chunk
+            if len(head) >= NORMALIZED_HEAD_SIZE:
+                content_hash.update(normalize_head(bytes(head)))
+                head = None
+    if head is not None:
+        content_hash.update(normalize_head(bytes(head)))
+    return content_hash.hexdigest()
+
+
 def _generate_asset_filename(
     asset: BookmarkAsset, filename: str, extension: str
 ) -> str:
@@ -4,7 +4,12 @@ from django.utils import timezone
 
 from bookmarks.models import Bookmark, User, parse_tag_string
 from bookmarks.services import auto_tagging, tasks, website_loader
-from bookmarks.services.tags import get_or_create_tags
+from bookmarks.services.tags import (
+    get_or_create_tags,
+    get_tag_ids_for_bookmarks,
+    update_tag_counts,
+    update_tag_counts_for_bookmarks,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -34,8 +39,9 @@ def create_bookmark(
         bookmark.date_modified = timezone.now()
     bookmark.save()
     # Update tag list
-    _update_bookmark_tags(bookmark, tag_string, current_user)
+    changed_tag_ids = _update_bookmark_tags(bookmark, tag_string, current_user)
     bookmark.save()
+    update_tag_counts(changed_tag_ids)
     # Create snapshot on web archive
     tasks.create_web_archive_snapshot(current_user, bookmark, False)
     # Load favicon
@@ -57,10 +63,12 @@ def update_bookmark(bookmark: Bookmark, tag_string, current_user: User):
     original_bookmark = Bookmark.objects.get(id=bookmark.id)
     has_url_changed = original_bookmark.url != bookmark.url
     # Update tag list
-    _update_bookmark_tags(bookmark, tag_string, current_user)
+    changed_tag_ids = _update_bookmark_tags(bookmark, tag_string, current_user)
     # Update dates
     bookmark.date_modified = timezone.now()
     bookmark.save()
+    # Update tag counts after saving, as the shared state might have changed
+    update_tag_counts(changed_tag_ids)
     # Update favicon
     tasks.load_favicon(current_user, bookmark)
     # Update preview image
@@ -88,6 +96,7 @@ def archive_bookmark(bookmark: Bookmark):
     bookmark.is_archived = True
     bookmark.date_modified = timezone.now()
     bookmark.save()
+    update_tag_counts_for_bookmarks([bookmark.id])
     return bookmark
 
 
@@ -97,12 +106,14 @@ def archive_bookmarks(bookmark_ids: [int | str], current_user: User):
     Bookmark.objects.filter(owner=current_user, id__in=sanitized_bookmark_ids).update(
         is_archived=True, date_modified=timezone.now()
     )
+    update_tag_counts_for_bookmarks(sanitized_bookmark_ids)
 
 
 def unarchive_bookmark(bookmark: Bookmark):
     bookmark.is_archived = False
     bookmark.date_modified = timezone.now()
     bookmark.save()
+    update_tag_counts_for_bookmarks([bookmark.id])
     return bookmark
 
 
@@ -112,12 +123,24 @@ def unarchive_bookmarks(bookmark_ids: [int | str], current_user: User):
     Bookmark.objects.filter(owner=current_user, id__in=sanitized_bookmark_ids).update(
         is_archived=False, date_modified=timezone.now()
     )
+    update_tag_counts_for_bookmarks(sanitized_bookmark_ids)
+
+
+def delete_bookmark(bookmark: Bookmark):
+    tag_ids = get_tag_ids_for_bookmarks([bookmark.id])
+    bookmark.delete()
+    update_tag_counts(tag_ids)
 
 
 def delete_bookmarks(bookmark_ids: [int | str], current_user: User):
     sanitized_bookmark_ids = _sanitize_id_list(bookmark_ids)
+    owned_bookmarks = Bookmark.objects.filter(
+        owner=current_user, id__in=sanitized_bookmark_ids
+    )
 
-    Bookmark.objects.filter(owner=current_user, id__in=sanitized_bookmark_ids).delete()
+    tag_ids = get_tag_ids_for_bookmarks(owned_bookmarks.values("id"))
+    owned_bookmarks.delete()
+    update_tag_counts(tag_ids)
 
 
 def tag_bookmarks(bookmark_ids: [int | str], tag_string: str, current_user: User):
@@ -141,6 +164,7 @@ def tag_bookmarks(bookmark_ids: [int | str], tag_string: str, current_user: User
     Bookmark.objects.filter(id__in=owned_bookmark_ids).update(
         date_modified=timezone.now()
     )
+    update_tag_counts([tag.id for tag in tags])
 
 
 def untag_bookmarks(bookmark_ids: [int | str], tag_string: str, current_user: User):
@@ -161,6 +185,7 @@ def untag_bookmarks(bookmark_ids: [int | str], tag_string: str, current_user: Us
     Bookmark.objects.filter(id__in=owned_bookmark_ids).update(
         date_modified=timezone.now()
     )
+    update_tag_counts([tag.id for tag in tags])
 
 
 def mark_bookmarks_as_read(bookmark_ids: [int | str], current_user: User):
@@ -185,6 +210,7 @@ def share_bookmarks(bookmark_ids: [int | str], current_user: User):
     Bookmark.objects.filter(owner=current_user, id__in=sanitized_bookmark_ids).update(
         shared=True, date_modified=timezone.now()
     )
+    update_tag_counts_for_bookmarks(sanitized_bookmark_ids)
 
 
 def unshare_bookmarks(bookmark_ids: [int | str], current_user: User):
@@ -193,6 +219,7 @@ def unshare_bookmarks(bookmark_ids: [int | str], current_user: User):
     Bookmark.objects.filter(owner=current_user, id__in=sanitized_bookmark_ids).update(
         shared=False, date_modified=timezone.now()
     )
+    update_tag_counts_for_bookmarks(sanitized_bookmark_ids)
 
 
 def refresh_bookmarks_metadata(bookmark_ids: [int | str], current_user: User):
@@ -201,9 +228,7 @@ def refresh_bookmarks_metadata(bookmark_ids: [int | str], current_user: User):
         owner=current_user, id__in=sanitized_bookmark_ids
     )
 
-    for bookmark in owned_bookmarks:
-        tasks.refresh_metadata(bookmark)
-        tasks.load_preview_image(current_user, bookmark)
+    tasks.refresh_bookmarks_metadata(current_user, owned_bookmarks)
 
 
 def create_html_snapshots(bookmark_ids: list[int | str], current_user: User):
@@ -223,7 +248,10 @@ def _merge_bookmark_data(from_bookmark: Bookmark, to_bookmark: Bookmark):
     to_bookmark.shared = from_bookmark.shared
 
 
-def _update_bookmark_tags(bookmark: Bookmark, tag_string: str, user: User):
+def _update_bookmark_tags(bookmark: Bookmark, tag_string: str, user: User) -> set[int]:
+    # Returns the IDs of all previous and current tags, whose counts need to be
+    # updated after saving the bookmark
+    previous_tag_ids = set(bookmark.tags.values_list("id", flat=True))
     tag_names = parse_tag_string(tag_string)
 
     if user.profile.auto_tagging_rules:
@@ -243,6 +271,8 @@ def _update_bookmark_tags(bookmark: Bookmark, tag_string: str, user: User):
     tags = get_or_create_tags(tag_names, user)
     bookmark.tags.set(tags)
 
+    return previous_tag_ids | {tag.id for tag in tags}
+
 
 def _sanitize_id_list(bookmark_ids: [int | str]) -> [int]:
     # Convert string ids to int if necessary
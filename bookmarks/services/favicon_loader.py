@@ -2,13 +2,15 @@ import logging
 import mimetypes
 import os.path
 import re
+import threading
 import time
 from pathlib import Path
 from urllib.parse import urlparse
 
-import requests
 from django.conf import settings
 
+from bookmarks.services import http_client
+
 max_file_age = 60 * 60 * 24  # 1 day
 
 logger = logging.getLogger(__name__)
@@ -36,19 +38,78 @@ def _get_url_parameters(url: str) -> dict:
     }
 
 
+def get_favicon_origin(url: str) -> str:
+    # Favicons are stored per origin, all URLs with the same origin share the
+    # same favicon file
+    return _get_url_parameters(url)["url"]
+
+
 def _get_favicon_path(favicon_file: str) -> Path:
     return Path(os.path.join(settings.LD_FAVICON_FOLDER, favicon_file))
 
 
+class _FaviconIndex:
+    """
+    Maps favicon names to the files in the favicon folder, so that looking up
+    an existing favicon doesn't require listing the whole folder. The index
+    is rebuilt when the modification time of the folder changes, which
+    happens when files are added or removed by another process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._folder = None
+        self._folder_mtime = None
+        self._files = {}
+
+    def get(self, favicon_name: str) -> str | None:
+        with self._lock:
+            self._ensure_current()
+            return self._files.get(favicon_name)
+
+    def add(self, favicon_name: str, favicon_file: str):
+        with self._lock:
+            self._ensure_current()
+            self._files[favicon_name] = favicon_file
+            # Adding the file changed the folder, that change is now reflected
+            # in the index
+            self._folder_mtime = os.stat(self._folder).st_mtime_ns
+
+    def remove(self, favicon_name: str):
+        with self._lock:
+            self._files.pop(favicon_name, None)
+
+    def _ensure_current(self):
+        folder = settings.LD_FAVICON_FOLDER
+        folder_mtime = os.stat(folder).st_mtime_ns
+        if folder == self._folder and folder_mtime == self._folder_mtime:
+            return
+
+        files = {}
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                file_base_name, _ = os.path.splitext(entry.name)
+                files[file_base_name] = entry.name
+        self._folder = folder
+        self._folder_mtime = folder_mtime
+        self._files = files
+
+
+_favicon_index = _FaviconIndex()
+
+
 def _check_existing_favicon(favicon_name: str):
     # return existing file if a file with the same name, ignoring extension,
     # exists and is not stale
-    for filename in os.listdir(settings.LD_FAVICON_FOLDER):
-        file_base_name, _ = os.path.splitext(filename)
-        if file_base_name == favicon_name:
-            favicon_path = _get_favicon_path(filename)
-            return filename if not _is_stale(favicon_path) else None
-    return None
+    filename = _favicon_index.get(favicon_name)
+    if not filename:
+        return None
+    try:
+        return filename if not _is_stale(_get_favicon_path(filename)) else None
+    except FileNotFoundError:
+        # File was removed without the index noticing
+        _favicon_index.remove(favicon_name)
+        return None
 
 
 def _is_stale(path: Path) -> bool:
@@ -69,8 +130,18 @@ def load_favicon(url: str) -> str:
     if not favicon_file:
         # Load favicon from provider, save to file
         favicon_url = settings.LD_FAVICON_PROVIDER.format(**url_parameters)
+        # If there is a stale icon, only download it again if it has changed
+        stale_favicon_file = _favicon_index.get(favicon_name)
+        validators = _get_validators(favicon_name, stale_favicon_file)
+        headers = http_client.get_conditional_headers(validators)
         logger.debug(f"Loading favicon from: {favicon_url}")
-        with requests.get(favicon_url, stream=True) as response:
+        with http_client.get(favicon_url, stream=True, headers=headers) as response:
+            if headers and response.status_code == 304:
+                # Reset the age of the existing icon
+                os.utime(_get_favicon_path(stale_favicon_file))
+                logger.debug(f"Favicon not modified: {stale_favicon_file}")
+                return stale_favicon_file
+
             content_type = response.headers["Content-Type"]
             file_extension = mimetypes.guess_extension(content_type)
             favicon_file = f"{favicon_name}{file_extension}"
@@ -78,6 +149,33 @@ def load_favicon(url: str) -> str:
             with open(favicon_path, "wb") as file:
                 for chunk in response.iter_content(chunk_size=8192):
                     file.write(chunk)
+            # Store validators before updating the index, so that the index
+            # picks up all changes to the folder
+            _store_validators(favicon_name, favicon_file, response)
+            _favicon_index.add(favicon_name, favicon_file)
         logger.debug(f"Saved favicon as: {favicon_path}")
 
     return favicon_file
+
+
+def _get_validators(favicon_name: str, favicon_file: str | None) -> dict[str, str]:
+    if not favicon_file:
+        return {}
+    validators = http_client.read_validators(_get_validators_path(favicon_name))
+    # Ignore validators of a different file, e.g. with a different extension
+    if validators.get("file") != favicon_file:
+        return {}
+    return validators
+
+
+def _store_validators(favicon_name: str, favicon_file: str, response):
+    validators = http_client.get_validators(response)
+    if validators:
+        validators["file"] = favicon_file
+    http_client.write_validators(_get_validators_path(favicon_name), validators)
+
+
+def _get_validators_path(favicon_name: str) -> str:
+    # Use a name that doesn't clash with favicon names in the index, which
+    # ignores only the last extension
+    return os.path.join(settings.LD_FAVICON_FOLDER, f"{favicon_name}.validators.json")
@@ -0,0 +1,130 @@
+import contextlib
+import contextvars
+import threading
+import time
+from urllib.parse import urlparse
+
+from django.conf import settings
+
+# Limits the requests that background tasks make when loading metadata,
+# favicons, preview images and snapshots. Each host has a token bucket that
+# allows a short burst of requests, and then a fixed number of requests per
+# second. Additionally, the number of tasks that fetch at the same time is
+# capped. Requests that would have to wait for more than a second raise
+# FetchRateLimited, which tasks handle by scheduling the work again after the
+# computed delay, instead of failing and using up their retries.
+#
+# Limits only apply within a fetch scope, which is opened by background
+# tasks. Requests made while handling a web request are never limited.
+
+CONCURRENCY_RETRY_DELAY = 5
+MAX_WAIT = 1
+MAX_TRACKED_HOSTS = 1000
+
+
+class FetchRateLimited(Exception):
+    def __init__(self, host: str, delay: float):
+        self.host = host
+        self.delay = delay
+        super().__init__(f"Rate limited requests to {host}, retry in {delay:.1f}s")
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, burst: int, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """
+        Takes a token and returns 0 if one is available, otherwise returns the
+        number of seconds until the next token is available.
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class _FetchScope:
+    def __init__(self):
+        self.has_slot = False
+
+
+class FetchScheduler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: dict[str, _TokenBucket] = {}
+        self._active_fetches = 0
+        self._scope = contextvars.ContextVar("fetch_scope", default=None)
+
+    @contextlib.contextmanager
+    def scope(self):
+        # Nested scopes, e.g. from tasks that run immediately in tests, share
+        # the outer scope and its concurrency slot
+        if self._scope.get() is not None:
+            yield
+            return
+
+        scope = _FetchScope()
+        token = self._scope.set(scope)
+        try:
+            yield
+        finally:
+            self._scope.reset(token)
+            if scope.has_slot:
+                with self._lock:
+                    self._active_fetches -= 1
+
+    def acquire(self, url: str):
+        scope = self._scope.get()
+        if scope is None:
+            return
+
+        host = urlparse(url).hostname or ""
+        while True:
+            delay = self._take(scope, host)
+            if not delay:
+                return
+            if delay > MAX_WAIT:
+                raise FetchRateLimited(host, delay)
+            # Waiting briefly is cheaper than scheduling the task again
+            time.sleep(delay)
+
+    def _take(self, scope: _FetchScope, host: str) -> float:
+        now = time.monotonic()
+        with self._lock:
+            if not scope.has_slot:
+                if self._active_fetches >= settings.LD_FETCH_MAX_CONCURRENCY:
+                    raise FetchRateLimited(host, CONCURRENCY_RETRY_DELAY)
+                self._active_fetches += 1
+                scope.has_slot = True
+
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                if len(self._buckets) >= MAX_TRACKED_HOSTS:
+                    self._remove_idle_buckets(now)
+                bucket = _TokenBucket(
+                    settings.LD_FETCH_HOST_RATE, settings.LD_FETCH_HOST_BURST, now
+                )
+                self._buckets[host] = bucket
+            return bucket.take(now)
+
+    def _remove_idle_buckets(self, now: float):
+        # Buckets that have refilled completely behave the same as new ones
+        self._buckets = {
+            host: bucket
+            for host, bucket in self._buckets.items()
+            if bucket.tokens + (now - bucket.updated) * bucket.rate < bucket.burst
+        }
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+            self._active_fetches = 0
+
+
+scheduler = FetchScheduler()
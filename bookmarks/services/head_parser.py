@@ -0,0 +1,82 @@
+from dataclasses import dataclass
+from html.parser import HTMLParser
+
+# Extracts the metadata that is shown for bookmarks from the head of an HTML
+# document. Uses the tokenizer from the standard library instead of building
+# a full document tree, and stops tokenizing once the head ends, as all tags
+# of interest are expected to be in the head.
+
+
+@dataclass
+class HeadMetadata:
+    title: str | None = None
+    description: str | None = None
+    og_description: str | None = None
+    og_image: str | None = None
+
+
+class _EndOfHead(Exception):
+    pass
+
+
+class _HeadParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.metadata = HeadMetadata()
+        self._title = None
+        self._in_title = False
+        self._found_tags = set()
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "body":
+            raise _EndOfHead()
+        if tag == "title" and self._title is None:
+            self._title = ""
+            self._in_title = True
+        elif tag == "meta":
+            self._handle_meta(dict(attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag == "head":
+            raise _EndOfHead()
+        if tag == "title":
+            self._in_title = False
+
+    def handle_data(self, data):
+        if self._in_title:
+            self._title += data
+
+    def get_metadata(self) -> HeadMetadata:
+        if self._title:
+            self.metadata.title = self._title.strip()
+        return self.metadata
+
+    def _handle_meta(self, attrs: dict):
+        # Only use the first tag of each kind, same as looking them up in a
+        # document tree
+        key = None
+        if attrs.get("name") == "description":
+            key = "description"
+        elif attrs.get("property") == "og:description":
+            key = "og_description"
+        elif attrs.get("property") == "og:image":
+            key = "og_image"
+        if key is None or key in self._found_tags:
+            return
+
+        self._found_tags.add(key)
+        content = (attrs.get("content") or "").strip()
+        setattr(self.metadata, key, content or None)
+
+
+def parse_head(html: str) -> HeadMetadata:
+    parser = _HeadParser()
+    try:
+        parser.feed(html)
+        parser.close()
+    except _EndOfHead:
+        pass
+    return parser.get_metadata()
@@ -0,0 +1,120 @@
+import contextlib
+import json
+import os
+import threading
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from bookmarks.services import fetch_scheduler
+
+# Shared HTTP session for loading websites, favicons, preview images and
+# snapshots. Reusing a session keeps connections to a host alive between
+# requests, which avoids a new TCP and TLS handshake for every bookmark when
+# processing many bookmarks of the same website, for example after an import.
+# Sessions are not guaranteed to be thread-safe, so each thread gets its own
+# session and connection pool. A session handles websites of all bookmarks and
+# users, so it must not keep cookies from one website for later requests.
+
+RETRY_STATUS_CODES = [502, 503, 504]
+
+_local = threading.local()
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    fetch_scheduler.scheduler.acquire(url)
+    return get_session().get(url, **kwargs)
+
+
+def head(url: str, **kwargs) -> requests.Response:
+    fetch_scheduler.scheduler.acquire(url)
+    return get_session().head(url, **kwargs)
+
+
+def get_validators(response: requests.Response) -> dict[str, str]:
+    """
+    Returns the validators of a response, which can be sent with a later
+    request for the same resource to only download it again if it changed.
+    """
+    validators = {}
+    if response.headers.get("ETag"):
+        validators["etag"] = response.headers["ETag"]
+    if response.headers.get("Last-Modified"):
+        validators["last_modified"] = response.headers["Last-Modified"]
+    return validators
+
+
+def get_conditional_headers(validators: dict[str, str]) -> dict[str, str]:
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+
+def read_validators(path: str) -> dict[str, str]:
+    """
+    Reads validators that were stored next to a downloaded file. Validators are
+    kept on disk rather than in the cache, so that they live as long as the file
+    they describe.
+    """
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_validators(path: str, validators: dict[str, str]):
+    if not validators:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+        return
+
+    # Write to a temporary file first, so that readers never see a partial file
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as file:
+        json.dump(validators, file)
+    os.replace(temp_path, path)
+
+
+def get_session() -> requests.Session:
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = _create_session()
+        _local.session = session
+    return session
+
+
+def _create_session() -> requests.Session:
+    retry = Retry(
+        total=settings.LD_HTTP_RETRIES,
+        # Don't retry read timeouts, which would multiply the time a slow
+        # website can block interactive requests
+        read=0,
+        backoff_factor=settings.LD_HTTP_RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=["HEAD", "GET"],
+        # Return the last response instead of raising, so that callers can
+        # handle bad status codes the same way as without retries
+        raise_on_status=False,
+        # Don't let websites block a worker for an arbitrary amount of time
+        respect_retry_after_header=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=settings.LD_HTTP_POOL_CONNECTIONS,
+        pool_maxsize=settings.LD_HTTP_POOL_MAXSIZE,
+        max_retries=retry,
+    )
+
+    session = requests.Session()
+    # Reject all cookies from responses, cookies are still passed along within
+    # the redirects of a single request
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
@@ -7,6 +7,7 @@ from django.utils import timezone
 from bookmarks.models import Bookmark, Tag
 from bookmarks.services import tasks
 from bookmarks.services.parser import NetscapeBookmark, parse
+from bookmarks.services.tags import update_tag_counts_for_bookmarks
 from bookmarks.utils import parse_timestamp
 
 logger = logging.getLogger(__name__)
@@ -254,6 +255,10 @@ def _import_batch(
     # Insert all bookmark -> tag associations at once, should ignore errors if association already exists
     BookmarkToTagRelationShip.objects.bulk_create(relationships, ignore_conflicts=True)
 
+    # Update tag counts for all bookmarks in the batch, which also covers
+    # changes to the archived or shared state of existing bookmarks
+    update_tag_counts_for_bookmarks(existing_bookmarks.values("id"))
+
 
 def _copy_bookmark_data(
     netscape_bookmark: NetscapeBookmark, bookmark: Bookmark, options: ImportOptions
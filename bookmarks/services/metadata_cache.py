@@ -0,0 +1,115 @@
+import hashlib
+import logging
+import threading
+from collections import Counter
+from dataclasses import replace
+
+from django.conf import settings
+from django.core.cache import cache
+
+from bookmarks.utils import normalize_url
+
+logger = logging.getLogger(__name__)
+
+# Caches scraped website metadata, so that the bookmark form, the API, and
+# background tasks don't scrape the same page again. Uses the shared cache
+# backend, so entries are available to web server and task processes. Failed
+# attempts are cached as well, with a shorter timeout, to avoid repeatedly
+# waiting for websites that are unreachable.
+
+CACHE_KEY_PREFIX = "website_metadata"
+FAILURE_MARKER = "failure"
+
+STAT_HIT = "hit"
+STAT_FAILURE_HIT = "failure_hit"
+STAT_MISS = "miss"
+STATS = [STAT_HIT, STAT_FAILURE_HIT, STAT_MISS]
+# Statistics are counted in memory, and only added to the shared cache after
+# this number of lookups, to keep writes to the cache off the lookup path
+STATS_FLUSH_INTERVAL = 100
+
+_pending_stats = Counter()
+_pending_stats_lock = threading.Lock()
+
+
+def get(url: str):
+    """
+    Returns the cached metadata for the URL, FAILURE_MARKER if loading the
+    metadata failed recently, or None if there is no cache entry.
+    """
+    entry = cache.get(_make_key(url))
+
+    if entry is None:
+        _increment_stat(STAT_MISS)
+        return None
+
+    if entry == FAILURE_MARKER:
+        _increment_stat(STAT_FAILURE_HIT)
+        return FAILURE_MARKER
+
+    _increment_stat(STAT_HIT)
+    # Entries are shared by URLs that normalize to the same value, so return
+    # the URL that was requested
+    return replace(entry, url=url)
+
+
+def set(url: str, metadata):
+    cache.set(_make_key(url), metadata, settings.LD_METADATA_CACHE_TTL)
+
+
+def set_failure(url: str):
+    cache.set(_make_key(url), FAILURE_MARKER, settings.LD_METADATA_CACHE_FAILURE_TTL)
+
+
+def get_stats() -> dict[str, int]:
+    """
+    Returns the statistics of all processes. Lookups of other processes are
+    only included once they have been flushed to the cache.
+    """
+    flush_stats()
+    keys = {_make_stat_key(stat): stat for stat in STATS}
+    values = cache.get_many(keys.keys())
+    return {stat: values.get(key, 0) for key, stat in keys.items()}
+
+
+def reset_stats():
+    with _pending_stats_lock:
+        _pending_stats.clear()
+    cache.delete_many([_make_stat_key(stat) for stat in STATS])
+
+
+def flush_stats():
+    with _pending_stats_lock:
+        pending = dict(_pending_stats)
+        _pending_stats.clear()
+
+    for stat, count in pending.items():
+        key = _make_stat_key(stat)
+        try:
+            try:
+                cache.incr(key, count)
+            except ValueError:
+                # The key does not exist yet, or was evicted
+                if not cache.add(key, count, None):
+                    cache.incr(key, count)
+        except Exception as error:
+            # Statistics are not essential, don't fail loading metadata
+            logger.debug(f"Failed to update metadata cache stats: {error}")
+
+
+def _increment_stat(stat: str):
+    with _pending_stats_lock:
+        _pending_stats[stat] += 1
+        should_flush = _pending_stats.total() >= STATS_FLUSH_INTERVAL
+    if should_flush:
+        flush_stats()
+
+
+def _make_key(url: str) -> str:
+    normalized_url = normalize_url(url) or url
+    url_hash = hashlib.sha256(normalized_url.encode()).hexdigest()
+    return f"{CACHE_KEY_PREFIX}:{url_hash}"
+
+
+def _make_stat_key(stat: str) -> str:
+    return f"{CACHE_KEY_PREFIX}:stats:{stat}"
@@ -4,10 +4,9 @@ import mimetypes
 import os.path
 from pathlib import Path
 
-import requests
 from django.conf import settings
 
-from bookmarks.services import website_loader
+from bookmarks.services import http_client, website_loader
 
 logger = logging.getLogger(__name__)
 
@@ -34,8 +33,18 @@ def load_preview_image(url: str) -> str | None:
 
     image_url = metadata.preview_image
 
+    preview_image_hash = _url_to_filename(url)
+    # If the same image was downloaded before, only download it again if it
+    # has changed
+    validators = _get_validators(preview_image_hash, image_url)
+    headers = http_client.get_conditional_headers(validators)
+
     logger.debug(f"Loading preview image: {image_url}")
-    with requests.get(image_url, stream=True) as response:
+    with http_client.get(image_url, stream=True, headers=headers) as response:
+        if headers and response.status_code == 304:
+            logger.debug(f"Preview image not modified: {image_url}")
+            return validators["file"]
+
         if response.status_code < 200 or response.status_code >= 300:
             logger.debug(
                 f"Bad response status code for preview image: {image_url} status_code={response.status_code}"
@@ -66,7 +75,6 @@ def load_preview_image(url: str) -> str | None:
             )
             return None
 
-        preview_image_hash = _url_to_filename(url)
         preview_image_file = f"{preview_image_hash}{file_extension}"
         preview_image_path = _get_image_path(preview_image_file)
 
@@ -84,6 +92,37 @@ def load_preview_image(url: str) -> str | None:
 
                 file.write(chunk)
 
+        _store_validators(preview_image_hash, image_url, preview_image_file, response)
+
     logger.debug(f"Saved preview image as: {preview_image_path}")
 
     return preview_image_file
+
+
+def _get_validators(preview_image_hash: str, image_url: str) -> dict[str, str]:
+    validators = http_client.read_validators(_get_validators_path(preview_image_hash))
+    # Ignore validators if the website now uses a different image, or if the
+    # previously downloaded image doesn't exist anymore
+    if (
+        validators.get("image_url") != image_url
+        or not validators.get("file")
+        or not _get_image_path(validators["file"]).exists()
+    ):
+        return {}
+    return validators
+
+
+def _store_validators(
+    preview_image_hash: str, image_url: str, preview_image_file: str, response
+):
+    validators = http_client.get_validators(response)
+    if validators:
+        validators["image_url"] = image_url
+        validators["file"] = preview_image_file
+    http_client.write_validators(_get_validators_path(preview_image_hash), validators)
+
+
+def _get_validators_path(preview_image_hash: str) -> str:
+    return os.path.join(
+        settings.LD_PREVIEW_FOLDER, f"{preview_image_hash}.validators.json"
+    )
@@ -0,0 +1,429 @@
+import logging
+
+from django.db import connection, transaction
+from django.db.models import Case, Expression, FloatField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.sql.constants import LOUTER
+
+from bookmarks.services.search_query_parser import (
+    AndExpression,
+    NotExpression,
+    OrExpression,
+    SearchExpression,
+    TermExpression,
+)
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "bookmarks_bookmark_fts"
+FTS_COLUMNS = ["title", "description", "notes", "url"]
+
+# Postgres search vector, weighted by the column in which a term occurs. Uses
+# the simple configuration as bookmarks can be in any language.
+SEARCH_VECTOR_COLUMN = "search_vector"
+SEARCH_VECTOR_CONFIG = "simple"
+SEARCH_VECTOR_WEIGHTS = {"title": "A", "description": "B", "notes": "C", "url": "D"}
+
+# Weights for ranking search results by the column in which a term occurs
+RANK_WEIGHTS = {"title": 8.0, "description": 4.0, "notes": 2.0, "url": 1.0}
+
+# The trigram tokenizer can only match substrings with at least three characters,
+# shorter terms need to fall back to a regular LIKE query
+FTS_MIN_TERM_LENGTH = 3
+
+_fts_enabled = None
+_search_vector_enabled = None
+
+
+def create_fts_index(cursor) -> bool:
+    """
+    Creates the SQLite FTS5 index for bookmarks, including the triggers that
+    keep it in sync with the bookmark table. Returns False if the SQLite
+    library was compiled without FTS5 or trigram support.
+    """
+    columns = ", ".join(FTS_COLUMNS)
+    new_values = ", ".join(f"new.{column}" for column in FTS_COLUMNS)
+    old_values = ", ".join(f"old.{column}" for column in FTS_COLUMNS)
+
+    try:
+        # Use the trigram tokenizer, so that the index supports the same
+        # case-insensitive substring matching as the icontains lookup
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            f"{columns}, content='bookmarks_bookmark', content_rowid='id', "
+            f"tokenize='trigram')"
+        )
+    except Exception as error:
+        logger.warning(
+            "SQLite FTS5 is not available, search will not use a full-text index",
+            exc_info=error,
+        )
+        return False
+
+    cursor.execute(
+        f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON bookmarks_bookmark BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values}); "
+        f"END"
+    )
+    cursor.execute(
+        f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON bookmarks_bookmark BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) "
+        f"VALUES ('delete', old.id, {old_values}); "
+        f"END"
+    )
+    cursor.execute(
+        f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF {columns} "
+        f"ON bookmarks_bookmark BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) "
+        f"VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values}); "
+        f"END"
+    )
+    # Index existing bookmarks
+    cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return True
+
+
+def drop_fts_index(cursor):
+    for suffix in ["ai", "ad", "au"]:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+    cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def is_fts_enabled() -> bool:
+    global _fts_enabled
+
+    if connection.vendor != "sqlite":
+        return False
+
+    if _fts_enabled is None:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+                [FTS_TABLE],
+            )
+            _fts_enabled = cursor.fetchone() is not None
+
+    return _fts_enabled
+
+
+def create_search_vector(cursor) -> bool:
+    """
+    Creates the Postgres search vector column and indexes for bookmarks. The
+    search vector is a generated column that is maintained by the database.
+    Additionally creates trigram indexes for the columns, which are used by the
+    case-insensitive substring lookups of the search. Returns False if the
+    pg_trgm extension could not be installed.
+    """
+    vector = " || ".join(
+        f"setweight(to_tsvector('{SEARCH_VECTOR_CONFIG}', "
+        f"coalesce({column}, '')), '{weight}')"
+        for column, weight in SEARCH_VECTOR_WEIGHTS.items()
+    )
+    cursor.execute(
+        f"ALTER TABLE bookmarks_bookmark ADD COLUMN IF NOT EXISTS "
+        f"{SEARCH_VECTOR_COLUMN} tsvector GENERATED ALWAYS AS ({vector}) STORED"
+    )
+    cursor.execute(
+        f"CREATE INDEX IF NOT EXISTS bookmarks_bookmark_{SEARCH_VECTOR_COLUMN}_idx "
+        f"ON bookmarks_bookmark USING GIN ({SEARCH_VECTOR_COLUMN})"
+    )
+
+    try:
+        with transaction.atomic(using=cursor.db.alias):
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    except Exception as error:
+        logger.warning(
+            "Could not install the pg_trgm extension, search will not use trigram indexes",
+            exc_info=error,
+        )
+        return False
+
+    # The expression must match the SQL that Django generates for icontains
+    # lookups, so that the query planner can use the index
+    for column in FTS_COLUMNS:
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS bookmarks_bookmark_{column}_trgm_idx "
+            f"ON bookmarks_bookmark USING GIN ((UPPER({column}::text)) gin_trgm_ops)"
+        )
+    return True
+
+
+def drop_search_vector(cursor):
+    for column in FTS_COLUMNS:
+        cursor.execute(f"DROP INDEX IF EXISTS bookmarks_bookmark_{column}_trgm_idx")
+    cursor.execute(
+        f"DROP INDEX IF EXISTS bookmarks_bookmark_{SEARCH_VECTOR_COLUMN}_idx"
+    )
+    cursor.execute(
+        f"ALTER TABLE bookmarks_bookmark DROP COLUMN IF EXISTS {SEARCH_VECTOR_COLUMN}"
+    )
+
+
+def is_search_vector_enabled() -> bool:
+    global _search_vector_enabled
+
+    if connection.vendor != "postgresql":
+        return False
+
+    if _search_vector_enabled is None:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = 'bookmarks_bookmark' AND column_name = %s",
+                [SEARCH_VECTOR_COLUMN],
+            )
+            _search_vector_enabled = cursor.fetchone() is not None
+
+    return _search_vector_enabled
+
+
+def reset_cache():
+    global _fts_enabled, _search_vector_enabled
+    _fts_enabled = None
+    _search_vector_enabled = None
+
+
+def term_condition(term: str) -> Q:
+    """
+    Returns a condition that matches bookmarks that contain the term in their
+    title, description, notes or URL. Uses the full-text index if available.
+    """
+    if is_fts_enabled() and len(term) >= FTS_MIN_TERM_LENGTH:
+        return Q(
+            id__in=RawSQL(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+                (_to_fts_phrase(term),),
+            )
+        )
+
+    # On Postgres these lookups are backed by trigram indexes
+    return (
+        Q(title__icontains=term)
+        | Q(description__icontains=term)
+        | Q(notes__icontains=term)
+        | Q(url__icontains=term)
+    )
+
+
+def _to_fts_phrase(term: str) -> str:
+    # Quote the term as FTS5 phrase, which disables any query syntax within
+    # the term, and matches it as a substring with the trigram tokenizer
+    escaped_term = term.replace('"', '""')
+    return f'"{escaped_term}"'
+
+
+def build_tsquery(ast_node: SearchExpression) -> tuple[str, list] | None:
+    """
+    Converts the terms of a search query into a Postgres tsquery expression,
+    mapping AND, OR and NOT expressions to the respective tsquery operators.
+    Tags and special keywords are not part of the search vector and are
+    skipped. Returns a tuple of SQL and params, or None if the query does not
+    contain any terms.
+    """
+    if isinstance(ast_node, TermExpression):
+        # Parse terms with the same configuration as the search vector,
+        # multi-word terms are converted into a phrase query
+        return f"phraseto_tsquery('{SEARCH_VECTOR_CONFIG}', %s)", [ast_node.term]
+
+    elif isinstance(ast_node, AndExpression | OrExpression):
+        left = build_tsquery(ast_node.left)
+        right = build_tsquery(ast_node.right)
+        if left is None or right is None:
+            return left or right
+        operator = "&&" if isinstance(ast_node, AndExpression) else "||"
+        return f"({left[0]} {operator} {right[0]})", left[1] + right[1]
+
+    elif isinstance(ast_node, NotExpression):
+        operand = build_tsquery(ast_node.operand)
+        if operand is None:
+            return None
+        return f"(!!{operand[0]})", operand[1]
+
+    return None
+
+
+class _SearchVectorRank(Expression):
+    """
+    Ranks bookmarks with ts_rank on the search vector column. The column is
+    referenced through the alias of the bookmark table in the query, so that
+    the expression also works if the table is aliased, for example in a
+    subquery.
+    """
+
+    output_field = FloatField()
+
+    def __init__(self, tsquery: tuple[str, list], table_alias: str | None = None):
+        super().__init__()
+        self.tsquery = tsquery
+        self.table_alias = table_alias
+
+    def resolve_expression(
+        self, query=None, allow_joins=True, reuse=None, summarize=False, for_save=False
+    ):
+        clone = self.copy()
+        clone.table_alias = query.get_initial_alias()
+        return clone
+
+    def relabeled_clone(self, change_map):
+        clone = self.copy()
+        clone.table_alias = change_map.get(self.table_alias, self.table_alias)
+        return clone
+
+    def as_sql(self, compiler, connection):
+        # ts_rank expects the weights in the order D, C, B, A
+        weights = ",".join(
+            str(RANK_WEIGHTS[column] / max(RANK_WEIGHTS.values()))
+            for column in reversed(SEARCH_VECTOR_WEIGHTS)
+        )
+        column = (
+            f"{compiler.quote_name_unless_alias(self.table_alias)}."
+            f"{connection.ops.quote_name(SEARCH_VECTOR_COLUMN)}"
+        )
+        sql, params = self.tsquery
+        return f"ts_rank('{{{weights}}}', {column}, {sql})", list(params)
+
+    def get_group_by_cols(self):
+        return [self]
+
+
+class _FtsRankJoin:
+    """
+    Joins the bm25 scores of all bookmarks that match an FTS query, so that
+    the FTS index is queried once for the whole result, instead of once per
+    bookmark. Implements the interface that Django expects from entries in
+    the alias map of a query, similar to Join.
+    """
+
+    # Only used as name of the alias, the scores are a derived table
+    table_name = f"{FTS_TABLE}_rank"
+    filtered_relation = None
+    nullable = True
+
+    def __init__(self, parent_alias, fts_query, table_alias=None, join_type=LOUTER):
+        self.parent_alias = parent_alias
+        self.fts_query = fts_query
+        self.table_alias = table_alias
+        self.join_type = join_type
+
+    def as_sql(self, compiler, connection):
+        # bm25 returns lower values for better matches, so invert it
+        weights = ", ".join(str(RANK_WEIGHTS[column]) for column in FTS_COLUMNS)
+        alias = compiler.quote_name_unless_alias(self.table_alias)
+        parent_alias = compiler.quote_name_unless_alias(self.parent_alias)
+        sql = (
+            f"{self.join_type} (SELECT rowid, -bm25({FTS_TABLE}, {weights}) AS score "
+            f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s) {alias} "
+            f"ON ({alias}.rowid = {parent_alias}.{connection.ops.quote_name('id')})"
+        )
+        return sql, [self.fts_query]
+
+    def relabeled_clone(self, change_map):
+        return self.__class__(
+            change_map.get(self.parent_alias, self.parent_alias),
+            self.fts_query,
+            change_map.get(self.table_alias, self.table_alias),
+            self.join_type,
+        )
+
+    @property
+    def identity(self):
+        return self.__class__, self.parent_alias, self.fts_query
+
+    def __eq__(self, other):
+        if not isinstance(other, _FtsRankJoin):
+            return NotImplemented
+        return self.identity == other.identity
+
+    def __hash__(self):
+        return hash(self.identity)
+
+    def demote(self):
+        # Bookmarks without a match must keep a score of zero
+        return self.relabeled_clone({})
+
+    def promote(self):
+        return self.relabeled_clone({})
+
+
+class _FtsRank(Expression):
+    """
+    References the bm25 score of a bookmark from an FTS rank join, which is
+    added to the query when the expression is resolved.
+    """
+
+    output_field = FloatField()
+
+    def __init__(self, fts_query: str, table_alias: str | None = None):
+        super().__init__()
+        self.fts_query = fts_query
+        self.table_alias = table_alias
+
+    def resolve_expression(
+        self, query=None, allow_joins=True, reuse=None, summarize=False, for_save=False
+    ):
+        clone = self.copy()
+        clone.table_alias = query.join(
+            _FtsRankJoin(query.get_initial_alias(), self.fts_query)
+        )
+        return clone
+
+    def relabeled_clone(self, change_map):
+        clone = self.copy()
+        clone.table_alias = change_map.get(self.table_alias, self.table_alias)
+        return clone
+
+    def as_sql(self, compiler, connection):
+        alias = compiler.quote_name_unless_alias(self.table_alias)
+        return f"COALESCE({alias}.score, 0)", []
+
+    def get_group_by_cols(self):
+        return [self]
+
+
+def rank_expression(ast_node: SearchExpression) -> Expression | None:
+    """
+    Returns an expression that computes a relevance score for the terms of a
+    search query, where higher scores are better. Matches in the title score
+    higher than matches in the description, notes or URL. Returns None if the
+    query does not contain any terms.
+    """
+    if is_search_vector_enabled():
+        tsquery = build_tsquery(ast_node)
+        if tsquery is None:
+            return None
+        return _SearchVectorRank(tsquery)
+
+    # Negated terms do not contribute to the score
+    terms = _extract_positive_terms(ast_node)
+    if not terms:
+        return None
+
+    score = None
+    if is_fts_enabled():
+        fts_terms = [term for term in terms if len(term) >= FTS_MIN_TERM_LENGTH]
+        if fts_terms:
+            fts_query = " OR ".join(_to_fts_phrase(term) for term in fts_terms)
+            score = _FtsRank(fts_query)
+        # The index can not match short terms, score them with LIKE queries
+        terms = [term for term in terms if len(term) < FTS_MIN_TERM_LENGTH]
+
+    for term in terms:
+        for column, weight in RANK_WEIGHTS.items():
+            column_score = Case(
+                When(Q(**{f"{column}__icontains": term}), then=Value(weight)),
+                default=Value(0.0),
+                output_field=FloatField(),
+            )
+            score = column_score if score is None else score + column_score
+    return score
+
+
+def _extract_positive_terms(ast_node: SearchExpression) -> list[str]:
+    if isinstance(ast_node, TermExpression):
+        return [ast_node.term]
+    elif isinstance(ast_node, AndExpression | OrExpression):
+        return _extract_positive_terms(ast_node.left) + _extract_positive_terms(
+            ast_node.right
+        )
+    return []
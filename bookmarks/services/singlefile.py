@@ -1,8 +1,10 @@
 import logging
 import os
+import re
 import shlex
 import signal
 import subprocess
+import threading
 
 from django.conf import settings
 
@@ -13,37 +15,96 @@ class SingleFileError(Exception):
 
 logger = logging.getLogger(__name__)
 
+STREAM_CHUNK_SIZE = 64 * 1024
+# single-file adds a comment with the URL and the date the page was saved to the
+# start of each snapshot
+SAVED_DATE_PATTERN = re.compile(rb"\n saved date: [^\n]*")
 
-def create_snapshot(url: str, filepath: str):
+
+def stream_snapshot(url: str, home_dir: str | None = None):
+    """
+    Creates a snapshot of the URL using single-file and yields its content in
+    chunks, as single-file writes it to stdout, so that the snapshot can be
+    compressed while it is created instead of going through a temporary file.
+    If a home directory is provided, the browser uses a profile in that
+    directory, so that multiple instances can run at the same time.
+    """
     singlefile_path = settings.LD_SINGLEFILE_PATH
 
     # parse options to list of arguments
     ublock_options = shlex.split(settings.LD_SINGLEFILE_UBLOCK_OPTIONS)
     custom_options = shlex.split(settings.LD_SINGLEFILE_OPTIONS)
+    isolation_options = []
+    popen_kwargs = {}
+    if home_dir:
+        os.makedirs(home_dir, exist_ok=True)
+        # Chromium uses the last user data dir argument, which overrides the
+        # shared profile from the default options
+        profile_dir = os.path.join(home_dir, "chromium-profile")
+        isolation_options = [f'--browser-arg="--user-data-dir={profile_dir}"']
+        popen_kwargs["env"] = {**os.environ, "HOME": home_dir}
     # concat lists
-    args = [singlefile_path] + ublock_options + custom_options + [url, filepath]
+    args = (
+        [singlefile_path]
+        + ublock_options
+        + isolation_options
+        + custom_options
+        + ["--dump-content", url]
+    )
     try:
         # Use start_new_session=True to create a new process group
-        process = subprocess.Popen(args, start_new_session=True)
-        process.wait(timeout=settings.LD_SINGLEFILE_TIMEOUT_SEC)
-
-        # check if the file was created
-        if not os.path.exists(filepath):
-            raise SingleFileError("Failed to create snapshot")
-    except subprocess.TimeoutExpired:
-        # First try to terminate properly
-        try:
-            logger.error(
-                "Timeout expired while creating snapshot. Terminating process..."
-            )
-            process.terminate()
-            process.wait(timeout=20)
-            raise SingleFileError("Timeout expired while creating snapshot") from None
-        except subprocess.TimeoutExpired:
-            # Kill the whole process group, which should also clean up any chromium
-            # processes spawned by single-file
-            logger.error("Timeout expired while terminating. Killing process...")
-            os.killpg(os.getpgid(process.pid), signal.SIGTERM)
-            raise SingleFileError("Timeout expired while creating snapshot") from None
+        process = subprocess.Popen(
+            args, stdout=subprocess.PIPE, start_new_session=True, **popen_kwargs
+        )
     except subprocess.CalledProcessError as error:
         raise SingleFileError(f"Failed to create snapshot: {error.stderr}") from error
+
+    # Reading from stdout blocks, so enforce the timeout from a timer that
+    # stops the process, which closes stdout and ends reading
+    timed_out = threading.Event()
+    timer = threading.Timer(
+        settings.LD_SINGLEFILE_TIMEOUT_SEC, _stop_process, [process, timed_out]
+    )
+    timer.start()
+    try:
+        size = 0
+        while chunk := process.stdout.read(STREAM_CHUNK_SIZE):
+            size += len(chunk)
+            yield chunk
+        process.wait()
+    finally:
+        timer.cancel()
+        # Stop single-file if reading was aborted, for example because writing
+        # the snapshot failed
+        if process.poll() is None:
+            _stop_process(process)
+        process.stdout.close()
+
+    if timed_out.is_set():
+        raise SingleFileError("Timeout expired while creating snapshot")
+    # single-file doesn't return exit codes, so check that there was output
+    if size == 0:
+        raise SingleFileError("Failed to create snapshot")
+
+
+def strip_saved_date(content: bytes) -> bytes:
+    """
+    Removes the saved date from the start of a snapshot, so that snapshots of
+    the same page only differ if the page itself changed.
+    """
+    return SAVED_DATE_PATTERN.sub(b"", content, count=1)
+
+
+def _stop_process(process: subprocess.Popen, timed_out: threading.Event = None):
+    if timed_out is not None:
+        timed_out.set()
+        logger.error("Timeout expired while creating snapshot. Terminating process...")
+    # First try to terminate properly
+    process.terminate()
+    try:
+        process.wait(timeout=20)
+    except subprocess.TimeoutExpired:
+        # Kill the whole process group, which should also clean up any chromium
+        # processes spawned by single-file
+        logger.error("Timeout expired while terminating. Killing process...")
+        os.killpg(os.getpgid(process.pid), signal.SIGTERM)
@@ -0,0 +1,62 @@
+import secrets
+
+from django.core.cache import cache
+
+# Caches the tag clouds of the unfiltered bookmark views, which would otherwise
+# join all bookmarks of a user on every page load. Entries are grouped into
+# scopes, one per user for the active and archived views, and a global scope
+# for the shared view, which contains tags of all users. Each scope has a
+# version token that is part of the cache keys, so replacing the token
+# invalidates all entries of the scope at once.
+
+CACHE_KEY_PREFIX = "tag_cloud"
+CACHE_TIMEOUT = 60 * 60 * 24
+SHARED_SCOPE = "shared"
+
+
+def user_scope(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def get(scope: str, key: str) -> tuple:
+    """
+    Returns the cached value, or None, and the current version of the scope.
+    The version must be passed to set, so that a value that was computed
+    before the scope was invalidated is not stored under the new version.
+    """
+    version = _get_version(scope)
+    return cache.get(_make_key(scope, version, key)), version
+
+
+def set(scope: str, version: str, key: str, value):
+    cache.set(_make_key(scope, version, key), value, CACHE_TIMEOUT)
+
+
+def invalidate_users(user_ids):
+    keys = [_make_version_key(user_scope(user_id)) for user_id in user_ids]
+    # Changing tags of any user might change the shared tag cloud
+    keys.append(_make_version_key(SHARED_SCOPE))
+    cache.delete_many(keys)
+
+
+def invalidate_shared():
+    cache.delete(_make_version_key(SHARED_SCOPE))
+
+
+def _get_version(scope: str) -> str:
+    version_key = _make_version_key(scope)
+    version = cache.get(version_key)
+    if version is None:
+        # Use a random token instead of a counter, so that a version is never
+        # reused after it has been evicted from the cache
+        cache.add(version_key, secrets.token_hex(8), CACHE_TIMEOUT)
+        version = cache.get(version_key)
+    return version
+
+
+def _make_version_key(scope: str) -> str:
+    return f"{CACHE_KEY_PREFIX}:{scope}:version"
+
+
+def _make_key(scope: str, version: str, key: str) -> str:
+    return f"{CACHE_KEY_PREFIX}:{scope}:{version}:{key}"
@@ -1,10 +1,14 @@
 import logging
 import operator
+from collections.abc import Iterable
 
 from django.contrib.auth.models import User
+from django.db.models import Count, OuterRef, Q, QuerySet, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
-from bookmarks.models import Tag
+from bookmarks.models import Bookmark, Tag
+from bookmarks.services import tag_cloud_cache
 from bookmarks.utils import unique
 
 logger = logging.getLogger(__name__)
@@ -34,3 +38,59 @@ def get_or_create_tag(name: str, user: User):
         )
         logger.error(message)
         return first_tag
+
+
+def update_tag_counts(tag_ids: Iterable[int] | QuerySet):
+    """
+    Recalculates the denormalized bookmark counts of the given tags. Must be
+    called after changing bookmark -> tag relationships, or after changing the
+    archived or shared state of bookmarks.
+    """
+    _update_counts(Tag.objects.filter(id__in=tag_ids))
+
+
+def update_tag_counts_for_bookmarks(bookmark_ids: Iterable[int] | QuerySet):
+    BookmarkTag = Bookmark.tags.through
+    tag_ids = BookmarkTag.objects.filter(bookmark_id__in=bookmark_ids).values("tag_id")
+    update_tag_counts(tag_ids)
+
+
+def get_tag_ids_for_bookmarks(bookmark_ids: Iterable[int] | QuerySet) -> list[int]:
+    # Use before deleting bookmarks or relationships, to know which counts
+    # need to be updated afterwards
+    BookmarkTag = Bookmark.tags.through
+    return list(
+        BookmarkTag.objects.filter(bookmark_id__in=bookmark_ids)
+        .values_list("tag_id", flat=True)
+        .distinct()
+    )
+
+
+def rebuild_tag_counts(user: User | None = None):
+    query_set = Tag.objects.all()
+    if user is not None:
+        query_set = query_set.filter(owner=user)
+    _update_counts(query_set)
+
+
+def _update_counts(query_set: QuerySet):
+    updated = query_set.update(
+        active_count=_count_subquery(Q(bookmark__is_archived=False)),
+        archived_count=_count_subquery(Q(bookmark__is_archived=True)),
+        shared_count=_count_subquery(Q(bookmark__shared=True)),
+    )
+    if not updated:
+        return
+    owner_ids = query_set.values_list("owner_id", flat=True).distinct()
+    tag_cloud_cache.invalidate_users(owner_ids)
+
+
+def _count_subquery(condition: Q):
+    BookmarkTag = Bookmark.tags.through
+    counts = (
+        BookmarkTag.objects.filter(condition, tag_id=OuterRef("pk"))
+        .values("tag_id")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    return Coalesce(Subquery(counts), 0)
@@ -1,22 +1,38 @@
 import functools
 import logging
+import os
+import tempfile
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 
 import waybackpy
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.db import connections
 from django.db.models import Q
 from django.utils import timezone
 from huey import crontab
 from huey.contrib.djhuey import HUEY as huey
-from huey.exceptions import TaskLockedException
+from huey.exceptions import RetryTask, TaskLockedException
 from waybackpy.exceptions import TooManyRequestsError, WaybackError
 
 from bookmarks.models import Bookmark, BookmarkAsset, UserProfile
-from bookmarks.services import assets, favicon_loader, preview_image_loader
+from bookmarks.services import (
+    assets,
+    favicon_loader,
+    fetch_scheduler,
+    preview_image_loader,
+    website_loader,
+)
+from bookmarks.services.fetch_scheduler import FetchRateLimited
 from bookmarks.services.website_loader import DEFAULT_USER_AGENT, load_website_metadata
 
 logger = logging.getLogger(__name__)
 
+BULK_TASK_CHUNK_SIZE = 100
+
 
 # Create custom decorator for Huey tasks that implements exponential backoff
 # Taken from: https://huey.readthedocs.io/en/latest/guide.html#tips-and-tricks
@@ -31,7 +47,13 @@ def task(retries=5, retry_delay=15, retry_backoff=4):
         def inner(*args, **kwargs):
             task = kwargs.pop("task")
             try:
-                return fn(*args, **kwargs)
+                with fetch_scheduler.scheduler.scope():
+                    return fn(*args, **kwargs)
+            except FetchRateLimited as exc:
+                # Schedule the task again once the rate limit allows, without
+                # reducing the number of retries
+                logger.info(f"{exc}, rescheduling task. task={task.id}")
+                raise RetryTask(delay=exc.delay) from exc
             except TaskLockedException as exc:
                 # Task locks are currently only used as workaround to enforce
                 # running specific types of tasks (e.g. singlefile snapshots)
@@ -125,6 +147,22 @@ def is_preview_feature_active(user: User) -> bool:
     )
 
 
+def _schedule_in_chunks(chunk_task, bookmarks):
+    # Schedule one task per chunk of bookmarks instead of one task per
+    # bookmark, which would write a huge number of tasks to the task queue
+    # when processing all bookmarks of a user, for example after an import
+    chunk = []
+    for bookmark_id in bookmarks.values_list("id", flat=True).iterator(
+        chunk_size=BULK_TASK_CHUNK_SIZE
+    ):
+        chunk.append(bookmark_id)
+        if len(chunk) == BULK_TASK_CHUNK_SIZE:
+            chunk_task(chunk)
+            chunk = []
+    if chunk:
+        chunk_task(chunk)
+
+
 def load_favicon(user: User, bookmark: Bookmark):
     if is_favicon_feature_active(user):
         _load_favicon_task(bookmark.id)
@@ -149,6 +187,62 @@ def _load_favicon_task(bookmark_id: int):
         )
 
 
+@task()
+def _load_favicons_task(bookmark_ids: list[int]):
+    # Favicons are stored per origin, so load the favicon only once for all
+    # bookmarks of the same origin
+    bookmark_ids_by_origin = defaultdict(list)
+    bookmarks = Bookmark.objects.filter(id__in=bookmark_ids).values_list("id", "url")
+    for bookmark_id, url in bookmarks:
+        origin = favicon_loader.get_favicon_origin(url)
+        bookmark_ids_by_origin[origin].append(bookmark_id)
+
+    origins = list(bookmark_ids_by_origin.keys())
+    for index, origin in enumerate(origins):
+        origin_bookmark_ids = bookmark_ids_by_origin[origin]
+        try:
+            _load_origin_favicon(origin, origin_bookmark_ids)
+        except FetchRateLimited as error:
+            # Schedule the remaining bookmarks of the chunk for later
+            remaining_ids = [
+                bookmark_id
+                for remaining_origin in origins[index:]
+                for bookmark_id in bookmark_ids_by_origin[remaining_origin]
+            ]
+            logger.info(f"{error}, rescheduling {len(remaining_ids)} bookmarks")
+            _load_favicons_task.schedule(args=(remaining_ids,), delay=error.delay)
+            return
+        except Exception as error:
+            # Retry failed origins separately, so that a single failure
+            # doesn't load favicons for the whole chunk again
+            logger.warning(
+                f"Failed to load favicon for origin, scheduling retry. origin={origin}",
+                exc_info=error,
+            )
+            _load_origin_favicon_task(origin, origin_bookmark_ids)
+
+
+@task()
+def _load_origin_favicon_task(origin: str, bookmark_ids: list[int]):
+    _load_origin_favicon(origin, bookmark_ids)
+
+
+def _load_origin_favicon(origin: str, bookmark_ids: list[int]):
+    logger.info(f"Load favicon for origin. origin={origin}")
+
+    new_favicon_file = favicon_loader.load_favicon(origin)
+
+    updated_count = (
+        Bookmark.objects.filter(id__in=bookmark_ids)
+        .exclude(favicon_file=new_favicon_file)
+        .update(favicon_file=new_favicon_file)
+    )
+    if updated_count:
+        logger.info(
+            f"Successfully updated favicon for bookmarks. origin={origin} icon={new_favicon_file} count={updated_count}"
+        )
+
+
 def schedule_bookmarks_without_favicons(user: User):
     if is_favicon_feature_active(user):
         _schedule_bookmarks_without_favicons_task(user.id)
@@ -159,10 +253,8 @@ def _schedule_bookmarks_without_favicons_task(user_id: int):
     user = User.objects.get(id=user_id)
     bookmarks = Bookmark.objects.filter(favicon_file__exact="", owner=user)
 
-    # TODO: Implement bulk task creation
-    for bookmark in bookmarks:
-        _load_favicon_task(bookmark.id)
-        pass
+    # Sort by URL, so that bookmarks of the same origin end up in the same chunk
+    _schedule_in_chunks(_load_favicons_task, bookmarks.order_by("url"))
 
 
 def schedule_refresh_favicons(user: User):
@@ -175,9 +267,8 @@ def _schedule_refresh_favicons_task(user_id: int):
     user = User.objects.get(id=user_id)
     bookmarks = Bookmark.objects.filter(owner=user)
 
-    # TODO: Implement bulk task creation
-    for bookmark in bookmarks:
-        _load_favicon_task(bookmark.id)
+    # Sort by URL, so that bookmarks of the same origin end up in the same chunk
+    _schedule_in_chunks(_load_favicons_task, bookmarks.order_by("url"))
 
 
 def load_preview_image(user: User, bookmark: Bookmark):
@@ -192,6 +283,32 @@ def _load_preview_image_task(bookmark_id: int):
     except Bookmark.DoesNotExist:
         return
 
+    _load_preview_image(bookmark)
+
+
+@task()
+def _load_preview_images_task(bookmark_ids: list[int]):
+    bookmarks = list(Bookmark.objects.filter(id__in=bookmark_ids))
+    for index, bookmark in enumerate(bookmarks):
+        try:
+            _load_preview_image(bookmark)
+        except FetchRateLimited as error:
+            # Schedule the remaining bookmarks of the chunk for later
+            remaining_ids = [bookmark.id for bookmark in bookmarks[index:]]
+            logger.info(f"{error}, rescheduling {len(remaining_ids)} bookmarks")
+            _load_preview_images_task.schedule(args=(remaining_ids,), delay=error.delay)
+            return
+        except Exception as error:
+            # Retry failed bookmarks individually, so that a single failure
+            # doesn't load preview images for the whole chunk again
+            logger.warning(
+                f"Failed to load preview image for bookmark, scheduling retry. url={bookmark.url}",
+                exc_info=error,
+            )
+            _load_preview_image_task(bookmark.id)
+
+
+def _load_preview_image(bookmark: Bookmark):
     logger.info(f"Load preview image for bookmark. url={bookmark.url}")
 
     new_preview_image_file = preview_image_loader.load_preview_image(bookmark.url)
@@ -217,12 +334,7 @@ def _schedule_bookmarks_without_previews_task(user_id: int):
         owner=user,
     )
 
-    # TODO: Implement bulk task creation
-    for bookmark in bookmarks:
-        try:
-            _load_preview_image_task(bookmark.id)
-        except Exception as exc:
-            logging.exception(exc)
+    _schedule_in_chunks(_load_preview_images_task, bookmarks)
 
 
 def refresh_metadata(bookmark: Bookmark):
@@ -239,7 +351,7 @@ def _refresh_metadata_task(bookmark_id: int):
 
     logger.info(f"Refresh metadata for bookmark. url={bookmark.url}")
 
-    metadata = load_website_metadata(bookmark.url)
+    metadata = load_website_metadata(bookmark.url, ignore_cache=True)
     if metadata.title:
         bookmark.title = metadata.title
     if metadata.description:
@@ -250,6 +362,62 @@ def _refresh_metadata_task(bookmark_id: int):
     logger.info(f"Successfully refreshed metadata for bookmark. url={bookmark.url}")
 
 
+def refresh_bookmarks_metadata(user: User, bookmarks):
+    if not settings.LD_DISABLE_BACKGROUND_TASKS:
+        _schedule_in_chunks(
+            functools.partial(_refresh_metadata_batch_task, user.id), bookmarks
+        )
+
+
+@task()
+def _refresh_metadata_batch_task(user_id: int, bookmark_ids: list[int]):
+    user = User.objects.get(id=user_id)
+    bookmarks = list(Bookmark.objects.filter(id__in=bookmark_ids, owner=user))
+
+    logger.info(f"Refresh metadata for bookmarks. count={len(bookmarks)}")
+
+    results = website_loader.load_website_metadata_batch(
+        [bookmark.url for bookmark in bookmarks], ignore_cache=True
+    )
+
+    now = timezone.now()
+    updated_bookmarks = []
+    rate_limited_ids = []
+    retry_delay = 0
+    for bookmark in bookmarks:
+        metadata = results[bookmark.url]
+        if isinstance(metadata, FetchRateLimited):
+            rate_limited_ids.append(bookmark.id)
+            retry_delay = max(retry_delay, metadata.delay)
+            continue
+        if metadata.title:
+            bookmark.title = metadata.title
+        if metadata.description:
+            bookmark.description = metadata.description
+        bookmark.date_modified = now
+        updated_bookmarks.append(bookmark)
+
+    Bookmark.objects.bulk_update(
+        updated_bookmarks, ["title", "description", "date_modified"]
+    )
+    logger.info(
+        f"Successfully refreshed metadata for bookmarks. count={len(updated_bookmarks)}"
+    )
+
+    # Metadata has just been cached, so loading preview images only needs to
+    # download the images
+    if updated_bookmarks and is_preview_feature_active(user):
+        _load_preview_images_task([bookmark.id for bookmark in updated_bookmarks])
+
+    if rate_limited_ids:
+        logger.info(
+            f"Rate limited, rescheduling metadata refresh. count={len(rate_limited_ids)}"
+        )
+        _refresh_metadata_batch_task.schedule(
+            args=(user_id, rate_limited_ids), delay=retry_delay
+        )
+
+
 def is_html_snapshot_feature_active() -> bool:
     return settings.LD_ENABLE_SNAPSHOTS and not settings.LD_DISABLE_BACKGROUND_TASKS
 
@@ -274,24 +442,124 @@ def create_html_snapshots(bookmark_list: list[Bookmark]):
     BookmarkAsset.objects.bulk_create(assets_to_create)
 
 
-# singe-file does not support running multiple instances in parallel, so we can
-# not queue up multiple snapshot tasks at once. Instead, schedule a periodic
-# task that grabs a number of pending assets and creates snapshots for them in
-# sequence. The task uses a lock to ensure that a new task isn't scheduled
-# before the previous one has finished.
+SNAPSHOT_CLAIM_CHUNK_SIZE = 100
+# Maximum number of snapshots each worker creates per batch. The task lock is
+# released between batches, so that a large backlog doesn't block the lock, and
+# the task queue, until all snapshots are created.
+SNAPSHOT_BATCH_SIZE_PER_WORKER = 10
+
+
+# single-file can only run multiple instances in parallel if each instance uses
+# its own browser profile, so we can not queue up individual snapshot tasks.
+# Instead, schedule a periodic task that starts a pool of workers, each with
+# its own home directory, which claim pending assets and create snapshots for
+# them until the batch is done or no pending assets are left. The task uses a
+# lock to ensure that a new pool isn't started before the previous one has
+# finished. If pending assets are left after a batch, the task is enqueued
+# again to continue with the next batch, instead of waiting for the next
+# scheduled run.
 @huey.periodic_task(crontab(minute="*"))
-@huey.lock_task("schedule-html-snapshots-lock")
 def _schedule_html_snapshots_task():
-    # Get five pending assets
-    assets = BookmarkAsset.objects.filter(status=BookmarkAsset.STATUS_PENDING).order_by(
-        "date_created"
-    )[:5]
+    try:
+        with huey.lock_task("schedule-html-snapshots-lock"):
+            pool = _create_html_snapshots_batch()
+    except TaskLockedException:
+        logger.debug("Previous HTML snapshot batch is still running")
+        return
+
+    # Wait for the next scheduled run if snapshots were postponed, for example
+    # because a website was rate limited, to not retry them right away
+    if pool.batch_exhausted and not pool.postponed:
+        _schedule_html_snapshots_task()
+
+
+def _create_html_snapshots_batch() -> "_SnapshotWorkerPool":
+    concurrency = max(1, settings.LD_SNAPSHOT_CONCURRENCY)
+    pool = _SnapshotWorkerPool(concurrency * SNAPSHOT_BATCH_SIZE_PER_WORKER)
+
+    if concurrency == 1:
+        # A single instance uses the default browser profile
+        pool.run_worker(None)
+        return pool
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        home_dirs = [_get_snapshot_worker_home_dir(i) for i in range(concurrency)]
+        # Consume results to raise errors of the workers
+        list(executor.map(pool.run_isolated_worker, home_dirs))
+    return pool
+
+
+class _SnapshotWorkerPool:
+    def __init__(self, batch_size: int):
+        self._lock = threading.Lock()
+        self._attempted_ids = set()
+        self._remaining = batch_size
+        self.postponed = False
+
+    @property
+    def batch_exhausted(self) -> bool:
+        return self._remaining <= 0
+
+    def run_worker(self, home_dir: str | None):
+        while (asset_id := self.claim()) is not None:
+            try:
+                # Use a fetch scope per snapshot, so that workers don't hold on
+                # to a fetch slot while waiting for single-file
+                with fetch_scheduler.scheduler.scope():
+                    _create_html_snapshot_task(asset_id, home_dir)
+            finally:
+                pending = BookmarkAsset.objects.filter(
+                    id=asset_id, status=BookmarkAsset.STATUS_PENDING
+                )
+                if pending.exists():
+                    self.postponed = True
+                BookmarkAsset.objects.filter(id=asset_id).update(date_claimed=None)
+
+    def run_isolated_worker(self, home_dir: str):
+        try:
+            self.run_worker(home_dir)
+        finally:
+            # Close the database connections opened by the worker thread
+            connections.close_all()
+
+    def claim(self) -> int | None:
+        """
+        Returns the ID of the oldest pending asset that has not been claimed
+        yet, or None if the batch is done or there are no pending assets left.
+        """
+        with self._lock:
+            if self._remaining <= 0:
+                return None
+            self._remaining -= 1
+
+        # Claims expire in case a process stops before releasing them
+        now = timezone.now()
+        claim_timeout = timedelta(seconds=settings.LD_SINGLEFILE_TIMEOUT_SEC + 60)
+        claimable = BookmarkAsset.objects.filter(
+            Q(date_claimed__isnull=True) | Q(date_claimed__lt=now - claim_timeout),
+            status=BookmarkAsset.STATUS_PENDING,
+        )
+        pending_ids = claimable.order_by("date_created").values_list("id", flat=True)
+        for asset_id in pending_ids.iterator(chunk_size=SNAPSHOT_CLAIM_CHUNK_SIZE):
+            # Assets that are still pending after an attempt, e.g. because
+            # fetching was rate limited, are picked up by the next run
+            with self._lock:
+                if asset_id in self._attempted_ids:
+                    continue
+                self._attempted_ids.add(asset_id)
+
+            # Only one worker can update the row, in case another process is
+            # creating snapshots at the same time
+            if claimable.filter(id=asset_id).update(date_claimed=now) == 1:
+                return asset_id
+        return None
+
 
-    for asset in assets:
-        _create_html_snapshot_task(asset.id)
+def _get_snapshot_worker_home_dir(index: int) -> str:
+    return os.path.join(tempfile.gettempdir(), "linkding-snapshots", f"worker-{index}")
 
 
-def _create_html_snapshot_task(asset_id: int):
+def _create_html_snapshot_task(asset_id: int, home_dir: str | None = None):
     try:
         asset = BookmarkAsset.objects.get(id=asset_id)
     except BookmarkAsset.DoesNotExist:
@@ -300,11 +568,14 @@ def _create_html_snapshot_task(asset_id: int):
     logger.info(f"Create HTML snapshot for bookmark. url={asset.bookmark.url}")
 
     try:
-        assets.create_snapshot(asset)
+        assets.create_snapshot(asset, home_dir)
 
         logger.info(
             f"Successfully created HTML snapshot for bookmark. url={asset.bookmark.url}"
         )
+    except FetchRateLimited as error:
+        # Asset stays pending and is picked up by the next scheduled run
+        logger.info(f"{error}, postponing HTML snapshot. url={asset.bookmark.url}")
     except Exception as error:
         logger.error(
             f"Failed to HTML snapshot for bookmark. url={asset.bookmark.url}",
@@ -1,13 +1,21 @@
+import codecs
+import contextvars
 import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from functools import lru_cache
 from urllib.parse import urljoin
 
 import requests
-from bs4 import BeautifulSoup
 from charset_normalizer import from_bytes
+from django.conf import settings
+from django.db import connections
 from django.utils import timezone
 
+from bookmarks.services import http_client, metadata_cache
+from bookmarks.services.fetch_scheduler import FetchRateLimited
+from bookmarks.services.head_parser import parse_head
+
 logger = logging.getLogger(__name__)
 
 
@@ -17,6 +25,7 @@ class WebsiteMetadata:
     title: str | None
     description: str | None
     preview_image: str | None
+    content_type: str | None = None
 
     def to_dict(self):
         return {
@@ -28,64 +37,98 @@ class WebsiteMetadata:
 
 
 def load_website_metadata(url: str, ignore_cache: bool = False):
-    if ignore_cache:
-        return _load_website_metadata(url)
-    return _load_website_metadata_cached(url)
+    # Caching metadata avoids scraping again when saving bookmarks, in case the
+    # metadata was already scraped to show preview values in the bookmark form
+    if not ignore_cache:
+        cached_metadata = metadata_cache.get(url)
+        if cached_metadata == metadata_cache.FAILURE_MARKER:
+            return _empty_metadata(url)
+        if cached_metadata is not None:
+            return cached_metadata
 
+    try:
+        metadata = _load_website_metadata(url)
+    except FetchRateLimited:
+        # Not a failure of the website, let the task try again later
+        raise
+    except Exception as error:
+        logger.debug(f"Failed to load website metadata. url={url}", exc_info=error)
+        metadata_cache.set_failure(url)
+        return _empty_metadata(url)
+
+    metadata_cache.set(url, metadata)
+    return metadata
+
+
+def load_website_metadata_batch(urls: list[str], ignore_cache: bool = False):
+    """
+    Loads the metadata of multiple websites concurrently. Returns a dict that
+    maps each URL to its metadata, or to the FetchRateLimited error if loading
+    the website was rate limited.
+    """
+
+    def load(url: str):
+        try:
+            return load_website_metadata(url, ignore_cache=ignore_cache)
+        except FetchRateLimited as error:
+            return error
+        finally:
+            # Close database connections opened by the worker thread, e.g. by
+            # the database cache backend
+            connections.close_all()
+
+    with ThreadPoolExecutor(
+        max_workers=settings.LD_METADATA_REFRESH_CONCURRENCY
+    ) as executor:
+        # Run each load in a copy of the current context, so that background
+        # tasks apply their fetch limits to the worker threads as well
+        futures = {
+            url: executor.submit(contextvars.copy_context().run, load, url)
+            for url in dict.fromkeys(urls)
+        }
+        return {url: future.result() for url, future in futures.items()}
 
-# Caching metadata avoids scraping again when saving bookmarks, in case the
-# metadata was already scraped to show preview values in the bookmark form
-@lru_cache(maxsize=10)
-def _load_website_metadata_cached(url: str):
-    return _load_website_metadata(url)
+
+def _empty_metadata(url: str):
+    return WebsiteMetadata(url=url, title=None, description=None, preview_image=None)
 
 
 def _load_website_metadata(url: str):
-    title = None
-    description = None
-    preview_image = None
-    try:
-        start = timezone.now()
-        page_text = load_page(url)
-        end = timezone.now()
-        logger.debug(f"Load duration: {end - start}")
-
-        start = timezone.now()
-        soup = BeautifulSoup(page_text, "html.parser")
-
-        if soup.title and soup.title.string:
-            title = soup.title.string.strip()
-        description_tag = soup.find("meta", attrs={"name": "description"})
-        description = (
-            description_tag["content"].strip()
-            if description_tag and description_tag["content"]
-            else None
+    start = timezone.now()
+    page = load_page(url)
+    end = timezone.now()
+    logger.debug(f"Load duration: {end - start}")
+
+    if page.text is None:
+        return WebsiteMetadata(
+            url=url,
+            title=None,
+            description=None,
+            preview_image=None,
+            content_type=page.content_type,
         )
 
-        if not description:
-            description_tag = soup.find("meta", attrs={"property": "og:description"})
-            description = (
-                description_tag["content"].strip()
-                if description_tag and description_tag["content"]
-                else None
-            )
-
-        image_tag = soup.find("meta", attrs={"property": "og:image"})
-        preview_image = image_tag["content"].strip() if image_tag else None
-        if (
-            preview_image
-            and not preview_image.startswith("http://")
-            and not preview_image.startswith("https://")
-        ):
-            preview_image = urljoin(url, preview_image)
-
-        end = timezone.now()
-        logger.debug(f"Parsing duration: {end - start}")
-    except Exception:
-        pass
+    start = timezone.now()
+    head = parse_head(page.text)
+    title = head.title
+    description = head.description or head.og_description
+    preview_image = head.og_image
+    if (
+        preview_image
+        and not preview_image.startswith("http://")
+        and not preview_image.startswith("https://")
+    ):
+        preview_image = urljoin(url, preview_image)
+
+    end = timezone.now()
+    logger.debug(f"Parsing duration: {end - start}")
 
     return WebsiteMetadata(
-        url=url, title=title, description=description, preview_image=preview_image
+        url=url,
+        title=title,
+        description=description,
+        preview_image=preview_image,
+        content_type=page.content_type,
     )
 
 
@@ -93,25 +136,48 @@ CHUNK_SIZE = 50 * 1024
 MAX_CONTENT_LIMIT = 5000 * 1024
 
 
-def load_page(url: str):
+@dataclass
+class PageProbe:
+    content_type: str | None
+    # Decoded head of the document, None if the page is not a text document
+    text: str | None
+
+
+def load_page(url: str) -> PageProbe:
+    """
+    Loads a page once, to determine its content type and read the head of the
+    document for extracting metadata. The result is stored as part of the
+    website metadata, so that loading preview images and creating snapshots
+    can use it instead of requesting the page again.
+    """
     headers = fake_request_headers()
-    size = 0
-    content = None
+    end_of_head = b"</head>"
+    content = bytearray()
     iteration = 0
     # Use with to ensure request gets closed even if it's only read partially
-    with requests.get(url, timeout=10, headers=headers, stream=True) as r:
+    with http_client.get(url, timeout=10, headers=headers, stream=True) as r:
+        content_type = _get_content_type(r) or None
+        if not _is_text_content_type(content_type):
+            # Only the content type is needed to snapshot documents like PDFs,
+            # so don't download them
+            logger.debug(f"Skip reading document with content type {content_type}")
+            return PageProbe(content_type=content_type, text=None)
+
         for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
-            size += len(chunk)
+            # Only search the new chunk, including the end of the previous one
+            # in case the tag is split between chunks
+            search_start = max(0, len(content) - len(end_of_head) + 1)
+            content += chunk
+            size = len(content)
             iteration = iteration + 1
-            content = chunk if content is None else content + chunk
 
             logger.debug(f"Loaded chunk (iteration={iteration}, total={size / 1024})")
 
             # Stop reading if we have parsed end of head tag
-            end_of_head = b"</head>"
-            if end_of_head in content:
+            end_of_head_index = content.find(end_of_head, search_start)
+            if end_of_head_index >= 0:
                 logger.debug(f"Found closing head tag after {size} bytes")
-                content = content.split(end_of_head)[0] + end_of_head
+                del content[end_of_head_index + len(end_of_head) :]
                 break
             # Stop reading if we exceed limit
             if size > MAX_CONTENT_LIMIT:
@@ -120,14 +186,106 @@ def load_page(url: str):
         if hasattr(r, "_content_consumed"):
             logger.debug(f"Request consumed: {r._content_consumed}")
 
+    return PageProbe(content_type=content_type, text=decode_page(content))
+
+
+# Codecs that remove the BOM when decoding
+BOMS = [
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+CHARSET_DECLARATION_LIMIT = 4 * 1024
+CHARSET_DECLARATION_PATTERN = re.compile(
+    rb"""<meta[^>]+charset\s*=\s*["']?\s*([a-z0-9_:.-]+)""", re.IGNORECASE
+)
+# Browsers decode pages that declare these labels differently than Python's
+# codecs of the same name, see https://encoding.spec.whatwg.org/#names-and-labels
+WINDOWS_1252_LABELS = {
+    "ansi_x3.4-1968",
+    "ascii",
+    "cp819",
+    "csisolatin1",
+    "ibm819",
+    "iso-8859-1",
+    "iso-ir-100",
+    "iso8859-1",
+    "iso88591",
+    "iso_8859-1",
+    "iso_8859-1:1987",
+    "l1",
+    "latin1",
+    "us-ascii",
+    "x-user-defined",
+}
+# A page that declares UTF-16 in a meta tag can't be UTF-16, otherwise the
+# declaration itself could not be read as ASCII
+UTF_16_LABELS = {
+    "csunicode",
+    "iso-10646-ucs-2",
+    "ucs-2",
+    "unicode",
+    "unicodefeff",
+    "unicodefffe",
+    "utf-16",
+    "utf-16be",
+    "utf-16le",
+}
+
+
+def decode_page(content: bytes) -> str:
+    start = timezone.now()
+    encoding, source = _get_declared_encoding(content)
+    if encoding:
+        try:
+            # Pages are cut off at a maximum size, which can split a multibyte
+            # character at the end. Decode incrementally, so that an incomplete
+            # trailing character is dropped instead of failing the fast path.
+            decoder = codecs.getincrementaldecoder(encoding)()
+            text = decoder.decode(content, final=False)
+            end = timezone.now()
+            logger.debug(f"Decoding duration ({source} {encoding}): {end - start}")
+            return text
+        except (LookupError, UnicodeError):
+            logger.debug(f"Failed to decode document using {source} {encoding}")
+
     # Use charset_normalizer to determine encoding that best matches the response content
     # Several sites seem to specify the response encoding incorrectly, so we ignore it and use custom logic instead
     # This is different from Response.text which does respect the encoding specified in the response first,
     # before trying to determine one
-    results = from_bytes(content or "")
+    results = from_bytes(content)
+    end = timezone.now()
+    logger.debug(f"Decoding duration (charset detection): {end - start}")
     return str(results.best())
 
 
+def _get_declared_encoding(content: bytes) -> tuple[str | None, str | None]:
+    for bom, encoding in BOMS:
+        if content.startswith(bom):
+            return encoding, "BOM"
+
+    match = CHARSET_DECLARATION_PATTERN.search(content, 0, CHARSET_DECLARATION_LIMIT)
+    if match:
+        encoding = match.group(1).decode("ascii").lower()
+        if encoding in WINDOWS_1252_LABELS:
+            encoding = "cp1252"
+        elif encoding in UTF_16_LABELS:
+            encoding = "utf-8"
+        return encoding, "meta charset"
+    return None, None
+
+
+def _get_content_type(response) -> str:
+    return response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+
+
+def _is_text_content_type(content_type: str | None) -> bool:
+    # Assume HTML if the server does not specify a content type
+    if not content_type:
+        return True
+    return content_type.startswith("text/") or content_type.endswith("xml")
+
+
 DEFAULT_USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/101.0.0.0 Safari/537.36"
 
 
@@ -146,27 +304,20 @@ def detect_content_type(url: str, timeout: int = 10) -> str | None:
     headers = fake_request_headers()
 
     try:
-        response = requests.head(
+        response = http_client.head(
             url, headers=headers, timeout=timeout, allow_redirects=True
         )
         if response.status_code == 200:
-            return (
-                response.headers.get("Content-Type", "").split(";")[0].strip().lower()
-            )
+            return _get_content_type(response)
     except requests.RequestException:
         pass
 
     try:
-        with requests.get(
+        with http_client.get(
             url, headers=headers, timeout=timeout, stream=True, allow_redirects=True
         ) as response:
             if response.status_code == 200:
-                return (
-                    response.headers.get("Content-Type", "")
-                    .split(";")[0]
-                    .strip()
-                    .lower()
-                )
+                return _get_content_type(response)
     except requests.RequestException:
         pass
 
@@ -159,6 +159,22 @@ LD_DISABLE_URL_VALIDATION = os.getenv("LD_DISABLE_URL_VALIDATION", False) in (
     "1",
 )
 
+# Keyset pagination for bookmark lists
+LD_ENABLE_KEYSET_PAGINATION = os.getenv("LD_ENABLE_KEYSET_PAGINATION", False) in (
+    True,
+    "True",
+    "true",
+    "1",
+)
+LD_KEYSET_PAGINATION_SKIP_COUNT = os.getenv(
+    "LD_KEYSET_PAGINATION_SKIP_COUNT", False
+) in (
+    True,
+    "True",
+    "true",
+    "1",
+)
+
 # Background task enabled setting
 LD_DISABLE_BACKGROUND_TASKS = os.getenv("LD_DISABLE_BACKGROUND_TASKS", False) in (
     True,
@@ -282,6 +298,75 @@ else:
 
 DATABASES = {"default": default_database}
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Caches are shared by the web server processes and the background task
+# processor, so the default backend stores entries in the data folder, which
+# works without running an additional service.
+
+# Use the database by default, the file backend counts all files in the cache
+# folder whenever an entry is added, which gets slow with many entries
+LD_CACHE_BACKEND = os.getenv("LD_CACHE_BACKEND", "database")
+LD_CACHE_LOCATION = os.getenv("LD_CACHE_LOCATION", None)
+LD_CACHE_OPTIONS = json.loads(os.getenv("LD_CACHE_OPTIONS") or "{}")
+# Website metadata, favicon and preview image validators and tag clouds share
+# the cache, so keep much more entries than Django's default of 300
+LD_CACHE_MAX_ENTRIES = int(os.getenv("LD_CACHE_MAX_ENTRIES", 20000))
+
+if LD_CACHE_BACKEND == "redis":
+    default_cache = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": LD_CACHE_LOCATION or "redis://localhost:6379",
+    }
+elif LD_CACHE_BACKEND == "database":
+    # Requires running the createcachetable management command, which the
+    # bootstrap script does on startup
+    default_cache = {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": LD_CACHE_LOCATION or "linkding_cache",
+    }
+elif LD_CACHE_BACKEND == "memory":
+    default_cache = {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+elif LD_CACHE_BACKEND == "none":
+    default_cache = {
+        "BACKEND": "django.core.cache.backends.dummy.DummyCache",
+    }
+else:
+    default_cache = {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": LD_CACHE_LOCATION or os.path.join(BASE_DIR, "data", "cache"),
+    }
+default_cache["KEY_PREFIX"] = "linkding"
+default_cache["OPTIONS"] = LD_CACHE_OPTIONS
+if LD_CACHE_BACKEND in ("file", "database", "memory"):
+    # Only these backends cull entries, the Redis client does not accept the
+    # option
+    default_cache["OPTIONS"] = {"MAX_ENTRIES": LD_CACHE_MAX_ENTRIES, **LD_CACHE_OPTIONS}
+
+CACHES = {"default": default_cache}
+
+# Number of websites to load at the same time when refreshing metadata of
+# multiple bookmarks
+LD_METADATA_REFRESH_CONCURRENCY = int(os.getenv("LD_METADATA_REFRESH_CONCURRENCY", 8))
+
+# Website metadata cache timeouts, provided in seconds
+LD_METADATA_CACHE_TTL = int(os.getenv("LD_METADATA_CACHE_TTL", 60 * 60 * 24))
+LD_METADATA_CACHE_FAILURE_TTL = int(os.getenv("LD_METADATA_CACHE_FAILURE_TTL", 60 * 5))
+
+# HTTP connection pooling and retries for loading websites, favicons, preview
+# images and snapshots
+LD_HTTP_POOL_CONNECTIONS = int(os.getenv("LD_HTTP_POOL_CONNECTIONS", 10))
+LD_HTTP_POOL_MAXSIZE = int(os.getenv("LD_HTTP_POOL_MAXSIZE", 10))
+LD_HTTP_RETRIES = int(os.getenv("LD_HTTP_RETRIES", 2))
+LD_HTTP_RETRY_BACKOFF = float(os.getenv("LD_HTTP_RETRY_BACKOFF", 0.5))
+
+# Rate limits for requests made by background tasks
+LD_FETCH_HOST_RATE = float(os.getenv("LD_FETCH_HOST_RATE", 2))
+LD_FETCH_HOST_BURST = int(os.getenv("LD_FETCH_HOST_BURST", 10))
+LD_FETCH_MAX_CONCURRENCY = int(os.getenv("LD_FETCH_MAX_CONCURRENCY", 4))
+
 SQLITE_ICU_EXTENSION_PATH = "./libicu.so"
 USE_SQLITE = default_database["ENGINE"] == "django.db.backends.sqlite3"
 USE_SQLITE_ICU_EXTENSION = USE_SQLITE and os.path.exists(SQLITE_ICU_EXTENSION_PATH)
@@ -338,8 +423,22 @@ LD_SINGLEFILE_UBLOCK_OPTIONS = os.getenv(
 )
 LD_SINGLEFILE_OPTIONS = os.getenv("LD_SINGLEFILE_OPTIONS", "")
 LD_SINGLEFILE_TIMEOUT_SEC = float(os.getenv("LD_SINGLEFILE_TIMEOUT_SEC", 120))
+LD_SNAPSHOT_CONCURRENCY = int(os.getenv("LD_SNAPSHOT_CONCURRENCY", 1))
 LD_SNAPSHOT_PDF_MAX_SIZE = int(os.getenv("LD_SNAPSHOT_PDF_MAX_SIZE", 15728640))  # 15MB
 
+# Codec for compressing asset files, either gzip or zstd
+LD_ASSET_CODEC = os.getenv("LD_ASSET_CODEC", "gzip")
+LD_ASSET_ZSTD_LEVEL = int(os.getenv("LD_ASSET_ZSTD_LEVEL", 3))
+LD_ASSET_ZSTD_DICTIONARY_FOLDER = os.path.join(BASE_DIR, "data", "zstd-dictionaries")
+# Store asset files by the hash of their content, so that identical files are
+# only stored once
+LD_ASSET_DEDUPLICATION = os.getenv("LD_ASSET_DEDUPLICATION", False) in (
+    True,
+    "True",
+    "true",
+    "1",
+)
+
 # Monolith isn't used at the moment, as the local snapshot implementation
 # switched to single-file after the prototype. Keeping this around in case
 # it turns out to be useful in the future.
@@ -19,6 +19,15 @@ INTERNAL_IPS = [
     "127.0.0.1",
 ]
 
+# Use a process-local cache, unless configured otherwise. Tests run in
+# parallel processes, which would otherwise share cache entries.
+if "LD_CACHE_BACKEND" not in os.environ:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 STATICFILES_DIRS = [
     # Resolve theme files from style source folder
     os.path.join(BASE_DIR, "bookmarks", "styles"),
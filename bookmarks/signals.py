@@ -1,7 +1,12 @@
 from django.conf import settings
+from django.contrib.auth.models import User
 from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from bookmarks.models import Tag, UserProfile
+from bookmarks.services import tag_cloud_cache
+
 
 @receiver(connection_created)
 def extend_sqlite(connection=None, **kwargs):
@@ -19,3 +24,23 @@ def extend_sqlite(connection=None, **kwargs):
             # providing one will use a default collation from the ICU project
             # that works reasonably for multiple languages
             cursor.execute("SELECT icu_load_collation('', 'ICU');")
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, instance, **kwargs):
+    tag_cloud_cache.invalidate_users([instance.owner_id])
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, **kwargs):
+    # Databases may reuse the ID of a deleted user, so make sure a new user
+    # never sees cached tags
+    if created:
+        tag_cloud_cache.invalidate_users([instance.id])
+
+
+@receiver(post_save, sender=UserProfile)
+def user_profile_changed(sender, instance, **kwargs):
+    # Sharing settings determine whose tags show up in the shared tag cloud
+    tag_cloud_cache.invalidate_shared()
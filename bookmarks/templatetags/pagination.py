@@ -4,13 +4,15 @@ from django import template
 from django.core.paginator import Page
 from django.http import QueryDict
 
+from bookmarks.pagination import KeysetPage
+
 NUM_ADJACENT_PAGES = 2
 
 register = template.Library()
 
 
 @register.inclusion_tag("shared/pagination.html", name="pagination", takes_context=True)
-def pagination(context, page: Page):
+def pagination(context, page: Page | KeysetPage):
     request = context["request"]
     pagination_frame = context.get("pagination_frame", "_top")
     base_url = request.path
@@ -20,6 +22,25 @@ def pagination(context, page: Page):
     query_params.pop("page", None)
     query_params.pop("details", None)
 
+    if isinstance(page, KeysetPage):
+        # Keyset pages only link to the previous and next page using cursors
+        prev_link = (
+            _generate_link(base_url, query_params, page.previous_cursor)
+            if page.has_previous()
+            else None
+        )
+        next_link = (
+            _generate_link(base_url, query_params, page.next_cursor)
+            if page.has_next()
+            else None
+        )
+        return {
+            "prev_link": prev_link,
+            "next_link": next_link,
+            "page_links": [],
+            "pagination_frame": pagination_frame,
+        }
+
     prev_link = (
         _generate_link(base_url, query_params, page.previous_page_number())
         if page.has_previous()
@@ -95,7 +116,9 @@ def get_visible_page_numbers(current_page_number: int, num_pages: int) -> [int]:
     return reduce(append_page, visible_pages, [])
 
 
-def _generate_link(base_url: str, query_params: QueryDict, page_number: int) -> str:
+def _generate_link(
+    base_url: str, query_params: QueryDict, page_number: int | str
+) -> str:
     query_params = query_params.copy()
     query_params["page"] = page_number
     return f"{base_url}?{query_params.urlencode()}"
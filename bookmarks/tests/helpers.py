@@ -1,4 +1,3 @@
-import gzip
 import logging
 import os
 import random
@@ -23,6 +22,8 @@ from bookmarks.models import (
     Tag,
     User,
 )
+from bookmarks.services import asset_codecs
+from bookmarks.services.tags import update_tag_counts
 
 
 class BookmarkFactoryMixin:
@@ -100,6 +101,7 @@ class BookmarkFactoryMixin:
         for tag in tags:
             bookmark.tags.add(tag)
         bookmark.save()
+        update_tag_counts([tag.id for tag in tags])
         return bookmark
 
     def setup_numbered_bookmarks(
@@ -213,6 +215,7 @@ class BookmarkFactoryMixin:
         display_name: str = None,
         status: str = BookmarkAsset.STATUS_COMPLETE,
         gzip: bool = False,
+        codec: str = "",
     ):
         if date_created is None:
             date_created = timezone.now()
@@ -230,14 +233,16 @@ class BookmarkFactoryMixin:
             display_name=display_name,
             status=status,
             gzip=gzip,
+            codec=codec,
         )
         asset.save()
         return asset
 
     def setup_asset_file(self, asset: BookmarkAsset, file_content: str = "test"):
         filepath = os.path.join(settings.LD_ASSET_FOLDER, asset.file)
-        if asset.gzip:
-            with gzip.open(filepath, "wb") as f:
+        codec = asset_codecs.get_asset_codec(asset)
+        if codec:
+            with codec.open_writer(filepath) as f:
                 f.write(file_content.encode())
         else:
             with open(filepath, "w") as f:
@@ -246,12 +251,8 @@ class BookmarkFactoryMixin:
     def read_asset_file(self, asset: BookmarkAsset):
         filepath = os.path.join(settings.LD_ASSET_FOLDER, asset.file)
 
-        if asset.gzip:
-            with gzip.open(filepath, "rb") as f:
-                return f.read()
-        else:
-            with open(filepath, "rb") as f:
-                return f.read()
+        with asset_codecs.open_asset_file(asset, filepath) as f:
+            return f.read()
 
     def get_asset_filesize(self, asset: BookmarkAsset):
         filepath = os.path.join(settings.LD_ASSET_FOLDER, asset.file)
@@ -0,0 +1,227 @@
+import gzip
+import os
+import tempfile
+from io import StringIO
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from bookmarks.models import BookmarkAsset
+from bookmarks.services import asset_codecs, assets
+from bookmarks.tests.helpers import BookmarkFactoryMixin
+
+
+def create_html_page(index: int) -> str:
+    return f"""
+    <!DOCTYPE html>
+    <html lang="en">
+    <head>
+        <meta charset="utf-8">
+        <title>Page {index}</title>
+        <link rel="stylesheet" href="/static/theme.css">
+    </head>
+    <body>
+        <nav class="navigation"><a href="/">Home</a><a href="/about">About</a></nav>
+        <main class="content"><h1>Article {index}</h1><p>{"Text " * index}</p></main>
+        <footer class="footer">Copyright example.com</footer>
+    </body>
+    </html>
+    """
+
+
+class AssetCodecsTestCase(TestCase, BookmarkFactoryMixin):
+    def setUp(self) -> None:
+        self.setup_temp_assets_dir()
+        self.dictionary_dir = tempfile.mkdtemp(dir=self.assets_dir)
+        self.dictionary_override = override_settings(
+            LD_ASSET_ZSTD_DICTIONARY_FOLDER=self.dictionary_dir
+        )
+        self.dictionary_override.enable()
+        self.addCleanup(self.dictionary_override.disable)
+
+    def setup_html_snapshots(self, count: int, codec: str = asset_codecs.GZIP):
+        bookmark = self.setup_bookmark()
+        snapshots = []
+        for index in range(count):
+            asset = self.setup_asset(
+                bookmark,
+                content_type=BookmarkAsset.CONTENT_TYPE_HTML,
+                gzip=codec == asset_codecs.GZIP,
+                codec=codec,
+            )
+            self.setup_asset_file(asset, create_html_page(index))
+            snapshots.append(asset)
+        return snapshots
+
+    def test_get_codec(self):
+        self.assertIsInstance(
+            asset_codecs.get_codec(asset_codecs.GZIP), asset_codecs.GzipCodec
+        )
+
+        with self.assertRaises(ImproperlyConfigured):
+            asset_codecs.get_codec("unknown")
+
+    @override_settings(LD_ASSET_CODEC="unknown")
+    def test_get_default_codec_fails_for_unknown_codec(self):
+        with self.assertRaises(ImproperlyConfigured):
+            asset_codecs.get_default_codec()
+
+    def test_get_asset_codec(self):
+        bookmark = self.setup_bookmark()
+
+        asset = self.setup_asset(bookmark, codec=asset_codecs.GZIP)
+        self.assertEqual(asset_codecs.get_asset_codec(asset).name, asset_codecs.GZIP)
+
+        # assets from before codecs were recorded
+        asset = self.setup_asset(bookmark, gzip=True)
+        self.assertEqual(asset_codecs.get_asset_codec(asset).name, asset_codecs.GZIP)
+
+        asset = self.setup_asset(bookmark, gzip=False)
+        self.assertIsNone(asset_codecs.get_asset_codec(asset))
+
+    def test_open_legacy_gzip_asset_file(self):
+        bookmark = self.setup_bookmark()
+        asset = self.setup_asset(bookmark, gzip=True)
+        filepath = os.path.join(self.assets_dir, asset.file)
+        with gzip.open(filepath, "wb") as f:
+            f.write(b"gzip content")
+
+        with asset_codecs.open_asset_file(asset, filepath) as f:
+            self.assertEqual(f.read(), b"gzip content")
+
+    def test_zstd_round_trip(self):
+        codec = asset_codecs.get_codec(asset_codecs.ZSTD)
+        filepath = os.path.join(self.assets_dir, "test.html.zst")
+        content = create_html_page(1).encode()
+
+        with codec.open_writer(filepath) as f:
+            f.write(content)
+        with codec.open_reader(filepath) as f:
+            self.assertEqual(f.read(), content)
+
+    def test_zstd_uses_dictionary_the_file_was_compressed_with(self):
+        samples = [create_html_page(index).encode() for index in range(200)]
+        first_dictionary = asset_codecs.zstandard.train_dictionary(4096, samples)
+        asset_codecs.save_dictionary(first_dictionary)
+
+        codec = asset_codecs.get_codec(asset_codecs.ZSTD)
+        filepath = os.path.join(self.assets_dir, "test.html.zst")
+        with codec.open_writer(filepath) as f:
+            f.write(samples[0])
+
+        with open(filepath, "rb") as f:
+            frame = asset_codecs.zstandard.get_frame_parameters(f.read(18))
+        self.assertEqual(frame.dict_id, first_dictionary.dict_id())
+
+        # train another dictionary, file is still read with the first one
+        second_dictionary = asset_codecs.zstandard.train_dictionary(8192, samples[::-1])
+        second_path = asset_codecs.save_dictionary(second_dictionary)
+        os.utime(second_path, ns=(2**62, 2**62))
+        self.assertEqual(
+            asset_codecs.load_latest_dictionary().dict_id(),
+            second_dictionary.dict_id(),
+        )
+
+        with codec.open_reader(filepath) as f:
+            self.assertEqual(f.read(), samples[0])
+
+    @override_settings(LD_ASSET_CODEC=asset_codecs.ZSTD)
+    def test_upload_snapshot_with_zstd(self):
+        bookmark = self.setup_bookmark()
+        file_content = create_html_page(1).encode()
+
+        asset = assets.upload_snapshot(bookmark, file_content)
+
+        self.assertEqual(asset.codec, asset_codecs.ZSTD)
+        self.assertFalse(asset.gzip)
+        self.assertTrue(asset.file.endswith(".html.zst"))
+        self.assertEqual(self.read_asset_file(asset), file_content)
+
+    def test_recompress_asset(self):
+        [asset] = self.setup_html_snapshots(1)
+        asset.file = "snapshot.html.gz"
+        asset.save()
+        self.setup_asset_file(asset, create_html_page(1))
+        old_filepath = os.path.join(self.assets_dir, asset.file)
+
+        assets.recompress_asset(asset, asset_codecs.get_codec(asset_codecs.ZSTD))
+
+        asset.refresh_from_db()
+        self.assertEqual(asset.file, "snapshot.html.zst")
+        self.assertEqual(asset.codec, asset_codecs.ZSTD)
+        self.assertFalse(asset.gzip)
+        self.assertEqual(asset.file_size, self.get_asset_filesize(asset))
+        self.assertEqual(self.read_asset_file(asset), create_html_page(1).encode())
+        self.assertFalse(os.path.exists(old_filepath))
+
+    def test_recompress_assets_command(self):
+        snapshots = self.setup_html_snapshots(3)
+        uncompressed = self.setup_asset(self.setup_bookmark(), gzip=False)
+        self.setup_asset_file(uncompressed, "uncompressed")
+
+        out = StringIO()
+        call_command("recompress_assets", codec=asset_codecs.ZSTD, stdout=out)
+
+        self.assertIn("Recompressed 3 assets with zstd, 0 failed", out.getvalue())
+        for index, asset in enumerate(snapshots):
+            asset.refresh_from_db()
+            self.assertEqual(asset.codec, asset_codecs.ZSTD)
+            self.assertEqual(
+                self.read_asset_file(asset), create_html_page(index).encode()
+            )
+        uncompressed.refresh_from_db()
+        self.assertEqual(uncompressed.codec, "")
+        self.assertEqual(self.read_asset_file(uncompressed), b"uncompressed")
+
+    def test_recompress_assets_command_respects_limit(self):
+        self.setup_html_snapshots(3)
+
+        out = StringIO()
+        call_command("recompress_assets", codec=asset_codecs.ZSTD, limit=2, stdout=out)
+
+        self.assertIn("Recompressed 2 assets with zstd", out.getvalue())
+        self.assertEqual(
+            BookmarkAsset.objects.filter(codec=asset_codecs.ZSTD).count(), 2
+        )
+
+    def test_recompress_assets_command_fails_for_unknown_codec(self):
+        with self.assertRaises(CommandError):
+            call_command("recompress_assets", codec="unknown", stdout=StringIO())
+
+    def test_train_zstd_dictionary_command(self):
+        self.setup_html_snapshots(200)
+
+        out = StringIO()
+        call_command("train_zstd_dictionary", dictionary_size=4096, stdout=out)
+
+        dictionary = asset_codecs.load_latest_dictionary()
+        self.assertIsNotNone(dictionary)
+        self.assertIn(
+            f"Trained dictionary {dictionary.dict_id()} on 200 snapshots",
+            out.getvalue(),
+        )
+
+    def test_train_zstd_dictionary_command_without_snapshots(self):
+        with self.assertRaises(CommandError):
+            call_command("train_zstd_dictionary", stdout=StringIO())
+
+    @override_settings(LD_ASSET_DEDUPLICATION=True)
+    def test_recompress_shared_asset_file(self):
+        first = assets.upload_snapshot(self.setup_bookmark(), b"<html>Shared</html>")
+        second = assets.upload_snapshot(self.setup_bookmark(), b"<html>Shared</html>")
+        gzip_filepath = os.path.join(self.assets_dir, first.file)
+        codec = asset_codecs.get_codec(asset_codecs.ZSTD)
+
+        assets.recompress_asset(first, codec)
+
+        # file is still used by the second asset
+        self.assertTrue(os.path.exists(gzip_filepath))
+
+        assets.recompress_asset(second, codec)
+
+        self.assertEqual(first.file, second.file)
+        self.assertTrue(first.file.endswith(".html.zst"))
+        self.assertFalse(os.path.exists(gzip_filepath))
+        self.assertEqual(self.read_asset_file(second), b"<html>Shared</html>")
@@ -1,8 +1,8 @@
 import datetime
 import gzip
+import hashlib
 import os
 from datetime import timedelta
-from pathlib import Path
 from unittest import mock
 
 from django.core.files.uploadedfile import SimpleUploadedFile
@@ -10,7 +10,9 @@ from django.test import TestCase, override_settings
 from django.utils import timezone
 
 from bookmarks.models import BookmarkAsset
-from bookmarks.services import assets
+from bookmarks.services import assets, metadata_cache, singlefile
+from bookmarks.services.fetch_scheduler import FetchRateLimited
+from bookmarks.services.website_loader import WebsiteMetadata
 from bookmarks.tests.helpers import BookmarkFactoryMixin, disable_logging
 
 
@@ -22,16 +24,24 @@ class AssetServiceTestCase(TestCase, BookmarkFactoryMixin):
         self.html_content = "<html><body><h1>Hello, World!</h1></body></html>"
         self.pdf_content = b"%PDF-1.4 test pdf content"
 
-        self.mock_singlefile_create_snapshot_patcher = mock.patch(
-            "bookmarks.services.singlefile.create_snapshot",
+        self.mock_singlefile_stream_snapshot_patcher = mock.patch(
+            "bookmarks.services.singlefile.stream_snapshot",
         )
-        self.mock_singlefile_create_snapshot = (
-            self.mock_singlefile_create_snapshot_patcher.start()
+        self.mock_singlefile_stream_snapshot = (
+            self.mock_singlefile_stream_snapshot_patcher.start()
         )
-        self.mock_singlefile_create_snapshot.side_effect = lambda url, filepath: (
-            Path(filepath).write_text(self.html_content)
+        self.mock_singlefile_stream_snapshot.side_effect = lambda url, home_dir: iter(
+            [self.html_content.encode()]
         )
 
+        # Mock no cached website metadata by default, so that the content type
+        # is detected
+        self.mock_metadata_cache_get_patcher = mock.patch(
+            "bookmarks.services.metadata_cache.get",
+        )
+        self.mock_metadata_cache_get = self.mock_metadata_cache_get_patcher.start()
+        self.mock_metadata_cache_get.return_value = None
+
         # Mock detect_content_type to return text/html by default
         self.mock_detect_content_type_patcher = mock.patch(
             "bookmarks.services.assets.detect_content_type",
@@ -47,7 +57,8 @@ class AssetServiceTestCase(TestCase, BookmarkFactoryMixin):
         self.mock_is_pdf_content_type.return_value = False
 
     def tearDown(self) -> None:
-        self.mock_singlefile_create_snapshot_patcher.stop()
+        self.mock_singlefile_stream_snapshot_patcher.stop()
+        self.mock_metadata_cache_get_patcher.stop()
         self.mock_detect_content_type_patcher.stop()
         self.mock_is_pdf_content_type_patcher.stop()
 
@@ -99,15 +110,13 @@ class AssetServiceTestCase(TestCase, BookmarkFactoryMixin):
 
         assets.create_snapshot(asset)
 
-        expected_temp_filename = "snapshot_2023-08-11_214511_https___example.com.tmp"
-        expected_temp_filepath = os.path.join(self.assets_dir, expected_temp_filename)
         expected_filename = "snapshot_2023-08-11_214511_https___example.com.html.gz"
         expected_filepath = os.path.join(self.assets_dir, expected_filename)
 
-        # should call singlefile.create_snapshot with the correct arguments
-        self.mock_singlefile_create_snapshot.assert_called_once_with(
+        # should call singlefile.stream_snapshot with the correct arguments
+        self.mock_singlefile_stream_snapshot.assert_called_once_with(
             "https://example.com",
-            expected_temp_filepath,
+            None,
         )
 
         # should create gzip file in asset folder
@@ -117,8 +126,8 @@ class AssetServiceTestCase(TestCase, BookmarkFactoryMixin):
         with gzip.open(expected_filepath, "rb") as gz_file:
             self.assertEqual(gz_file.read().decode(), self.html_content)
 
-        # should remove temporary file
-        self.assertFalse(os.path.exists(expected_temp_filepath))
+        # should not leave temporary files
+        self.assertEqual(os.listdir(self.assets_dir), [expected_filename])
 
         # should update asset status and file
         asset.refresh_from_db()
@@ -136,7 +145,7 @@ class AssetServiceTestCase(TestCase, BookmarkFactoryMixin):
         asset = assets.create_snapshot_asset(bookmark)
         asset.save()
 
-        self.mock_singlefile_create_snapshot.side_effect = RuntimeError(
+        self.mock_singlefile_stream_snapshot.side_effect = RuntimeError(
             "Snapshot failed"
         )
 
@@ -146,6 +155,25 @@ class AssetServiceTestCase(TestCase, BookmarkFactoryMixin):
         asset.refresh_from_db()
         self.assertEqual(asset.status, BookmarkAsset.STATUS_FAILURE)
 
+    def test_create_snapshot_failure_while_streaming_removes_partial_file(self):
+        bookmark = self.setup_bookmark(url="https://example.com")
+        asset = assets.create_snapshot_asset(bookmark)
+        asset.save()
+
+        def failing_stream(url, home_dir):
+            yield self.html_content.encode()
+            raise singlefile.SingleFileError("Timeout expired while creating snapshot")
+
+        self.mock_singlefile_stream_snapshot.side_effect = failing_stream
+
+        with self.assertRaises(singlefile.SingleFileError):
+            assets.create_snapshot(asset)
+
+        asset.refresh_from_db()
+        self.assertEqual(asset.status, BookmarkAsset.STATUS_FAILURE)
+        self.assertEqual(asset.file, "")
+        self.assertEqual(os.listdir(self.assets_dir), [])
+
     def test_create_snapshot_truncates_asset_file_name(self):
         # Create a bookmark with a very long URL
         long_url = "http://" + "a" * 300 + ".com"
@@ -172,7 +200,7 @@ class AssetServiceTestCase(TestCase, BookmarkFactoryMixin):
         self.mock_detect_content_type.return_value = "application/pdf"
         self.mock_is_pdf_content_type.return_value = True
 
-        with mock.patch("bookmarks.services.assets.requests.get") as mock_get:
+        with mock.patch("requests.Session.get") as mock_get:
             mock_get.return_value = self.create_mock_pdf_response()
             assets.create_snapshot(asset)
 
@@ -212,7 +240,48 @@ class AssetServiceTestCase(TestCase, BookmarkFactoryMixin):
         asset.refresh_from_db()
         self.assertEqual(asset.status, BookmarkAsset.STATUS_COMPLETE)
         self.assertEqual(asset.content_type, BookmarkAsset.CONTENT_TYPE_HTML)
-        self.mock_singlefile_create_snapshot.assert_called()
+        self.mock_singlefile_stream_snapshot.assert_called()
+
+    def test_create_snapshot_uses_content_type_from_cached_website_metadata(self):
+        bookmark = self.setup_bookmark(url="https://example.com/doc.pdf")
+        asset = assets.create_snapshot_asset(bookmark)
+        asset.save()
+
+        self.mock_metadata_cache_get.return_value = WebsiteMetadata(
+            url=bookmark.url,
+            title=None,
+            description=None,
+            preview_image=None,
+            content_type="application/pdf",
+        )
+        self.mock_is_pdf_content_type.return_value = True
+
+        with mock.patch("requests.Session.get") as mock_get:
+            mock_get.return_value = self.create_mock_pdf_response()
+            assets.create_snapshot(asset)
+
+        self.mock_metadata_cache_get.assert_called_once_with(bookmark.url)
+        self.mock_detect_content_type.assert_not_called()
+        self.mock_is_pdf_content_type.assert_called_once_with("application/pdf")
+        asset.refresh_from_db()
+        self.assertEqual(asset.content_type, BookmarkAsset.CONTENT_TYPE_PDF)
+
+    def test_create_snapshot_does_not_load_website_metadata(self):
+        bookmark = self.setup_bookmark(url="https://example.com")
+        asset = assets.create_snapshot_asset(bookmark)
+        asset.save()
+
+        for cached in [None, metadata_cache.FAILURE_MARKER]:
+            self.mock_metadata_cache_get.return_value = cached
+            self.mock_detect_content_type.reset_mock()
+
+            with mock.patch(
+                "bookmarks.services.website_loader.load_website_metadata"
+            ) as mock_load_website_metadata:
+                assets.create_snapshot(asset)
+
+            mock_load_website_metadata.assert_not_called()
+            self.mock_detect_content_type.assert_called_once_with(bookmark.url)
 
     @override_settings(LD_SNAPSHOT_PDF_MAX_SIZE=100)
     def test_create_pdf_snapshot_fails_when_content_length_exceeds_limit(self):
@@ -223,7 +292,7 @@ class AssetServiceTestCase(TestCase, BookmarkFactoryMixin):
         self.mock_detect_content_type.return_value = "application/pdf"
         self.mock_is_pdf_content_type.return_value = True
 
-        with mock.patch("bookmarks.services.assets.requests.get") as mock_get:
+        with mock.patch("requests.Session.get") as mock_get:
             mock_get.return_value = self.create_mock_pdf_response(
                 content_length=1000  # Exceeds 100 byte limit
             )
@@ -245,7 +314,7 @@ class AssetServiceTestCase(TestCase, BookmarkFactoryMixin):
         self.mock_detect_content_type.return_value = "application/pdf"
         self.mock_is_pdf_content_type.return_value = True
 
-        with mock.patch("bookmarks.services.assets.requests.get") as mock_get:
+        with mock.patch("requests.Session.get") as mock_get:
             # Response without Content-Length header, will fail during streaming
             mock_get.return_value = self.create_mock_pdf_response(content=large_content)
 
@@ -254,6 +323,8 @@ class AssetServiceTestCase(TestCase, BookmarkFactoryMixin):
 
         asset.refresh_from_db()
         self.assertEqual(asset.status, BookmarkAsset.STATUS_FAILURE)
+        # should not leave a partially written file
+        self.assertEqual(os.listdir(self.assets_dir), [])
 
     def test_create_pdf_snapshot_failure(self):
         bookmark = self.setup_bookmark(url="https://example.com/doc.pdf")
@@ -263,7 +334,7 @@ class AssetServiceTestCase(TestCase, BookmarkFactoryMixin):
         self.mock_detect_content_type.return_value = "application/pdf"
         self.mock_is_pdf_content_type.return_value = True
 
-        with mock.patch("bookmarks.services.assets.requests.get") as mock_get:
+        with mock.patch("requests.Session.get") as mock_get:
             import requests
 
             mock_get.side_effect = requests.RequestException("Download failed")
@@ -274,6 +345,26 @@ class AssetServiceTestCase(TestCase, BookmarkFactoryMixin):
         asset.refresh_from_db()
         self.assertEqual(asset.status, BookmarkAsset.STATUS_FAILURE)
 
+    def test_create_pdf_snapshot_rate_limited_keeps_asset_pending(self):
+        bookmark = self.setup_bookmark(url="https://example.com/doc.pdf")
+        asset = assets.create_snapshot_asset(bookmark)
+        asset.save()
+
+        self.mock_detect_content_type.return_value = "application/pdf"
+        self.mock_is_pdf_content_type.return_value = True
+
+        with (
+            mock.patch(
+                "bookmarks.services.fetch_scheduler.scheduler.acquire",
+                side_effect=FetchRateLimited("example.com", 30),
+            ),
+            self.assertRaises(FetchRateLimited),
+        ):
+            assets.create_snapshot(asset)
+
+        asset.refresh_from_db()
+        self.assertEqual(asset.status, BookmarkAsset.STATUS_PENDING)
+
     def test_upload_snapshot(self):
         initial_modified = timezone.datetime(2025, 1, 1, 0, 0, 0, tzinfo=datetime.UTC)
         bookmark = self.setup_bookmark(
@@ -506,7 +597,7 @@ class AssetServiceTestCase(TestCase, BookmarkFactoryMixin):
         failing_asset.save()
 
         # Make the snapshot creation fail
-        self.mock_singlefile_create_snapshot.side_effect = RuntimeError(
+        self.mock_singlefile_stream_snapshot.side_effect = RuntimeError(
             "Snapshot creation failed"
         )
 
@@ -664,3 +755,118 @@ class AssetServiceTestCase(TestCase, BookmarkFactoryMixin):
         # Verify bookmark modified date is updated
         bookmark.refresh_from_db()
         self.assertGreater(bookmark.date_modified, initial_modified)
+
+    @override_settings(LD_ASSET_DEDUPLICATION=True)
+    def test_create_snapshot_stores_file_by_content_hash(self):
+        bookmark = self.setup_bookmark(url="https://example.com")
+        asset = assets.create_snapshot_asset(bookmark)
+        asset.save()
+
+        assets.create_snapshot(asset)
+
+        content_hash = hashlib.sha256(self.html_content.encode()).hexdigest()
+        asset.refresh_from_db()
+        self.assertEqual(asset.file, f"{content_hash}.html.gz")
+        self.assertEqual(self.read_asset_file(asset), self.html_content.encode())
+        # should only leave the stored file in the asset folder
+        self.assertEqual(os.listdir(self.assets_dir), [asset.file])
+
+    @override_settings(LD_ASSET_DEDUPLICATION=True)
+    def test_identical_snapshots_share_file(self):
+        bookmark = self.setup_bookmark(url="https://example.com")
+        other_bookmark = self.setup_bookmark(url="https://example.com/other")
+
+        first = assets.upload_snapshot(bookmark, self.html_content.encode())
+        second = assets.upload_snapshot(other_bookmark, self.html_content.encode())
+        different = assets.upload_snapshot(bookmark, b"<html>Different</html>")
+
+        self.assertEqual(first.file, second.file)
+        self.assertNotEqual(first.file, different.file)
+        self.assertEqual(len(os.listdir(self.assets_dir)), 2)
+
+    @override_settings(LD_ASSET_DEDUPLICATION=True)
+    def test_identical_uploads_share_file(self):
+        bookmark = self.setup_bookmark()
+        first = assets.upload_asset(
+            bookmark, SimpleUploadedFile("a.txt", b"content", content_type="text/plain")
+        )
+        second = assets.upload_asset(
+            bookmark, SimpleUploadedFile("b.txt", b"content", content_type="text/plain")
+        )
+
+        self.assertEqual(first.file, second.file)
+        self.assertEqual(first.display_name, "a.txt")
+        self.assertEqual(second.display_name, "b.txt")
+        self.assertEqual(self.read_asset_file(second), b"content")
+
+    @override_settings(LD_ASSET_DEDUPLICATION=True)
+    def test_remove_asset_keeps_file_used_by_other_asset(self):
+        bookmark = self.setup_bookmark()
+        other_bookmark = self.setup_bookmark()
+        first = assets.upload_snapshot(bookmark, self.html_content.encode())
+        second = assets.upload_snapshot(other_bookmark, self.html_content.encode())
+        filepath = os.path.join(self.assets_dir, first.file)
+
+        assets.remove_asset(first)
+        self.assertTrue(os.path.exists(filepath))
+        self.assertEqual(self.read_asset_file(second), self.html_content.encode())
+
+        # deleting the last asset that uses the file removes the file
+        other_bookmark.delete()
+        self.assertFalse(os.path.exists(filepath))
+
+    @override_settings(LD_ASSET_DEDUPLICATION=True)
+    def test_identical_snapshots_with_different_saved_date_share_file(self):
+        bookmark = self.setup_bookmark()
+        header = "<html><!--\n Page saved with SingleFile \n url: https://example.com \n saved date: {date}\n-->"
+
+        first = assets.upload_snapshot(
+            bookmark, header.format(date="Mon Oct 12 2026").encode()
+        )
+        second = assets.upload_snapshot(
+            bookmark, header.format(date="Fri Oct 16 2026").encode()
+        )
+
+        self.assertEqual(first.file, second.file)
+        self.assertEqual(
+            self.read_asset_file(second), header.format(date="Mon Oct 12 2026").encode()
+        )
+
+    @override_settings(LD_ASSET_DEDUPLICATION=True)
+    def test_restores_reused_file_deleted_before_asset_was_saved(self):
+        bookmark = self.setup_bookmark()
+        first = assets.upload_snapshot(bookmark, self.html_content.encode())
+        filepath = os.path.join(self.assets_dir, first.file)
+        original_save = BookmarkAsset.save
+
+        def save_after_file_was_deleted(asset, *args, **kwargs):
+            # another process deletes the file after removing its last asset
+            if os.path.exists(filepath):
+                os.remove(filepath)
+            original_save(asset, *args, **kwargs)
+
+        with mock.patch.object(BookmarkAsset, "save", save_after_file_was_deleted):
+            second = assets.upload_snapshot(bookmark, self.html_content.encode())
+
+        self.assertEqual(second.file, first.file)
+        self.assertEqual(self.read_asset_file(second), self.html_content.encode())
+        self.assertEqual(os.listdir(self.assets_dir), [second.file])
+
+    @override_settings(LD_ASSET_DEDUPLICATION=True)
+    def test_remove_asset_keeps_file_reused_while_deleting(self):
+        bookmark = self.setup_bookmark()
+        first = assets.upload_snapshot(bookmark, self.html_content.encode())
+        filepath = os.path.join(self.assets_dir, first.file)
+        original_replace = os.replace
+
+        def replace_while_asset_reuses_file(src, dst):
+            original_replace(src, dst)
+            if src == filepath:
+                # another process saves an asset that reuses the file
+                self.setup_asset(bookmark, file=first.file)
+
+        with mock.patch("os.replace", replace_while_asset_reuses_file):
+            assets.remove_asset(first)
+
+        self.assertTrue(os.path.exists(filepath))
+        self.assertEqual(os.listdir(self.assets_dir), [first.file])
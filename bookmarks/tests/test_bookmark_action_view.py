@@ -148,6 +148,20 @@ class BookmarkActionViewTestCase(
 
         self.assertFalse(bookmark.shared)
 
+    def test_unshare_should_update_tag_counts(self):
+        tag = self.setup_tag()
+        bookmark = self.setup_bookmark(shared=True, tags=[tag])
+
+        self.client.post(
+            reverse("linkding:bookmarks.index.action"),
+            {
+                "unshare": [bookmark.id],
+            },
+        )
+
+        tag.refresh_from_db()
+        self.assertEqual(tag.shared_count, 0)
+
     def test_can_only_unshare_own_bookmarks(self):
         other_user = User.objects.create_user(
             "otheruser", "otheruser@example.com", "password123"
@@ -290,6 +304,24 @@ class BookmarkActionViewTestCase(
         self.assertTrue(bookmark.is_archived)
         self.assertTrue(bookmark.shared)
 
+    def test_update_state_should_update_tag_counts(self):
+        tag = self.setup_tag()
+        bookmark = self.setup_bookmark(tags=[tag])
+
+        self.client.post(
+            reverse("linkding:bookmarks.index.action"),
+            {
+                "update_state": bookmark.id,
+                "is_archived": "on",
+                "shared": "on",
+            },
+        )
+
+        tag.refresh_from_db()
+        self.assertEqual(tag.active_count, 0)
+        self.assertEqual(tag.archived_count, 1)
+        self.assertEqual(tag.shared_count, 1)
+
     def test_can_only_update_own_bookmark_state(self):
         other_user = self.setup_user()
         bookmark = self.setup_bookmark(user=other_user)
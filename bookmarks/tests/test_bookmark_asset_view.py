@@ -1,3 +1,4 @@
+import gzip as gzip_module
 import os
 
 from django.conf import settings
@@ -185,3 +186,145 @@ class BookmarkAssetViewTestCase(TestCase, BookmarkFactoryMixin):
         self.assertEqual(
             response["Content-Security-Policy"], "default-src 'none'; media-src 'self';"
         )
+
+    def setup_streamed_asset(self, content: bytes, gzip: bool = False):
+        bookmark = self.setup_bookmark()
+        asset = self.setup_asset(
+            bookmark=bookmark, asset_type=BookmarkAsset.TYPE_UPLOAD, gzip=gzip
+        )
+        filepath = os.path.join(settings.LD_ASSET_FOLDER, asset.file)
+        open_file = gzip_module.open if gzip else open
+        with open_file(filepath, "wb") as f:
+            f.write(content)
+        return asset
+
+    def get_view(self, asset, **headers):
+        return self.client.get(
+            reverse("linkding:assets.view", args=[asset.id]), headers=headers
+        )
+
+    def test_view_streams_content(self):
+        content = os.urandom(200 * 1024)
+        asset = self.setup_streamed_asset(content)
+
+        response = self.get_view(asset)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        chunks = list(response.streaming_content)
+        self.assertEqual(len(chunks), 4)
+        self.assertTrue(all(len(chunk) <= 64 * 1024 for chunk in chunks))
+        self.assertEqual(b"".join(chunks), content)
+        self.assertEqual(response["Content-Length"], str(len(content)))
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertTrue(response["ETag"])
+        self.assertTrue(response["Last-Modified"])
+
+    def test_view_streams_gzipped_content(self):
+        content = b"<html>" + b"a" * 200 * 1024 + b"</html>"
+        asset = self.setup_streamed_asset(content, gzip=True)
+
+        response = self.get_view(asset, range="bytes=0-9")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), content)
+        self.assertEqual(response["Accept-Ranges"], "none")
+        self.assertFalse(response.has_header("Content-Range"))
+
+    def test_view_passes_through_gzipped_content(self):
+        content = b"<html>" + b"a" * 200 * 1024 + b"</html>"
+        asset = self.setup_streamed_asset(content, gzip=True)
+        filepath = os.path.join(settings.LD_ASSET_FOLDER, asset.file)
+        with open(filepath, "rb") as f:
+            stored_content = f.read()
+
+        response = self.get_view(asset, accept_encoding="gzip, deflate")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(response["Content-Length"], str(len(stored_content)))
+        self.assertEqual(b"".join(response.streaming_content), stored_content)
+        self.assertEqual(gzip_module.decompress(stored_content), content)
+
+        # compressed and decompressed responses use different tags
+        decompressed_response = self.get_view(asset)
+        self.assertFalse(decompressed_response.has_header("Content-Encoding"))
+        self.assertIn("Accept-Encoding", decompressed_response["Vary"])
+        self.assertNotEqual(decompressed_response["ETag"], response["ETag"])
+
+        response = self.get_view(
+            asset, accept_encoding="gzip", if_none_match=response["ETag"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_view_range_requests(self):
+        content = b"0123456789"
+        asset = self.setup_streamed_asset(content)
+
+        for range_header, expected_range, expected_content in [
+            ("bytes=0-3", "bytes 0-3/10", b"0123"),
+            ("bytes=5-", "bytes 5-9/10", b"56789"),
+            ("bytes=-3", "bytes 7-9/10", b"789"),
+            ("bytes=8-20", "bytes 8-9/10", b"89"),
+            ("bytes=-20", "bytes 0-9/10", content),
+        ]:
+            response = self.get_view(asset, range=range_header)
+
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response["Content-Range"], expected_range)
+            self.assertEqual(response["Content-Length"], str(len(expected_content)))
+            self.assertEqual(b"".join(response.streaming_content), expected_content)
+
+    def test_view_ignores_unsupported_ranges(self):
+        content = b"0123456789"
+        asset = self.setup_streamed_asset(content)
+
+        for range_header in ["bytes=0-1,4-5", "items=0-1", "bytes=5-2", "bytes=-"]:
+            response = self.get_view(asset, range=range_header)
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(b"".join(response.streaming_content), content)
+
+    def test_view_unsatisfiable_range(self):
+        asset = self.setup_streamed_asset(b"0123456789")
+
+        response = self.get_view(asset, range="bytes=10-")
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */10")
+
+    def test_view_if_range(self):
+        asset = self.setup_streamed_asset(b"0123456789")
+        etag = self.get_view(asset)["ETag"]
+
+        response = self.get_view(asset, range="bytes=0-3", if_range=etag)
+        self.assertEqual(response.status_code, 206)
+
+        response = self.get_view(asset, range="bytes=0-3", if_range='"changed"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"0123456789")
+
+    def test_view_conditional_requests(self):
+        asset = self.setup_streamed_asset(b"0123456789")
+        response = self.get_view(asset)
+        etag = response["ETag"]
+        last_modified = response["Last-Modified"]
+
+        response = self.get_view(asset, if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+        response = self.get_view(asset, if_modified_since=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        response = self.get_view(asset, if_none_match='"other"')
+        self.assertEqual(response.status_code, 200)
+
+        # changing the file changes the etag
+        filepath = os.path.join(settings.LD_ASSET_FOLDER, asset.file)
+        with open(filepath, "wb") as f:
+            f.write(b"changed content")
+        response = self.get_view(asset, if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
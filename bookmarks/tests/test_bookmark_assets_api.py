@@ -1,11 +1,15 @@
+import gzip
 import io
+import os
 
+from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import override_settings
 from django.urls import reverse
 from rest_framework import status
 
 from bookmarks.models import BookmarkAsset
+from bookmarks.services import asset_codecs
 from bookmarks.tests.helpers import BookmarkFactoryMixin, LinkdingApiTestCase
 
 
@@ -158,6 +162,56 @@ class BookmarkAssetsApiTestCase(LinkdingApiTestCase, BookmarkFactoryMixin):
         content = b"".join(response.streaming_content).decode("utf-8")
         self.assertEqual(content, file_content)
 
+    def test_asset_download_passes_through_gzip(self):
+        self.authenticate()
+
+        bookmark = self.setup_bookmark()
+        asset = self.setup_asset(
+            bookmark=bookmark,
+            asset_type=BookmarkAsset.TYPE_SNAPSHOT,
+            content_type="text/html",
+            gzip=True,
+        )
+        self.setup_asset_file(asset=asset, file_content="<html>Test</html>")
+        url = reverse(
+            "linkding:bookmark_asset-download",
+            kwargs={"bookmark_id": asset.bookmark.id, "pk": asset.id},
+        )
+
+        response = self.client.get(url, headers={"Accept-Encoding": "gzip, br"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        content = b"".join(response.streaming_content)
+        with open(os.path.join(settings.LD_ASSET_FOLDER, asset.file), "rb") as f:
+            self.assertEqual(content, f.read())
+        self.assertEqual(gzip.decompress(content), b"<html>Test</html>")
+
+    def test_asset_download_with_zstd_asset(self):
+        self.authenticate()
+
+        bookmark = self.setup_bookmark()
+        asset = self.setup_asset(
+            bookmark=bookmark,
+            asset_type=BookmarkAsset.TYPE_SNAPSHOT,
+            content_type="text/html",
+            codec=asset_codecs.ZSTD,
+        )
+        file_content = "<html>" + "Test" * 50000 + "</html>"
+        self.setup_asset_file(asset=asset, file_content=file_content)
+        url = reverse(
+            "linkding:bookmark_asset-download",
+            kwargs={"bookmark_id": asset.bookmark.id, "pk": asset.id},
+        )
+
+        response = self.client.get(url, headers={"Accept-Encoding": "gzip, br"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.has_header("Content-Encoding"))
+        content = b"".join(response.streaming_content).decode("utf-8")
+        self.assertEqual(content, file_content)
+
     def test_asset_download_with_uploaded_asset(self):
         self.authenticate()
 
@@ -217,6 +217,95 @@ class BookmarksApiTestCase(LinkdingApiTestCase, BookmarkFactoryMixin):
         )
         self.assertBookmarkListEqual(response.data["results"], bookmarks)
 
+    def test_list_bookmarks_with_cursor_pagination(self):
+        self.authenticate()
+        bookmarks = self.setup_numbered_bookmarks(5)
+        bookmarks.reverse()
+
+        url = reverse("linkding:bookmark-list") + "?pagination=cursor&limit=2"
+        pages = []
+        while url:
+            response = self.get(url, expected_status_code=status.HTTP_200_OK)
+            self.assertNotIn("count", response.data)
+            pages.append([data["id"] for data in response.data["results"]])
+            url = response.data["next"]
+
+        self.assertEqual(
+            pages,
+            [
+                [bookmarks[0].id, bookmarks[1].id],
+                [bookmarks[2].id, bookmarks[3].id],
+                [bookmarks[4].id],
+            ],
+        )
+
+        previous_url = response.data["previous"]
+        response = self.get(previous_url, expected_status_code=status.HTTP_200_OK)
+        self.assertEqual(
+            [data["id"] for data in response.data["results"]],
+            [bookmarks[2].id, bookmarks[3].id],
+        )
+
+    def test_list_bookmarks_with_cursor_pagination_should_respect_sort(self):
+        self.authenticate()
+        bookmarks = self.setup_numbered_bookmarks(3)
+        now = timezone.now()
+        for index, bookmark in enumerate(bookmarks):
+            bookmark.date_modified = now - datetime.timedelta(days=index)
+            bookmark.save()
+
+        url = (
+            reverse("linkding:bookmark-list")
+            + "?pagination=cursor&limit=2&sort=modified_asc"
+        )
+        response = self.get(url, expected_status_code=status.HTTP_200_OK)
+        self.assertEqual(
+            [data["id"] for data in response.data["results"]],
+            [bookmarks[2].id, bookmarks[1].id],
+        )
+        self.assertIn("cursor=", response.data["next"])
+        self.assertNotIn("offset=", response.data["next"])
+
+        response = self.get(response.data["next"])
+        self.assertEqual(
+            [data["id"] for data in response.data["results"]],
+            [bookmarks[0].id],
+        )
+        self.assertIsNone(response.data["next"])
+
+    def test_list_bookmarks_with_cursor_pagination_falls_back_for_relevance(self):
+        self.authenticate()
+        self.setup_numbered_bookmarks(3)
+
+        url = (
+            reverse("linkding:bookmark-list")
+            + "?pagination=cursor&limit=2&sort=relevance"
+        )
+        response = self.get(url, expected_status_code=status.HTTP_200_OK)
+
+        self.assertEqual(response.data["count"], 3)
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertIn("offset=2", response.data["next"])
+
+    def test_list_archived_bookmarks_with_cursor_pagination(self):
+        self.authenticate()
+        self.setup_numbered_bookmarks(3)
+        archived_bookmarks = self.setup_numbered_bookmarks(3, archived=True)
+        archived_bookmarks.reverse()
+
+        url = reverse("linkding:bookmark-archived") + "?pagination=cursor&limit=2"
+        response = self.get(url, expected_status_code=status.HTTP_200_OK)
+        self.assertEqual(
+            [data["id"] for data in response.data["results"]],
+            [archived_bookmarks[0].id, archived_bookmarks[1].id],
+        )
+
+        response = self.get(response.data["next"])
+        self.assertEqual(
+            [data["id"] for data in response.data["results"]],
+            [archived_bookmarks[2].id],
+        )
+
     def test_list_archived_bookmarks_does_not_return_unarchived_bookmarks(self):
         self.authenticate()
         self.setup_numbered_bookmarks(5)
@@ -1356,9 +1445,13 @@ class BookmarksApiTestCase(LinkdingApiTestCase, BookmarkFactoryMixin):
         self.mock_assets_upload_snapshot.assert_called_with(bookmark, b"dummy content")
 
     def test_singlefile_creates_bookmark_without_creating_snapshot(self):
-        with patch(
-            "bookmarks.services.bookmarks.create_bookmark"
-        ) as mock_create_bookmark:
+        with (
+            patch(
+                "bookmarks.services.bookmarks.create_bookmark"
+            ) as mock_create_bookmark,
+            # The mocked bookmark has no URL to load metadata for
+            patch("bookmarks.services.bookmarks.enhance_with_website_metadata"),
+        ):
             self.authenticate()
             self.client.post(
                 reverse("linkding:bookmark-singlefile"),
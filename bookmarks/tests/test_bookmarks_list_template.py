@@ -3,7 +3,7 @@ import datetime
 from django.contrib.auth.models import AnonymousUser
 from django.http import HttpResponse
 from django.template import RequestContext, Template
-from django.test import RequestFactory, TestCase
+from django.test import RequestFactory, TestCase, override_settings
 from django.urls import reverse
 from django.utils import formats, timezone
 
@@ -1132,6 +1132,62 @@ class BookmarkListTemplateTest(TestCase, BookmarkFactoryMixin, HtmlTestMixin):
         bookmarks = soup.select("ul.bookmark-list > li")
         self.assertEqual(10, len(bookmarks))
 
+    @override_settings(LD_ENABLE_KEYSET_PAGINATION=True)
+    def test_keyset_pagination(self):
+        profile = self.get_or_create_test_user().profile
+        profile.items_per_page = 10
+        profile.save()
+        bookmarks = self.setup_numbered_bookmarks(25)
+        bookmarks.reverse()
+
+        def get_page(url: str):
+            soup = self.make_soup(self.render_template(url=url))
+            items = soup.select("ul.bookmark-list > li")
+            ids = [int(item["data-bookmark-id"]) for item in items]
+            total = soup.select_one("ul.bookmark-list")["data-bookmarks-total"]
+            links = soup.select("ul.pagination li.page-item > a")
+            return ids, total, {link.text: link["href"] for link in links}
+
+        ids, total, links = get_page("/bookmarks?q=Bookmark")
+        self.assertEqual(ids, [b.id for b in bookmarks[0:10]])
+        self.assertEqual(total, "25")
+        self.assertEqual(links["Previous"], "#")
+        self.assertEqual(len(links), 2)
+        self.assertTrue(links["Next"].startswith("/bookmarks?q=Bookmark&page="))
+
+        ids, total, links = get_page(links["Next"])
+        self.assertEqual(ids, [b.id for b in bookmarks[10:20]])
+
+        ids, total, links = get_page(links["Next"])
+        self.assertEqual(ids, [b.id for b in bookmarks[20:25]])
+        self.assertEqual(links["Next"], "#")
+
+        ids, total, links = get_page(links["Previous"])
+        self.assertEqual(ids, [b.id for b in bookmarks[10:20]])
+
+    @override_settings(
+        LD_ENABLE_KEYSET_PAGINATION=True, LD_KEYSET_PAGINATION_SKIP_COUNT=True
+    )
+    def test_keyset_pagination_skip_count(self):
+        self.setup_numbered_bookmarks(5)
+
+        soup = self.make_soup(self.render_template())
+        bookmark_list = soup.select_one("ul.bookmark-list")
+
+        self.assertIsNotNone(bookmark_list)
+        self.assertNotIn("data-bookmarks-total", bookmark_list.attrs)
+        self.assertEqual(len(bookmark_list.select("li")), 5)
+
+    @override_settings(
+        LD_ENABLE_KEYSET_PAGINATION=True, LD_KEYSET_PAGINATION_SKIP_COUNT=True
+    )
+    def test_keyset_pagination_skip_count_empty_state(self):
+        html = self.render_template()
+
+        self.assertInHTML(
+            '<p class="empty-title h5">You have no bookmarks yet</p>', html
+        )
+
     def test_no_actions_rendered_when_is_preview(self):
         bookmark = self.setup_bookmark()
         bookmark.date_added = timezone.now() - datetime.timedelta(days=8)
@@ -41,10 +41,17 @@ class BookmarkServiceTestCase(TestCase, BookmarkFactoryMixin):
             "bookmarks.services.bookmarks.tasks.load_preview_image"
         )
         self.mock_load_preview_image = self.mock_load_preview_image_patcher.start()
+        self.mock_refresh_bookmarks_metadata_patcher = patch(
+            "bookmarks.services.bookmarks.tasks.refresh_bookmarks_metadata"
+        )
+        self.mock_refresh_bookmarks_metadata = (
+            self.mock_refresh_bookmarks_metadata_patcher.start()
+        )
 
     def tearDown(self):
         self.mock_schedule_refresh_metadata_patcher.stop()
         self.mock_load_preview_image_patcher.stop()
+        self.mock_refresh_bookmarks_metadata_patcher.stop()
 
     def test_create_should_not_update_website_metadata(self):
         with patch.object(
@@ -1026,6 +1033,12 @@ class BookmarkServiceTestCase(TestCase, BookmarkFactoryMixin):
             self.assertEqual("", bookmark.title)
             self.assertEqual("", bookmark.description)
 
+    def assertRefreshedBookmarks(self, expected_bookmarks):
+        self.mock_refresh_bookmarks_metadata.assert_called_once()
+        user, bookmarks = self.mock_refresh_bookmarks_metadata.call_args.args
+        self.assertEqual(user, self.get_or_create_test_user())
+        self.assertCountEqual(list(bookmarks), expected_bookmarks)
+
     def test_refresh_bookmarks_metadata(self):
         bookmark1 = self.setup_bookmark()
         bookmark2 = self.setup_bookmark()
@@ -1035,28 +1048,18 @@ class BookmarkServiceTestCase(TestCase, BookmarkFactoryMixin):
             [bookmark1.id, bookmark2.id, bookmark3.id], self.get_or_create_test_user()
         )
 
-        self.assertEqual(self.mock_schedule_refresh_metadata.call_count, 3)
-        self.assertEqual(self.mock_load_preview_image.call_count, 3)
+        self.assertRefreshedBookmarks([bookmark1, bookmark2, bookmark3])
 
     def test_refresh_bookmarks_metadata_should_only_refresh_specified_bookmarks(self):
         bookmark1 = self.setup_bookmark()
-        bookmark2 = self.setup_bookmark()
+        self.setup_bookmark()
         bookmark3 = self.setup_bookmark()
 
         refresh_bookmarks_metadata(
             [bookmark1.id, bookmark3.id], self.get_or_create_test_user()
         )
 
-        self.assertEqual(self.mock_schedule_refresh_metadata.call_count, 2)
-        self.assertEqual(self.mock_load_preview_image.call_count, 2)
-
-        for call_args in self.mock_schedule_refresh_metadata.call_args_list:
-            args, kwargs = call_args
-            self.assertNotIn(bookmark2.id, args)
-
-        for call_args in self.mock_load_preview_image.call_args_list:
-            args, kwargs = call_args
-            self.assertNotIn(bookmark2.id, args)
+        self.assertRefreshedBookmarks([bookmark1, bookmark3])
 
     def test_refresh_bookmarks_metadata_should_only_refresh_user_owned_bookmarks(self):
         other_user = self.setup_user()
@@ -1069,16 +1072,7 @@ class BookmarkServiceTestCase(TestCase, BookmarkFactoryMixin):
             self.get_or_create_test_user(),
         )
 
-        self.assertEqual(self.mock_schedule_refresh_metadata.call_count, 2)
-        self.assertEqual(self.mock_load_preview_image.call_count, 2)
-
-        for call_args in self.mock_schedule_refresh_metadata.call_args_list:
-            args, kwargs = call_args
-            self.assertNotIn(inaccessible_bookmark.id, args)
-
-        for call_args in self.mock_load_preview_image.call_args_list:
-            args, kwargs = call_args
-            self.assertNotIn(inaccessible_bookmark.id, args)
+        self.assertRefreshedBookmarks([bookmark1, bookmark2])
 
     def test_refresh_bookmarks_metadata_should_accept_mix_of_int_and_string_ids(self):
         bookmark1 = self.setup_bookmark()
@@ -1090,8 +1084,7 @@ class BookmarkServiceTestCase(TestCase, BookmarkFactoryMixin):
             self.get_or_create_test_user(),
         )
 
-        self.assertEqual(self.mock_schedule_refresh_metadata.call_count, 3)
-        self.assertEqual(self.mock_load_preview_image.call_count, 3)
+        self.assertRefreshedBookmarks([bookmark1, bookmark2, bookmark3])
 
     def test_create_html_snapshots(self):
         with patch.object(tasks, "create_html_snapshots") as mock_create_html_snapshots:
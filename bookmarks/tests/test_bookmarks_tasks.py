@@ -1,13 +1,16 @@
+from datetime import timedelta
 from unittest import mock
 
 import waybackpy
 from django.contrib.auth.models import User
 from django.test import TestCase, override_settings
+from django.utils import timezone
 from huey.contrib.djhuey import HUEY as huey
 from waybackpy.exceptions import WaybackError
 
-from bookmarks.models import BookmarkAsset, UserProfile
+from bookmarks.models import Bookmark, BookmarkAsset, UserProfile
 from bookmarks.services import tasks
+from bookmarks.services.fetch_scheduler import FetchRateLimited
 from bookmarks.services.website_loader import WebsiteMetadata
 from bookmarks.tests.helpers import BookmarkFactoryMixin
 
@@ -71,6 +74,7 @@ class BookmarkTasksTestCase(TestCase, BookmarkFactoryMixin):
         self.mock_assets_create_snapshot_patcher.stop()
         self.mock_load_preview_image_patcher.stop()
         huey.storage.flush_results()
+        huey.storage.flush_schedule()
         huey.immediate = False
 
     def executed_count(self):
@@ -225,6 +229,37 @@ class BookmarkTasksTestCase(TestCase, BookmarkFactoryMixin):
 
         self.assertEqual(self.executed_count(), 0)
 
+    def test_load_favicon_should_reschedule_when_rate_limited(self):
+        bookmark = self.setup_bookmark()
+        self.mock_load_favicon.side_effect = FetchRateLimited("example.com", 30)
+
+        tasks.load_favicon(self.get_or_create_test_user(), bookmark)
+
+        scheduled = huey.scheduled()
+        self.assertEqual(len(scheduled), 1)
+        self.assertEqual(scheduled[0].args, (bookmark.id,))
+        # should not use up retries
+        self.assertEqual(scheduled[0].retries, 5)
+
+    def test_load_favicons_task_should_reschedule_remaining_bookmarks_when_rate_limited(
+        self,
+    ):
+        bookmark1 = self.setup_bookmark(url="https://example.com/1")
+        bookmark2 = self.setup_bookmark(url="https://github.com/2")
+        bookmark3 = self.setup_bookmark(url="https://other.com/3")
+        self.mock_load_favicon.side_effect = [
+            "https_example_com.png",
+            FetchRateLimited("icons.com", 30),
+        ]
+
+        tasks._load_favicons_task([bookmark1.id, bookmark2.id, bookmark3.id])
+
+        scheduled = huey.scheduled()
+        self.assertEqual(len(scheduled), 1)
+        self.assertCountEqual(scheduled[0].args[0], [bookmark2.id, bookmark3.id])
+        bookmark1.refresh_from_db()
+        self.assertEqual(bookmark1.favicon_file, "https_example_com.png")
+
     def test_schedule_bookmarks_without_favicons_should_load_favicon_for_all_bookmarks_without_favicon(
         self,
     ):
@@ -238,8 +273,12 @@ class BookmarkTasksTestCase(TestCase, BookmarkFactoryMixin):
 
         tasks.schedule_bookmarks_without_favicons(user)
 
-        self.assertEqual(self.executed_count(), 4)
-        self.assertEqual(self.mock_load_favicon.call_count, 3)
+        # All bookmarks have the same origin, so the favicon is loaded once
+        self.assertEqual(self.executed_count(), 2)
+        self.assertEqual(self.mock_load_favicon.call_count, 1)
+        self.assertEqual(
+            Bookmark.objects.filter(favicon_file="https_example_com.png").count(), 6
+        )
 
     def test_schedule_bookmarks_without_favicons_should_only_update_user_owned_bookmarks(
         self,
@@ -257,8 +296,82 @@ class BookmarkTasksTestCase(TestCase, BookmarkFactoryMixin):
 
         tasks.schedule_bookmarks_without_favicons(user)
 
+        self.assertEqual(
+            Bookmark.objects.filter(
+                owner=user, favicon_file="https_example_com.png"
+            ).count(),
+            3,
+        )
+        self.assertEqual(
+            Bookmark.objects.filter(owner=other_user, favicon_file="").count(), 3
+        )
+
+    def test_schedule_bookmarks_without_favicons_should_schedule_chunks(self):
+        user = self.get_or_create_test_user()
+        for _ in range(5):
+            self.setup_bookmark()
+
+        with mock.patch.object(tasks, "BULK_TASK_CHUNK_SIZE", 2):
+            tasks.schedule_bookmarks_without_favicons(user)
+
+        # one scheduling task + three chunks
+        self.assertEqual(self.executed_count(), 4)
         self.assertEqual(self.mock_load_favicon.call_count, 3)
 
+    def test_load_favicons_task_should_load_favicon_once_per_origin(self):
+        github_bookmarks = [
+            self.setup_bookmark(url="https://github.com/sissbruecker/linkding"),
+            self.setup_bookmark(url="https://github.com/django/django"),
+            self.setup_bookmark(url="https://github.com/psf/requests?tab=readme"),
+        ]
+        example_bookmark = self.setup_bookmark(url="https://example.com/foo")
+        self.mock_load_favicon.side_effect = lambda url: (
+            "https_github_com.png"
+            if url == "https://github.com"
+            else "https_example_com.png"
+        )
+
+        tasks._load_favicons_task(
+            [bookmark.id for bookmark in github_bookmarks] + [example_bookmark.id]
+        )
+
+        self.assertEqual(self.mock_load_favicon.call_count, 2)
+        self.mock_load_favicon.assert_any_call("https://github.com")
+        self.mock_load_favicon.assert_any_call("https://example.com")
+        for bookmark in github_bookmarks:
+            bookmark.refresh_from_db()
+            self.assertEqual(bookmark.favicon_file, "https_github_com.png")
+        example_bookmark.refresh_from_db()
+        self.assertEqual(example_bookmark.favicon_file, "https_example_com.png")
+
+    def test_load_favicons_task_should_retry_failed_origins_separately(self):
+        github_bookmark1 = self.setup_bookmark(url="https://github.com/1")
+        github_bookmark2 = self.setup_bookmark(url="https://github.com/2")
+        example_bookmark = self.setup_bookmark(url="https://example.com/1")
+
+        def load_favicon(url):
+            if url == "https://github.com":
+                raise Exception("failed")
+            return "https_example_com.png"
+
+        self.mock_load_favicon.side_effect = load_favicon
+
+        with mock.patch.object(
+            tasks, "_load_origin_favicon_task"
+        ) as mock_load_origin_favicon_task:
+            tasks._load_favicons_task(
+                [github_bookmark1.id, github_bookmark2.id, example_bookmark.id]
+            )
+
+            mock_load_origin_favicon_task.assert_called_once()
+            origin, bookmark_ids = mock_load_origin_favicon_task.call_args.args
+            self.assertEqual(origin, "https://github.com")
+            self.assertCountEqual(
+                bookmark_ids, [github_bookmark1.id, github_bookmark2.id]
+            )
+        example_bookmark.refresh_from_db()
+        self.assertEqual(example_bookmark.favicon_file, "https_example_com.png")
+
     @override_settings(LD_DISABLE_BACKGROUND_TASKS=True)
     def test_schedule_bookmarks_without_favicons_should_not_run_when_background_tasks_are_disabled(
         self,
@@ -290,8 +403,9 @@ class BookmarkTasksTestCase(TestCase, BookmarkFactoryMixin):
 
         tasks.schedule_refresh_favicons(user)
 
-        self.assertEqual(self.executed_count(), 7)
-        self.assertEqual(self.mock_load_favicon.call_count, 6)
+        # All bookmarks have the same origin, so the favicon is loaded once
+        self.assertEqual(self.executed_count(), 2)
+        self.assertEqual(self.mock_load_favicon.call_count, 1)
 
     def test_schedule_refresh_favicons_should_only_update_user_owned_bookmarks(self):
         user = self.get_or_create_test_user()
@@ -307,7 +421,15 @@ class BookmarkTasksTestCase(TestCase, BookmarkFactoryMixin):
 
         tasks.schedule_refresh_favicons(user)
 
-        self.assertEqual(self.mock_load_favicon.call_count, 3)
+        self.assertEqual(
+            Bookmark.objects.filter(
+                owner=user, favicon_file="https_example_com.png"
+            ).count(),
+            3,
+        )
+        self.assertEqual(
+            Bookmark.objects.filter(owner=other_user, favicon_file="").count(), 3
+        )
 
     @override_settings(LD_DISABLE_BACKGROUND_TASKS=True)
     def test_schedule_refresh_favicons_should_not_run_when_background_tasks_are_disabled(
@@ -425,7 +547,7 @@ class BookmarkTasksTestCase(TestCase, BookmarkFactoryMixin):
 
         tasks.schedule_bookmarks_without_previews(user)
 
-        self.assertEqual(self.executed_count(), 4)
+        self.assertEqual(self.executed_count(), 2)
         self.assertEqual(self.mock_load_preview_image.call_count, 3)
 
     def test_schedule_bookmarks_without_previews_should_only_update_user_owned_bookmarks(
@@ -446,6 +568,18 @@ class BookmarkTasksTestCase(TestCase, BookmarkFactoryMixin):
 
         self.assertEqual(self.mock_load_preview_image.call_count, 3)
 
+    def test_schedule_bookmarks_without_previews_should_schedule_chunks(self):
+        user = self.get_or_create_test_user()
+        for _ in range(5):
+            self.setup_bookmark()
+
+        with mock.patch.object(tasks, "BULK_TASK_CHUNK_SIZE", 2):
+            tasks.schedule_bookmarks_without_previews(user)
+
+        # one scheduling task + three chunks
+        self.assertEqual(self.executed_count(), 4)
+        self.assertEqual(self.mock_load_preview_image.call_count, 5)
+
     @override_settings(LD_DISABLE_BACKGROUND_TASKS=True)
     def test_schedule_bookmarks_without_previews_should_not_run_when_background_tasks_are_disabled(
         self,
@@ -504,7 +638,152 @@ class BookmarkTasksTestCase(TestCase, BookmarkFactoryMixin):
         self.assertEqual(self.mock_assets_create_snapshot.call_count, 3)
 
         for asset in assets:
-            self.mock_assets_create_snapshot.assert_any_call(asset)
+            self.mock_assets_create_snapshot.assert_any_call(asset, None)
+
+    @override_settings(LD_ENABLE_SNAPSHOTS=True)
+    def test_schedule_html_snapshots_should_continue_with_next_batch(self):
+        bookmark = self.setup_bookmark()
+        for _ in range(12):
+            tasks.create_html_snapshot(bookmark)
+
+        def complete_snapshot(asset, home_dir):
+            asset.status = BookmarkAsset.STATUS_COMPLETE
+            asset.save()
+
+        self.mock_assets_create_snapshot.side_effect = complete_snapshot
+
+        with (
+            mock.patch.object(tasks, "SNAPSHOT_BATCH_SIZE_PER_WORKER", 5),
+            mock.patch.object(
+                tasks,
+                "_create_html_snapshots_batch",
+                wraps=tasks._create_html_snapshots_batch,
+            ) as mock_create_batch,
+        ):
+            tasks._schedule_html_snapshots_task()
+
+        self.assertEqual(mock_create_batch.call_count, 3)
+        self.assertEqual(self.mock_assets_create_snapshot.call_count, 12)
+        # claims are released after creating the snapshots
+        self.assertFalse(
+            BookmarkAsset.objects.filter(date_claimed__isnull=False).exists()
+        )
+
+    @override_settings(LD_ENABLE_SNAPSHOTS=True)
+    def test_schedule_html_snapshots_should_not_continue_after_postponed_snapshots(
+        self,
+    ):
+        bookmark = self.setup_bookmark()
+        for _ in range(3):
+            tasks.create_html_snapshot(bookmark)
+        self.mock_assets_create_snapshot.side_effect = FetchRateLimited(
+            "example.com", 30
+        )
+
+        with mock.patch.object(tasks, "SNAPSHOT_BATCH_SIZE_PER_WORKER", 2):
+            tasks._schedule_html_snapshots_task()
+
+        self.assertEqual(self.mock_assets_create_snapshot.call_count, 2)
+
+    @override_settings(LD_ENABLE_SNAPSHOTS=True)
+    def test_schedule_html_snapshots_should_skip_when_previous_batch_is_running(
+        self,
+    ):
+        bookmark = self.setup_bookmark()
+        tasks.create_html_snapshot(bookmark)
+
+        with huey.lock_task("schedule-html-snapshots-lock"):
+            tasks._schedule_html_snapshots_task()
+
+        self.mock_assets_create_snapshot.assert_not_called()
+
+    @override_settings(LD_ENABLE_SNAPSHOTS=True)
+    def test_schedule_html_snapshots_should_skip_claimed_assets(self):
+        bookmark = self.setup_bookmark()
+        tasks.create_html_snapshot(bookmark)
+        tasks.create_html_snapshot(bookmark)
+        claimed_asset, other_asset = BookmarkAsset.objects.order_by("id")
+        claimed_asset.date_claimed = timezone.now()
+        claimed_asset.save()
+
+        tasks._schedule_html_snapshots_task()
+
+        self.mock_assets_create_snapshot.assert_called_once_with(other_asset, None)
+
+    @override_settings(LD_ENABLE_SNAPSHOTS=True, LD_SINGLEFILE_TIMEOUT_SEC=60)
+    def test_schedule_html_snapshots_should_claim_assets_with_expired_claim(self):
+        bookmark = self.setup_bookmark()
+        tasks.create_html_snapshot(bookmark)
+        asset = BookmarkAsset.objects.get()
+        asset.date_claimed = timezone.now() - timedelta(minutes=3)
+        asset.save()
+
+        tasks._schedule_html_snapshots_task()
+
+        self.mock_assets_create_snapshot.assert_called_once_with(asset, None)
+
+    def test_snapshot_worker_pool_claims_asset_only_once(self):
+        bookmark = self.setup_bookmark()
+        asset = self.setup_asset(bookmark, status=BookmarkAsset.STATUS_PENDING)
+
+        self.assertEqual(tasks._SnapshotWorkerPool(10).claim(), asset.id)
+        # another process can't claim the asset
+        self.assertIsNone(tasks._SnapshotWorkerPool(10).claim())
+
+        asset.refresh_from_db()
+        self.assertIsNotNone(asset.date_claimed)
+
+    @override_settings(LD_ENABLE_SNAPSHOTS=True)
+    def test_schedule_html_snapshots_should_attempt_postponed_assets_once(self):
+        bookmark = self.setup_bookmark()
+        tasks.create_html_snapshot(bookmark)
+        tasks.create_html_snapshot(bookmark)
+        self.mock_assets_create_snapshot.side_effect = FetchRateLimited(
+            "example.com", 30
+        )
+
+        tasks._schedule_html_snapshots_task()
+
+        self.assertEqual(self.mock_assets_create_snapshot.call_count, 2)
+        self.assertEqual(
+            BookmarkAsset.objects.filter(status=BookmarkAsset.STATUS_PENDING).count(),
+            2,
+        )
+
+    @override_settings(LD_ENABLE_SNAPSHOTS=True, LD_SNAPSHOT_CONCURRENCY=3)
+    def test_schedule_html_snapshots_should_use_isolated_workers(self):
+        bookmark = self.setup_bookmark()
+        for _ in range(6):
+            tasks.create_html_snapshot(bookmark)
+        asset_ids = list(BookmarkAsset.objects.values_list("id", flat=True))
+
+        home_dirs = {}
+
+        def run_worker(pool, home_dir):
+            # Run workers in sequence in the test thread, which has access to
+            # the test database
+            home_dirs[home_dir] = 0
+            while (asset_id := pool.claim()) is not None:
+                home_dirs[home_dir] += 1
+                tasks._create_html_snapshot_task(asset_id, home_dir)
+
+        with (
+            mock.patch.object(
+                tasks._SnapshotWorkerPool, "run_isolated_worker", run_worker
+            ),
+            mock.patch.object(tasks, "ThreadPoolExecutor") as mock_executor,
+        ):
+            mock_executor.return_value.__enter__.return_value.map = map
+            tasks._schedule_html_snapshots_task()
+
+        mock_executor.assert_called_once_with(max_workers=3)
+        self.assertEqual(len(home_dirs), 3)
+        for home_dir in home_dirs:
+            self.assertRegex(home_dir, r"linkding-snapshots/worker-\d$")
+        processed_ids = [
+            call.args[0].id for call in self.mock_assets_create_snapshot.call_args_list
+        ]
+        self.assertCountEqual(processed_ids, asset_ids)
 
     @override_settings(LD_ENABLE_SNAPSHOTS=True)
     def test_create_html_snapshot_should_handle_missing_asset(self):
@@ -642,6 +921,89 @@ class BookmarkTasksTestCase(TestCase, BookmarkFactoryMixin):
 
             mock_load_website_metadata.assert_not_called()
 
+    def test_refresh_bookmarks_metadata_updates_bookmarks_in_batch(self):
+        bookmark1 = self.setup_bookmark(url="https://example.com/1", title="Old")
+        bookmark2 = self.setup_bookmark(
+            url="https://example.com/2", title="Old", description="Old description"
+        )
+        other_bookmark = self.setup_bookmark(url="https://example.com/3", title="Old")
+
+        def load_batch(urls, ignore_cache):
+            self.assertTrue(ignore_cache)
+            return {
+                url: WebsiteMetadata(
+                    url=url,
+                    title=f"Title {url[-1]}",
+                    description="New description" if url.endswith("1") else None,
+                    preview_image=None,
+                )
+                for url in urls
+            }
+
+        with mock.patch(
+            "bookmarks.services.website_loader.load_website_metadata_batch",
+            side_effect=load_batch,
+        ) as mock_load_batch:
+            tasks.refresh_bookmarks_metadata(
+                self.user, Bookmark.objects.filter(id__in=[bookmark1.id, bookmark2.id])
+            )
+
+            mock_load_batch.assert_called_once()
+            self.assertCountEqual(
+                mock_load_batch.call_args.args[0], [bookmark1.url, bookmark2.url]
+            )
+
+        bookmark1.refresh_from_db()
+        bookmark2.refresh_from_db()
+        other_bookmark.refresh_from_db()
+        self.assertEqual(bookmark1.title, "Title 1")
+        self.assertEqual(bookmark1.description, "New description")
+        self.assertEqual(bookmark2.title, "Title 2")
+        self.assertEqual(bookmark2.description, "Old description")
+        self.assertEqual(other_bookmark.title, "Old")
+        # should load preview images for refreshed bookmarks
+        self.assertEqual(self.mock_load_preview_image.call_count, 2)
+
+    def test_refresh_bookmarks_metadata_reschedules_rate_limited_bookmarks(self):
+        bookmark1 = self.setup_bookmark(url="https://example.com/1", title="Old")
+        bookmark2 = self.setup_bookmark(url="https://example.com/2", title="Old")
+
+        with mock.patch(
+            "bookmarks.services.website_loader.load_website_metadata_batch",
+            return_value={
+                bookmark1.url: WebsiteMetadata(
+                    url=bookmark1.url,
+                    title="New",
+                    description=None,
+                    preview_image=None,
+                ),
+                bookmark2.url: FetchRateLimited("example.com", 30),
+            },
+        ):
+            tasks.refresh_bookmarks_metadata(
+                self.user, Bookmark.objects.filter(id__in=[bookmark1.id, bookmark2.id])
+            )
+
+        bookmark1.refresh_from_db()
+        bookmark2.refresh_from_db()
+        self.assertEqual(bookmark1.title, "New")
+        self.assertEqual(bookmark2.title, "Old")
+        scheduled = huey.scheduled()
+        self.assertEqual(len(scheduled), 1)
+        self.assertEqual(scheduled[0].args, (self.user.id, [bookmark2.id]))
+
+    @override_settings(LD_DISABLE_BACKGROUND_TASKS=True)
+    def test_refresh_bookmarks_metadata_not_called_when_background_tasks_disabled(
+        self,
+    ):
+        self.setup_bookmark()
+        with mock.patch(
+            "bookmarks.services.website_loader.load_website_metadata_batch"
+        ) as mock_load_batch:
+            tasks.refresh_bookmarks_metadata(self.user, Bookmark.objects.all())
+
+            mock_load_batch.assert_not_called()
+
     def test_refresh_metadata_updates_title_description(self):
         bookmark = self.setup_bookmark(
             title="Initial title",
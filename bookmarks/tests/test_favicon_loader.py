@@ -6,6 +6,7 @@ from pathlib import Path
 from unittest import mock
 
 from django.conf import settings
+from django.core.cache import cache
 from django.test import TestCase, override_settings
 
 from bookmarks.services import favicon_loader
@@ -14,9 +15,12 @@ mock_icon_data = b"mock_icon"
 
 
 class MockStreamingResponse:
-    def __init__(self, data=mock_icon_data, content_type="image/png"):
+    def __init__(
+        self, data=mock_icon_data, content_type="image/png", headers=None, status=200
+    ):
         self.chunks = [data]
-        self.headers = {"Content-Type": content_type}
+        self.status_code = status
+        self.headers = {"Content-Type": content_type, **(headers or {})}
 
     def iter_content(self, **kwargs):
         return self.chunks
@@ -35,15 +39,27 @@ class FaviconLoaderTestCase(TestCase):
             LD_FAVICON_FOLDER=self.temp_favicon_folder.name
         )
         self.favicon_folder_override.enable()
+        cache.clear()
 
     def tearDown(self) -> None:
         self.temp_favicon_folder.cleanup()
         self.favicon_folder_override.disable()
 
-    def create_mock_response(self, icon_data=mock_icon_data, content_type="image/png"):
+    def create_mock_response(
+        self,
+        icon_data=mock_icon_data,
+        content_type="image/png",
+        headers=None,
+        status=200,
+    ):
         mock_response = mock.Mock()
         mock_response.raw = io.BytesIO(icon_data)
-        return MockStreamingResponse(icon_data, content_type)
+        return MockStreamingResponse(icon_data, content_type, headers, status)
+
+    def make_icon_stale(self, filename):
+        one_day_ago = time.time() - 60 * 60 * 24
+        icon_path = self.get_icon_path(filename)
+        os.utime(icon_path.absolute(), (one_day_ago, one_day_ago))
 
     def clear_favicon_folder(self):
         folder = Path(settings.LD_FAVICON_FOLDER)
@@ -64,7 +80,7 @@ class FaviconLoaderTestCase(TestCase):
         return len(files)
 
     def test_load_favicon(self):
-        with mock.patch("requests.get") as mock_get:
+        with mock.patch("requests.Session.get") as mock_get:
             mock_get.return_value = self.create_mock_response()
             favicon_loader.load_favicon("https://example.com")
 
@@ -77,7 +93,7 @@ class FaviconLoaderTestCase(TestCase):
             )
 
     def test_load_favicon_creates_folder_if_not_exists(self):
-        with mock.patch("requests.get") as mock_get:
+        with mock.patch("requests.Session.get") as mock_get:
             mock_get.return_value = self.create_mock_response()
 
             folder = Path(settings.LD_FAVICON_FOLDER)
@@ -90,7 +106,7 @@ class FaviconLoaderTestCase(TestCase):
             self.assertTrue(folder.exists())
 
     def test_load_favicon_creates_single_icon_for_same_base_url(self):
-        with mock.patch("requests.get") as mock_get:
+        with mock.patch("requests.Session.get") as mock_get:
             mock_get.return_value = self.create_mock_response()
             favicon_loader.load_favicon("https://example.com")
             favicon_loader.load_favicon("https://example.com?foo=bar")
@@ -100,7 +116,7 @@ class FaviconLoaderTestCase(TestCase):
             self.assertTrue(self.icon_exists("https_example_com.png"))
 
     def test_load_favicon_creates_multiple_icons_for_different_base_url(self):
-        with mock.patch("requests.get") as mock_get:
+        with mock.patch("requests.Session.get") as mock_get:
             mock_get.return_value = self.create_mock_response()
             favicon_loader.load_favicon("https://example.com")
             favicon_loader.load_favicon("https://sub.example.com")
@@ -112,7 +128,7 @@ class FaviconLoaderTestCase(TestCase):
             self.assertTrue(self.icon_exists("https_other_domain_com.png"))
 
     def test_load_favicon_caches_icons(self):
-        with mock.patch("requests.get") as mock_get:
+        with mock.patch("requests.Session.get") as mock_get:
             mock_get.return_value = self.create_mock_response()
 
             favicon_file = favicon_loader.load_favicon("https://example.com")
@@ -125,7 +141,7 @@ class FaviconLoaderTestCase(TestCase):
             self.assertEqual(favicon_file, updated_favicon_file)
 
     def test_load_favicon_updates_stale_icon(self):
-        with mock.patch("requests.get") as mock_get:
+        with mock.patch("requests.Session.get") as mock_get:
             mock_get.return_value = self.create_mock_response()
             favicon_loader.load_favicon("https://example.com")
 
@@ -154,28 +170,130 @@ class FaviconLoaderTestCase(TestCase):
                 updated_mock_icon_data, self.get_icon_data("https_example_com.png")
             )
 
+    def test_load_favicon_does_not_list_folder_for_cached_icons(self):
+        with mock.patch("requests.Session.get") as mock_get:
+            mock_get.return_value = self.create_mock_response()
+            favicon_loader.load_favicon("https://example.com")
+
+            with mock.patch("os.scandir") as mock_scandir:
+                favicon_file = favicon_loader.load_favicon("https://example.com")
+
+                mock_scandir.assert_not_called()
+                self.assertEqual(favicon_file, "https_example_com.png")
+
+    def test_load_favicon_detects_icons_changed_by_other_processes(self):
+        with mock.patch("requests.Session.get") as mock_get:
+            mock_get.return_value = self.create_mock_response()
+            favicon_loader.load_favicon("https://example.com")
+            mock_get.reset_mock()
+
+            # icon removed, should load again
+            self.clear_favicon_folder()
+            favicon_loader.load_favicon("https://example.com")
+            mock_get.assert_called_once()
+            mock_get.reset_mock()
+
+            # icon added, should use existing file
+            self.get_icon_path("https_other_com.ico").write_bytes(mock_icon_data)
+            # timestamps might be too coarse to detect the change, so make sure
+            # the folder modification time differs
+            folder_mtime = time.time() + 10
+            os.utime(settings.LD_FAVICON_FOLDER, (folder_mtime, folder_mtime))
+            favicon_file = favicon_loader.load_favicon("https://other.com")
+            mock_get.assert_not_called()
+            self.assertEqual(favicon_file, "https_other_com.ico")
+
+    def test_load_favicon_refreshes_stale_icon_with_conditional_request(self):
+        with mock.patch("requests.Session.get") as mock_get:
+            mock_get.return_value = self.create_mock_response(
+                headers={
+                    "ETag": '"abc"',
+                    "Last-Modified": "Wed, 21 Oct 2015 07:28:00 GMT",
+                }
+            )
+            favicon_loader.load_favicon("https://example.com")
+            self.make_icon_stale("https_example_com.png")
+
+            mock_get.return_value = self.create_mock_response(icon_data=b"", status=304)
+            favicon_file = favicon_loader.load_favicon("https://example.com")
+
+            self.assertEqual(
+                mock_get.call_args.kwargs["headers"],
+                {
+                    "If-None-Match": '"abc"',
+                    "If-Modified-Since": "Wed, 21 Oct 2015 07:28:00 GMT",
+                },
+            )
+            self.assertEqual(favicon_file, "https_example_com.png")
+            self.assertEqual(mock_icon_data, self.get_icon_data(favicon_file))
+
+            # should reset the age of the icon
+            mock_get.reset_mock()
+            favicon_loader.load_favicon("https://example.com")
+            mock_get.assert_not_called()
+
+    def test_load_favicon_keeps_validators_when_cache_is_cleared(self):
+        with mock.patch("requests.Session.get") as mock_get:
+            mock_get.return_value = self.create_mock_response(headers={"ETag": '"abc"'})
+            favicon_loader.load_favicon("https://example.com")
+            self.make_icon_stale("https_example_com.png")
+            cache.clear()
+
+            mock_get.return_value = self.create_mock_response(icon_data=b"", status=304)
+            favicon_file = favicon_loader.load_favicon("https://example.com")
+
+            self.assertEqual(
+                mock_get.call_args.kwargs["headers"], {"If-None-Match": '"abc"'}
+            )
+            self.assertEqual(favicon_file, "https_example_com.png")
+
+    def test_load_favicon_sends_no_conditional_request_without_validators(self):
+        with mock.patch("requests.Session.get") as mock_get:
+            mock_get.return_value = self.create_mock_response()
+            favicon_loader.load_favicon("https://example.com")
+            self.make_icon_stale("https_example_com.png")
+
+            favicon_loader.load_favicon("https://example.com")
+
+            self.assertEqual(mock_get.call_args.kwargs["headers"], {})
+
+    def test_load_favicon_ignores_validators_of_removed_icon(self):
+        with mock.patch("requests.Session.get") as mock_get:
+            mock_get.return_value = self.create_mock_response(headers={"ETag": "abc"})
+            favicon_loader.load_favicon("https://example.com")
+            self.clear_favicon_folder()
+
+            favicon_loader.load_favicon("https://example.com")
+
+            self.assertEqual(mock_get.call_args.kwargs["headers"], {})
+            self.assertTrue(self.icon_exists("https_example_com.png"))
+
     @override_settings(LD_FAVICON_PROVIDER="https://custom.icons.com/?url={url}")
     def test_custom_provider_with_url_param(self):
-        with mock.patch("requests.get") as mock_get:
+        with mock.patch("requests.Session.get") as mock_get:
             mock_get.return_value = self.create_mock_response()
 
             favicon_loader.load_favicon("https://example.com/foo?bar=baz")
             mock_get.assert_called_with(
-                "https://custom.icons.com/?url=https://example.com", stream=True
+                "https://custom.icons.com/?url=https://example.com",
+                stream=True,
+                headers={},
             )
 
     @override_settings(LD_FAVICON_PROVIDER="https://custom.icons.com/?url={domain}")
     def test_custom_provider_with_domain_param(self):
-        with mock.patch("requests.get") as mock_get:
+        with mock.patch("requests.Session.get") as mock_get:
             mock_get.return_value = self.create_mock_response()
 
             favicon_loader.load_favicon("https://example.com/foo?bar=baz")
             mock_get.assert_called_with(
-                "https://custom.icons.com/?url=example.com", stream=True
+                "https://custom.icons.com/?url=example.com",
+                stream=True,
+                headers={},
             )
 
     def test_guess_file_extension(self):
-        with mock.patch("requests.get") as mock_get:
+        with mock.patch("requests.Session.get") as mock_get:
             mock_get.return_value = self.create_mock_response(content_type="image/png")
             favicon_loader.load_favicon("https://example.com")
 
@@ -183,10 +301,20 @@ class FaviconLoaderTestCase(TestCase):
 
         self.clear_favicon_folder()
 
-        with mock.patch("requests.get") as mock_get:
+        with mock.patch("requests.Session.get") as mock_get:
             mock_get.return_value = self.create_mock_response(
                 content_type="image/x-icon"
             )
             favicon_loader.load_favicon("https://example.com")
 
             self.assertTrue(self.icon_exists("https_example_com.ico"))
+
+    def test_get_favicon_origin(self):
+        self.assertEqual(
+            favicon_loader.get_favicon_origin("https://example.com/foo?bar=baz"),
+            "https://example.com",
+        )
+        self.assertEqual(
+            favicon_loader.get_favicon_origin("http://sub.example.com/"),
+            "http://sub.example.com",
+        )
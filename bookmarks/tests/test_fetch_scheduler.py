@@ -0,0 +1,101 @@
+import threading
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from bookmarks.services import fetch_scheduler
+from bookmarks.services.fetch_scheduler import FetchRateLimited, FetchScheduler
+
+
+@override_settings(
+    LD_FETCH_HOST_RATE=0.1, LD_FETCH_HOST_BURST=2, LD_FETCH_MAX_CONCURRENCY=1
+)
+class FetchSchedulerTestCase(TestCase):
+    def setUp(self):
+        self.scheduler = FetchScheduler()
+
+    def test_does_not_limit_requests_outside_of_scope(self):
+        for _ in range(10):
+            self.scheduler.acquire("https://example.com")
+
+    def test_limits_requests_per_host(self):
+        with self.scheduler.scope():
+            self.scheduler.acquire("https://example.com/1")
+            self.scheduler.acquire("https://example.com/2")
+
+            with self.assertRaises(FetchRateLimited) as context:
+                self.scheduler.acquire("https://example.com/3")
+            self.assertEqual(context.exception.host, "example.com")
+            self.assertAlmostEqual(context.exception.delay, 10, delta=0.1)
+
+            # other hosts have their own limit
+            self.scheduler.acquire("https://other.com")
+
+    def test_refills_tokens_over_time(self):
+        with mock.patch.object(fetch_scheduler.time, "monotonic") as mock_monotonic:
+            mock_monotonic.return_value = 100
+            with self.scheduler.scope():
+                self.scheduler.acquire("https://example.com")
+                self.scheduler.acquire("https://example.com")
+
+                mock_monotonic.return_value = 110
+                self.scheduler.acquire("https://example.com")
+
+                with self.assertRaises(FetchRateLimited):
+                    self.scheduler.acquire("https://example.com")
+
+    @override_settings(LD_FETCH_HOST_RATE=2, LD_FETCH_HOST_BURST=1)
+    def test_waits_for_short_delays(self):
+        clock = [100.0]
+
+        def sleep(delay):
+            clock[0] += delay
+
+        with (
+            mock.patch.object(fetch_scheduler.time, "monotonic", lambda: clock[0]),
+            mock.patch.object(
+                fetch_scheduler.time, "sleep", side_effect=sleep
+            ) as mock_sleep,
+            self.scheduler.scope(),
+        ):
+            self.scheduler.acquire("https://example.com")
+            self.scheduler.acquire("https://example.com")
+
+            mock_sleep.assert_called_once_with(0.5)
+
+    def test_limits_concurrent_scopes(self):
+        errors = []
+        entered = threading.Event()
+        done = threading.Event()
+
+        def fetch_in_other_thread():
+            with self.scheduler.scope():
+                self.scheduler.acquire("https://other.com")
+                entered.set()
+                done.wait(5)
+
+        thread = threading.Thread(target=fetch_in_other_thread)
+        thread.start()
+        entered.wait(5)
+
+        with self.scheduler.scope():
+            try:
+                self.scheduler.acquire("https://example.com")
+            except FetchRateLimited as error:
+                errors.append(error)
+
+        done.set()
+        thread.join()
+
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0].delay, fetch_scheduler.CONCURRENCY_RETRY_DELAY)
+
+        # slot is released when the scope ends
+        with self.scheduler.scope():
+            self.scheduler.acquire("https://example.com")
+
+    def test_nested_scopes_share_slot(self):
+        with self.scheduler.scope():
+            self.scheduler.acquire("https://example.com")
+            with self.scheduler.scope():
+                self.scheduler.acquire("https://other.com")
@@ -0,0 +1,110 @@
+import gzip
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from bookmarks.services import asset_codecs
+from bookmarks.services.head_parser import HeadMetadata, parse_head
+
+
+class HeadParserTestCase(TestCase):
+    def test_parse_head(self):
+        html = """
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <title>  Test &amp; title  </title>
+            <meta name="description" content=" Test description ">
+            <meta property="og:description" content="Test og description">
+            <meta property="og:image" content="/image.jpg" />
+        </head>
+        <body></body>
+        </html>
+        """
+
+        self.assertEqual(
+            parse_head(html),
+            HeadMetadata(
+                title="Test & title",
+                description="Test description",
+                og_description="Test og description",
+                og_image="/image.jpg",
+            ),
+        )
+
+    def test_parse_head_without_metadata(self):
+        self.assertEqual(parse_head(""), HeadMetadata())
+        self.assertEqual(parse_head("<html><head></head></html>"), HeadMetadata())
+        self.assertEqual(parse_head("<title></title>"), HeadMetadata())
+
+    def test_parse_head_uses_first_tag_of_each_kind(self):
+        html = """
+        <title>First title</title>
+        <title>Second title</title>
+        <meta name="description" content="First description">
+        <meta name="description" content="Second description">
+        <meta property="og:image" content="first.jpg">
+        <meta property="og:image" content="second.jpg">
+        """
+
+        metadata = parse_head(html)
+
+        self.assertEqual(metadata.title, "First title")
+        self.assertEqual(metadata.description, "First description")
+        self.assertEqual(metadata.og_image, "first.jpg")
+
+    def test_parse_head_ignores_empty_content(self):
+        html = """
+        <meta name="description">
+        <meta property="og:description" content="  ">
+        <meta property="og:image" content="">
+        """
+
+        self.assertEqual(parse_head(html), HeadMetadata())
+
+    def test_parse_head_stops_at_end_of_head(self):
+        html = """
+        <head></head>
+        <title>Title in body</title>
+        <meta name="description" content="Description in body">
+        """
+        self.assertEqual(parse_head(html), HeadMetadata())
+
+        html = """
+        <body>
+        <svg><title>Title in body</title></svg>
+        """
+        self.assertEqual(parse_head(html), HeadMetadata())
+
+    def test_parse_head_ignores_script_content(self):
+        html = """
+        <head>
+        <script>document.write("<title>Title in script</title>")</script>
+        <title>Title</title>
+        </head>
+        """
+
+        self.assertEqual(parse_head(html).title, "Title")
+
+    def test_benchmark_command(self):
+        with tempfile.TemporaryDirectory() as folder:
+            with open(os.path.join(folder, "page.html"), "w") as f:
+                f.write("<head><title>Page</title></head>")
+            with gzip.open(os.path.join(folder, "snapshot.html.gz"), "wt") as f:
+                f.write("<head><title>Snapshot</title></head>")
+            zstd = asset_codecs.get_codec(asset_codecs.ZSTD)
+            with zstd.open_writer(os.path.join(folder, "snapshot.html.zst")) as f:
+                f.write(b"<head><title>Zstd snapshot</title></head>")
+            with open(os.path.join(folder, "image.jpg"), "w") as f:
+                f.write("not a page")
+
+            out = StringIO()
+            call_command("benchmark_metadata_parser", folder, rounds=2, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn("pages: 3, rounds: 2", output)
+        self.assertIn("head parser:", output)
+        self.assertIn("beautifulsoup:", output)
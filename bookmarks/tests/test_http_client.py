@@ -0,0 +1,107 @@
+import threading
+from http.client import HTTPMessage
+from unittest import mock
+
+import requests
+import urllib3
+from django.test import TestCase, override_settings
+from requests.cookies import MockRequest, MockResponse
+
+from bookmarks.services import http_client
+
+
+class HttpClientTestCase(TestCase):
+    def test_reuses_session_within_thread(self):
+        self.assertIs(http_client.get_session(), http_client.get_session())
+
+    def test_uses_separate_session_per_thread(self):
+        sessions = []
+        thread = threading.Thread(
+            target=lambda: sessions.append(http_client.get_session())
+        )
+        thread.start()
+        thread.join()
+
+        self.assertIsNot(sessions[0], http_client.get_session())
+
+    @override_settings(
+        LD_HTTP_POOL_CONNECTIONS=3,
+        LD_HTTP_POOL_MAXSIZE=7,
+        LD_HTTP_RETRIES=4,
+        LD_HTTP_RETRY_BACKOFF=1.5,
+    )
+    def test_configures_pool_and_retries_from_settings(self):
+        session = http_client._create_session()
+
+        for scheme in ["http://", "https://"]:
+            adapter = session.get_adapter(f"{scheme}example.com")
+            self.assertEqual(adapter._pool_connections, 3)
+            self.assertEqual(adapter._pool_maxsize, 7)
+            self.assertEqual(adapter.max_retries.total, 4)
+            self.assertEqual(adapter.max_retries.read, 0)
+            self.assertEqual(adapter.max_retries.backoff_factor, 1.5)
+            self.assertEqual(
+                adapter.max_retries.status_forcelist, http_client.RETRY_STATUS_CODES
+            )
+
+    def test_does_not_retry_read_timeouts(self):
+        session = http_client._create_session()
+        retry = session.get_adapter("https://example.com").max_retries
+        error = urllib3.exceptions.ReadTimeoutError(None, "/", "Read timed out.")
+
+        with self.assertRaises(urllib3.exceptions.MaxRetryError):
+            retry.increment(method="GET", url="/", error=error)
+
+    def test_retries_connection_errors_and_status_codes(self):
+        session = http_client._create_session()
+        retry = session.get_adapter("https://example.com").max_retries
+        error = urllib3.exceptions.ConnectTimeoutError(None, "Connect timed out.")
+        response = urllib3.HTTPResponse(status=503)
+
+        retry = retry.increment(method="GET", url="/", error=error)
+        retry = retry.increment(method="GET", url="/", response=response)
+
+        self.assertEqual(len(retry.history), 2)
+
+    def test_session_does_not_keep_cookies(self):
+        session = http_client._create_session()
+        headers = HTTPMessage()
+        headers["Set-Cookie"] = "session=abc; Path=/"
+        request = requests.Request("GET", "https://example.com/").prepare()
+
+        session.cookies.extract_cookies(MockResponse(headers), MockRequest(request))
+
+        self.assertEqual(len(session.cookies), 0)
+        # A default session would keep the cookie
+        default_session = requests.Session()
+        default_session.cookies.extract_cookies(
+            MockResponse(headers), MockRequest(request)
+        )
+        self.assertEqual(len(default_session.cookies), 1)
+
+    def test_get_and_head_use_session(self):
+        with (
+            mock.patch("requests.Session.get") as mock_get,
+            mock.patch("requests.Session.head") as mock_head,
+        ):
+            http_client.get("https://example.com", stream=True)
+            http_client.head("https://example.com", timeout=5)
+
+            mock_get.assert_called_once_with("https://example.com", stream=True)
+            mock_head.assert_called_once_with("https://example.com", timeout=5)
+
+    def test_conditional_headers_from_validators(self):
+        response = mock.Mock(
+            headers={"ETag": '"abc"', "Last-Modified": "Wed, 21 Oct 2015 07:28:00 GMT"}
+        )
+        validators = http_client.get_validators(response)
+
+        self.assertEqual(
+            http_client.get_conditional_headers(validators),
+            {
+                "If-None-Match": '"abc"',
+                "If-Modified-Since": "Wed, 21 Oct 2015 07:28:00 GMT",
+            },
+        )
+        self.assertEqual(http_client.get_validators(mock.Mock(headers={})), {})
+        self.assertEqual(http_client.get_conditional_headers({}), {})
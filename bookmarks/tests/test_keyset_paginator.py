@@ -0,0 +1,155 @@
+import datetime
+
+from django.test import TestCase
+from django.utils import timezone
+
+from bookmarks import queries
+from bookmarks.models import Bookmark, BookmarkSearch
+from bookmarks.pagination import KeysetPaginator
+from bookmarks.tests.helpers import BookmarkFactoryMixin
+
+
+class KeysetPaginatorTestCase(TestCase, BookmarkFactoryMixin):
+    def setup_bookmarks(self, count: int = 10):
+        # Use a few identical dates to verify that the ID is used as tiebreaker
+        now = timezone.now()
+        bookmarks = []
+        for i in range(count):
+            added = now - datetime.timedelta(days=i // 3)
+            bookmarks.append(self.setup_bookmark(title=f"Bookmark {i}", added=added))
+        return bookmarks
+
+    def walk_forward(self, paginator: KeysetPaginator):
+        pages = []
+        page = paginator.get_page(None)
+        pages.append(list(page))
+        while page.has_next():
+            page = paginator.get_page(page.next_cursor)
+            pages.append(list(page))
+        return pages, page
+
+    def test_first_page(self):
+        bookmarks = self.setup_bookmarks()
+        expected = sorted(bookmarks, key=lambda b: (b.date_added, b.id), reverse=True)
+
+        paginator = KeysetPaginator(Bookmark.objects.all(), ["-date_added", "-id"], 4)
+        page = paginator.get_page(None)
+
+        self.assertEqual(list(page), expected[0:4])
+        self.assertTrue(page.has_next())
+        self.assertFalse(page.has_previous())
+
+    def test_walk_forward_and_backward(self):
+        for ordering in [
+            ["-date_added", "-id"],
+            ["date_added", "id"],
+            ["title", "id"],
+            ["-title", "-id"],
+        ]:
+            with self.subTest(ordering=ordering):
+                Bookmark.objects.all().delete()
+                bookmarks = self.setup_bookmarks()
+                expected = list(Bookmark.objects.order_by(*ordering))
+                paginator = KeysetPaginator(Bookmark.objects.all(), ordering, 4)
+
+                pages, last_page = self.walk_forward(paginator)
+                self.assertEqual(pages, [expected[0:4], expected[4:8], expected[8:10]])
+                self.assertFalse(last_page.has_next())
+                self.assertTrue(last_page.has_previous())
+
+                page = paginator.get_page(last_page.previous_cursor)
+                self.assertEqual(list(page), expected[4:8])
+                self.assertTrue(page.has_next())
+                self.assertTrue(page.has_previous())
+
+                page = paginator.get_page(page.previous_cursor)
+                self.assertEqual(list(page), expected[0:4])
+                self.assertTrue(page.has_next())
+                self.assertFalse(page.has_previous())
+
+                page = paginator.get_page(page.next_cursor)
+                self.assertEqual(list(page), expected[4:8])
+                self.assertEqual(len(bookmarks), paginator.count)
+
+    def test_page_is_stable_when_inserting_items(self):
+        bookmarks = self.setup_bookmarks()
+        expected = sorted(bookmarks, key=lambda b: (b.date_added, b.id), reverse=True)
+        paginator = KeysetPaginator(Bookmark.objects.all(), ["-date_added", "-id"], 4)
+
+        first_page = paginator.get_page(None)
+        self.setup_bookmark()
+        second_page = paginator.get_page(first_page.next_cursor)
+
+        self.assertEqual(list(second_page), expected[4:8])
+
+    def test_empty_page_links_to_previous_page(self):
+        bookmarks = self.setup_bookmarks(6)
+        expected = sorted(bookmarks, key=lambda b: (b.date_added, b.id), reverse=True)
+        paginator = KeysetPaginator(Bookmark.objects.all(), ["-date_added", "-id"], 4)
+
+        first_page = paginator.get_page(None)
+        Bookmark.objects.filter(id__in=[b.id for b in expected[4:6]]).delete()
+        second_page = paginator.get_page(first_page.next_cursor)
+
+        self.assertEqual(list(second_page), [])
+        self.assertFalse(second_page.has_next())
+        self.assertTrue(second_page.has_previous())
+
+        page = paginator.get_page(second_page.previous_cursor)
+        self.assertEqual(list(page), expected[0:3])
+
+    def test_invalid_cursor_returns_first_page(self):
+        bookmarks = self.setup_bookmarks()
+        expected = sorted(bookmarks, key=lambda b: (b.date_added, b.id), reverse=True)
+        paginator = KeysetPaginator(Bookmark.objects.all(), ["-date_added", "-id"], 4)
+        other_paginator = KeysetPaginator(Bookmark.objects.all(), ["title", "id"], 4)
+        other_cursor = other_paginator.get_page(None).next_cursor
+
+        for cursor in ["2", "invalid", "e30=", "alert('xss')", other_cursor]:
+            with self.subTest(cursor=cursor):
+                page = paginator.get_page(cursor)
+                self.assertEqual(list(page), expected[0:4])
+                self.assertFalse(page.has_previous())
+
+    def test_cursor_with_invalid_values_returns_first_page(self):
+        bookmarks = self.setup_bookmarks()
+        expected = sorted(bookmarks, key=lambda b: (b.date_added, b.id), reverse=True)
+        paginator = KeysetPaginator(Bookmark.objects.all(), ["-date_added", "-id"], 4)
+        cursor = paginator._encode_values(["not a date", 1], reverse=False)
+
+        page = paginator.get_page(cursor)
+
+        self.assertEqual(list(page), expected[0:4])
+
+    def test_keyset_ordering_for_search(self):
+        self.setup_bookmarks()
+        profile = self.get_or_create_test_user().profile
+
+        for sort in [
+            BookmarkSearch.SORT_ADDED_ASC,
+            BookmarkSearch.SORT_ADDED_DESC,
+            BookmarkSearch.SORT_MODIFIED_ASC,
+            BookmarkSearch.SORT_MODIFIED_DESC,
+            BookmarkSearch.SORT_TITLE_ASC,
+            BookmarkSearch.SORT_TITLE_DESC,
+        ]:
+            with self.subTest(sort=sort):
+                search = BookmarkSearch(sort=sort)
+                query_set = queries.query_bookmarks(self.user, profile, search)
+                ordering = queries.get_keyset_ordering(search)
+                paginator = KeysetPaginator(query_set, ordering, 3)
+                pages, _ = self.walk_forward(paginator)
+                actual = [b for page in pages for b in page]
+
+                # Titles are unique, so the order must match the regular query
+                # set, while dates require the ID as tiebreaker
+                if sort in [
+                    BookmarkSearch.SORT_TITLE_ASC,
+                    BookmarkSearch.SORT_TITLE_DESC,
+                ]:
+                    self.assertEqual(actual, list(query_set))
+                else:
+                    self.assertEqual(actual, list(Bookmark.objects.order_by(*ordering)))
+
+        search = BookmarkSearch(sort=BookmarkSearch.SORT_RELEVANCE)
+        self.assertIsNone(queries.get_keyset_ordering(search))
@@ -5,6 +5,7 @@ from pathlib import Path
 from unittest import mock
 
 from django.conf import settings
+from django.core.cache import cache
 from django.test import TestCase
 
 from bookmarks.services import preview_image_loader
@@ -20,13 +21,18 @@ class MockStreamingResponse:
         content_type="image/png",
         content_length=None,
         status_code=200,
+        headers=None,
     ):
         self.url = url
         self.chunks = [data]
         self.status_code = status_code
         if not content_length:
             content_length = len(data)
-        self.headers = {"Content-Type": content_type, "Content-Length": content_length}
+        self.headers = {
+            "Content-Type": content_type,
+            "Content-Length": content_length,
+            **(headers or {}),
+        }
 
     def iter_content(self, **kwargs):
         return self.chunks
@@ -43,6 +49,7 @@ class PreviewImageLoaderTestCase(TestCase):
         self.temp_folder = tempfile.TemporaryDirectory()
         self.settings_override = self.settings(LD_PREVIEW_FOLDER=self.temp_folder.name)
         self.settings_override.enable()
+        cache.clear()
         self.mock_load_website_metadata_patcher = mock.patch(
             "bookmarks.services.website_loader.load_website_metadata"
         )
@@ -65,13 +72,14 @@ class PreviewImageLoaderTestCase(TestCase):
         content_type="image/png",
         content_length=None,
         status_code=200,
+        headers=None,
     ):
         if not content_length:
             content_length = len(icon_data)
         mock_response = mock.Mock()
         mock_response.raw = io.BytesIO(icon_data)
         return MockStreamingResponse(
-            url, icon_data, content_type, content_length, status_code
+            url, icon_data, content_type, content_length, status_code, headers
         )
 
     def get_image_path(self, filename):
@@ -85,7 +93,7 @@ class PreviewImageLoaderTestCase(TestCase):
         self.assertFalse(os.listdir(settings.LD_PREVIEW_FOLDER))
 
     def test_load_preview_image(self):
-        with mock.patch("requests.get") as mock_get:
+        with mock.patch("requests.Session.get") as mock_get:
             mock_get.return_value = self.create_mock_response()
 
             file = preview_image_loader.load_preview_image("https://example.com")
@@ -93,8 +101,68 @@ class PreviewImageLoaderTestCase(TestCase):
             self.assertIsNotNone(file)
             self.assertImageExists(file, mock_image_data)
 
+    def test_load_preview_image_refreshes_with_conditional_request(self):
+        with mock.patch("requests.Session.get") as mock_get:
+            mock_get.return_value = self.create_mock_response(headers={"ETag": '"abc"'})
+            file = preview_image_loader.load_preview_image("https://example.com")
+            self.assertEqual(mock_get.call_args.kwargs["headers"], {})
+
+            mock_get.return_value = self.create_mock_response(
+                icon_data=b"", status_code=304
+            )
+            refreshed_file = preview_image_loader.load_preview_image(
+                "https://example.com"
+            )
+
+            self.assertEqual(
+                mock_get.call_args.kwargs["headers"], {"If-None-Match": '"abc"'}
+            )
+            self.assertEqual(refreshed_file, file)
+            self.assertImageExists(file, mock_image_data)
+
+    def test_load_preview_image_keeps_validators_when_cache_is_cleared(self):
+        with mock.patch("requests.Session.get") as mock_get:
+            mock_get.return_value = self.create_mock_response(headers={"ETag": '"abc"'})
+            file = preview_image_loader.load_preview_image("https://example.com")
+            cache.clear()
+
+            mock_get.return_value = self.create_mock_response(
+                icon_data=b"", status_code=304
+            )
+            refreshed_file = preview_image_loader.load_preview_image(
+                "https://example.com"
+            )
+
+            self.assertEqual(
+                mock_get.call_args.kwargs["headers"], {"If-None-Match": '"abc"'}
+            )
+            self.assertEqual(refreshed_file, file)
+
+    def test_load_preview_image_ignores_validators_of_other_image(self):
+        with mock.patch("requests.Session.get") as mock_get:
+            mock_get.return_value = self.create_mock_response(headers={"ETag": '"abc"'})
+            preview_image_loader.load_preview_image("https://example.com")
+
+            self.mock_load_website_metadata.return_value = mock.Mock(
+                preview_image="https://example.com/other.png"
+            )
+            preview_image_loader.load_preview_image("https://example.com")
+
+            self.assertEqual(mock_get.call_args.kwargs["headers"], {})
+
+    def test_load_preview_image_ignores_validators_of_removed_image(self):
+        with mock.patch("requests.Session.get") as mock_get:
+            mock_get.return_value = self.create_mock_response(headers={"ETag": '"abc"'})
+            file = preview_image_loader.load_preview_image("https://example.com")
+            self.get_image_path(file).unlink()
+
+            file = preview_image_loader.load_preview_image("https://example.com")
+
+            self.assertEqual(mock_get.call_args.kwargs["headers"], {})
+            self.assertImageExists(file, mock_image_data)
+
     def test_load_preview_image_returns_none_if_no_preview_image_detected(self):
-        with mock.patch("requests.get") as mock_get:
+        with mock.patch("requests.Session.get") as mock_get:
             mock_get.return_value = self.create_mock_response()
             self.mock_load_website_metadata.return_value = mock.Mock(preview_image=None)
 
@@ -107,7 +175,7 @@ class PreviewImageLoaderTestCase(TestCase):
         invalid_status_codes = [199, 300, 400, 500]
 
         for status_code in invalid_status_codes:
-            with mock.patch("requests.get") as mock_get:
+            with mock.patch("requests.Session.get") as mock_get:
                 mock_get.return_value = self.create_mock_response(
                     status_code=status_code
                 )
@@ -119,7 +187,7 @@ class PreviewImageLoaderTestCase(TestCase):
 
     def test_load_preview_image_returns_none_if_content_length_exceeds_limit(self):
         # exceeds max size
-        with mock.patch("requests.get") as mock_get:
+        with mock.patch("requests.Session.get") as mock_get:
             mock_get.return_value = self.create_mock_response(
                 content_length=settings.LD_PREVIEW_MAX_SIZE + 1
             )
@@ -130,7 +198,7 @@ class PreviewImageLoaderTestCase(TestCase):
             self.assertNoImageExists()
 
         # equals max size
-        with mock.patch("requests.get") as mock_get:
+        with mock.patch("requests.Session.get") as mock_get:
             mock_get.return_value = self.create_mock_response(
                 content_length=settings.LD_PREVIEW_MAX_SIZE
             )
@@ -144,7 +212,7 @@ class PreviewImageLoaderTestCase(TestCase):
         invalid_content_types = ["text/html", "application/json"]
 
         for content_type in invalid_content_types:
-            with mock.patch("requests.get") as mock_get:
+            with mock.patch("requests.Session.get") as mock_get:
                 mock_get.return_value = self.create_mock_response(
                     content_type=content_type
                 )
@@ -157,7 +225,7 @@ class PreviewImageLoaderTestCase(TestCase):
         valid_content_types = ["image/png", "image/jpeg", "image/gif"]
 
         for content_type in valid_content_types:
-            with mock.patch("requests.get") as mock_get:
+            with mock.patch("requests.Session.get") as mock_get:
                 mock_get.return_value = self.create_mock_response(
                     content_type=content_type
                 )
@@ -168,7 +236,7 @@ class PreviewImageLoaderTestCase(TestCase):
                 self.assertImageExists(file, mock_image_data)
 
     def test_load_preview_image_returns_none_if_download_exceeds_content_length(self):
-        with mock.patch("requests.get") as mock_get:
+        with mock.patch("requests.Session.get") as mock_get:
             mock_get.return_value = self.create_mock_response(content_length=1)
 
             file = preview_image_loader.load_preview_image("https://example.com")
@@ -177,7 +245,7 @@ class PreviewImageLoaderTestCase(TestCase):
             self.assertNoImageExists()
 
     def test_load_preview_image_creates_folder_if_not_exists(self):
-        with mock.patch("requests.get") as mock_get:
+        with mock.patch("requests.Session.get") as mock_get:
             mock_get.return_value = self.create_mock_response()
 
             folder = Path(settings.LD_PREVIEW_FOLDER)
@@ -190,7 +258,7 @@ class PreviewImageLoaderTestCase(TestCase):
             self.assertTrue(folder.exists())
 
     def test_guess_file_extension(self):
-        with mock.patch("requests.get") as mock_get:
+        with mock.patch("requests.Session.get") as mock_get:
             mock_get.return_value = self.create_mock_response(content_type="image/png")
 
             file = preview_image_loader.load_preview_image("https://example.com")
@@ -198,7 +266,7 @@ class PreviewImageLoaderTestCase(TestCase):
             self.assertImageExists(file, mock_image_data)
             self.assertEqual("png", file.split(".")[-1])
 
-        with mock.patch("requests.get") as mock_get:
+        with mock.patch("requests.Session.get") as mock_get:
             mock_get.return_value = self.create_mock_response(content_type="image/jpeg")
 
             file = preview_image_loader.load_preview_image("https://example.com")
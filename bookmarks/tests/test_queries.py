@@ -1,5 +1,6 @@
 import datetime
 import operator
+from unittest import mock
 
 from django.db.models import QuerySet
 from django.test import TestCase
@@ -7,6 +8,7 @@ from django.utils import timezone
 
 from bookmarks import queries
 from bookmarks.models import BookmarkBundle, BookmarkSearch, UserProfile
+from bookmarks.services import search_index
 from bookmarks.tests.helpers import BookmarkFactoryMixin, random_sentence
 from bookmarks.utils import unique
 
@@ -1278,6 +1280,52 @@ class QueriesBasicTestCase(TestCase, BookmarkFactoryMixin):
         actual_effective_titles = [b.resolved_title for b in query]
         self.assertEqual(expected_effective_titles, actual_effective_titles)
 
+    def setup_relevance_sort_data(self):
+        # Use fields of similar length, so that the score only depends on the
+        # column in which the term occurs
+        return [
+            self.setup_bookmark(
+                title="other", url="https://example.com/term1", added=timezone.now()
+            ),
+            self.setup_bookmark(title="other", notes="some term1 notes"),
+            self.setup_bookmark(title="other", description="some term1 text"),
+            self.setup_bookmark(title="some term1 title"),
+        ]
+
+    def test_sort_by_relevance(self):
+        url_match, notes_match, description_match, title_match = (
+            self.setup_relevance_sort_data()
+        )
+        self.setup_bookmark(title="other")
+
+        search = BookmarkSearch(q="term1", sort=BookmarkSearch.SORT_RELEVANCE)
+        query = queries.query_bookmarks(self.user, self.profile, search)
+
+        self.assertEqual(
+            list(query), [title_match, description_match, notes_match, url_match]
+        )
+
+    def test_sort_by_relevance_without_fts_index(self):
+        url_match, notes_match, description_match, title_match = (
+            self.setup_relevance_sort_data()
+        )
+
+        with mock.patch.object(search_index, "is_fts_enabled", return_value=False):
+            search = BookmarkSearch(q="term1", sort=BookmarkSearch.SORT_RELEVANCE)
+            query = queries.query_bookmarks(self.user, self.profile, search)
+
+            self.assertEqual(
+                list(query), [title_match, description_match, notes_match, url_match]
+            )
+
+    def test_sort_by_relevance_without_terms_sorts_by_date_added(self):
+        bookmarks = self.setup_relevance_sort_data()
+        sorted_bookmarks = sorted(bookmarks, key=lambda b: b.date_added, reverse=True)
+
+        search = BookmarkSearch(sort=BookmarkSearch.SORT_RELEVANCE)
+        query = queries.query_bookmarks(self.user, self.profile, search)
+        self.assertEqual(list(query), sorted_bookmarks)
+
     def test_query_bookmarks_filter_modified_since(self):
         # Create bookmarks with different modification dates
         older_bookmark = self.setup_bookmark(title="old bookmark")
@@ -1862,6 +1910,39 @@ class QueriesAdvancedSearchTestCase(TestCase, BookmarkFactoryMixin):
         query = queries.query_bookmarks(self.user, self.profile, search)
         self.assertCountEqual(list(query), [])
 
+    def test_sort_by_relevance_ranks_more_matching_terms_higher(self):
+        both_terms = self.setup_bookmark(title="some term1 term2 title")
+        one_term = self.setup_bookmark(title="some term1 title")
+
+        search = BookmarkSearch(q="term1 or term2", sort=BookmarkSearch.SORT_RELEVANCE)
+        query = queries.query_bookmarks(self.user, self.profile, search)
+
+        self.assertEqual(list(query), [both_terms, one_term])
+
+    def test_sort_by_relevance_ignores_negated_terms(self):
+        title_match = self.setup_bookmark(title="some term1 title")
+        description_match = self.setup_bookmark(
+            title="other", description="some term1 text"
+        )
+
+        search = BookmarkSearch(
+            q="term1 and not other2", sort=BookmarkSearch.SORT_RELEVANCE
+        )
+        query = queries.query_bookmarks(self.user, self.profile, search)
+
+        self.assertEqual(list(query), [title_match, description_match])
+
+    def test_sort_by_relevance_without_terms_sorts_by_date_added(self):
+        bookmarks = [
+            self.setup_bookmark(title="term1", unread=True),
+            self.setup_bookmark(title="term1", unread=True),
+        ]
+        sorted_bookmarks = sorted(bookmarks, key=lambda b: b.date_added, reverse=True)
+
+        search = BookmarkSearch(q="!unread", sort=BookmarkSearch.SORT_RELEVANCE)
+        query = queries.query_bookmarks(self.user, self.profile, search)
+        self.assertEqual(list(query), sorted_bookmarks)
+
 
 class GetTagsForQueryTestCase(TestCase, BookmarkFactoryMixin):
     def setUp(self):
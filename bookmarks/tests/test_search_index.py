@@ -0,0 +1,189 @@
+from unittest import mock
+
+from django.db.models import Subquery
+from django.test import TestCase
+
+from bookmarks import queries
+from bookmarks.models import Bookmark, BookmarkSearch
+from bookmarks.services import search_index
+from bookmarks.services.search_query_parser import parse_search_query
+from bookmarks.tests.helpers import BookmarkFactoryMixin
+
+
+class SearchIndexTestCase(TestCase, BookmarkFactoryMixin):
+    def setUp(self):
+        self.profile = self.get_or_create_test_user().profile
+
+    def search(self, q: str):
+        return list(
+            queries.query_bookmarks(
+                self.user, self.profile, BookmarkSearch(q=q)
+            ).order_by("id")
+        )
+
+    def test_fts_enabled(self):
+        self.assertTrue(search_index.is_fts_enabled())
+
+    def test_term_condition_uses_fts_index(self):
+        condition = search_index.term_condition("term1")
+        query = str(Bookmark.objects.filter(condition).query)
+
+        self.assertIn(search_index.FTS_TABLE, query)
+        self.assertNotIn("LIKE", query)
+
+    def test_term_condition_falls_back_to_like_for_short_terms(self):
+        condition = search_index.term_condition("ab")
+        query = str(Bookmark.objects.filter(condition).query)
+
+        self.assertNotIn(search_index.FTS_TABLE, query)
+        self.assertIn("LIKE", query)
+
+    def test_term_condition_falls_back_to_like_if_fts_disabled(self):
+        with mock.patch.object(search_index, "is_fts_enabled", return_value=False):
+            condition = search_index.term_condition("term1")
+            query = str(Bookmark.objects.filter(condition).query)
+
+        self.assertNotIn(search_index.FTS_TABLE, query)
+        self.assertIn("LIKE", query)
+
+    def test_index_matches_substrings_in_all_columns(self):
+        title_bookmark = self.setup_bookmark(title="Some FooBar title")
+        description_bookmark = self.setup_bookmark(description="Some foobar text")
+        notes_bookmark = self.setup_bookmark(notes="Some FOOBAR notes")
+        url_bookmark = self.setup_bookmark(url="https://example.com/afoobarb")
+        self.setup_bookmark(title="Some other title")
+
+        self.assertEqual(
+            self.search("oba"),
+            [title_bookmark, description_bookmark, notes_bookmark, url_bookmark],
+        )
+
+    def test_index_matches_phrases_and_special_characters(self):
+        phrase_bookmark = self.setup_bookmark(title="Some foo bar title")
+        quote_bookmark = self.setup_bookmark(title='Some "quoted" title')
+        percent_bookmark = self.setup_bookmark(title="Some 100% title")
+        self.setup_bookmark(title="Some foo baz title")
+
+        self.assertEqual(self.search('"foo bar"'), [phrase_bookmark])
+        self.assertEqual(self.search('"quoted"'), [quote_bookmark])
+        self.assertEqual(self.search("00%"), [percent_bookmark])
+
+    def test_index_is_updated_on_save(self):
+        bookmark = self.setup_bookmark(title="Old title")
+        self.assertEqual(self.search("Old title"), [bookmark])
+
+        bookmark.title = "New title"
+        bookmark.save()
+
+        self.assertEqual(self.search("Old title"), [])
+        self.assertEqual(self.search("New title"), [bookmark])
+
+    def test_index_is_updated_on_bulk_update(self):
+        bookmark1 = self.setup_bookmark(description="Old description")
+        bookmark2 = self.setup_bookmark(description="Old description")
+
+        Bookmark.objects.filter(id=bookmark1.id).update(description="New description")
+        bookmark2.description = "New description"
+        Bookmark.objects.bulk_update([bookmark2], ["description"])
+
+        self.assertEqual(self.search("Old description"), [])
+        self.assertEqual(self.search("New description"), [bookmark1, bookmark2])
+
+    def test_index_is_updated_on_delete(self):
+        bookmark1 = self.setup_bookmark(notes="Some notes")
+        bookmark2 = self.setup_bookmark(notes="Some notes")
+        bookmark3 = self.setup_bookmark(notes="Some notes")
+
+        bookmark1.delete()
+        Bookmark.objects.filter(id=bookmark2.id).delete()
+
+        self.assertEqual(self.search("Some notes"), [bookmark3])
+
+    def test_search_vector_disabled_for_sqlite(self):
+        self.assertFalse(search_index.is_search_vector_enabled())
+
+    def test_build_tsquery(self):
+        def build(query: str):
+            return search_index.build_tsquery(parse_search_query(query))
+
+        self.assertEqual(
+            build("term1"),
+            ("phraseto_tsquery('simple', %s)", ["term1"]),
+        )
+        self.assertEqual(
+            build('"term1 term2"'),
+            ("phraseto_tsquery('simple', %s)", ["term1 term2"]),
+        )
+        self.assertEqual(
+            build("term1 term2"),
+            (
+                "(phraseto_tsquery('simple', %s) && phraseto_tsquery('simple', %s))",
+                ["term1", "term2"],
+            ),
+        )
+        self.assertEqual(
+            build("term1 or term2"),
+            (
+                "(phraseto_tsquery('simple', %s) || phraseto_tsquery('simple', %s))",
+                ["term1", "term2"],
+            ),
+        )
+        self.assertEqual(
+            build("term1 and not (term2 or term3)"),
+            (
+                "(phraseto_tsquery('simple', %s) && (!!(phraseto_tsquery('simple', %s) || phraseto_tsquery('simple', %s))))",
+                ["term1", "term2", "term3"],
+            ),
+        )
+
+    def test_build_tsquery_skips_tags_and_keywords(self):
+        def build(query: str):
+            return search_index.build_tsquery(parse_search_query(query))
+
+        self.assertEqual(
+            build("term1 #tag1 !unread"),
+            ("phraseto_tsquery('simple', %s)", ["term1"]),
+        )
+        self.assertEqual(
+            build("#tag1 or not term1"),
+            ("(!!phraseto_tsquery('simple', %s))", ["term1"]),
+        )
+        self.assertIsNone(build("#tag1 !unread"))
+        self.assertIsNone(build("not #tag1"))
+
+    def rank(self, q: str):
+        return search_index.rank_expression(parse_search_query(q))
+
+    def test_rank_joins_fts_index_once(self):
+        query = str(
+            Bookmark.objects.annotate(search_rank=self.rank("term1 or term2")).query
+        )
+
+        self.assertIn(
+            f"LEFT OUTER JOIN (SELECT rowid, -bm25({search_index.FTS_TABLE}", query
+        )
+        self.assertEqual(query.count("MATCH"), 1)
+
+    def test_rank_works_in_subquery(self):
+        title_match = self.setup_bookmark(title="some term1 title")
+        self.setup_bookmark(title="other", description="some term1 text")
+        self.setup_bookmark(title="other")
+
+        ranked = (
+            Bookmark.objects.annotate(search_rank=self.rank("term1"))
+            .order_by("-search_rank")
+            .values("id")[:1]
+        )
+        bookmarks = Bookmark.objects.filter(id__in=Subquery(ranked))
+
+        self.assertEqual(list(bookmarks), [title_match])
+
+    def test_rank_scores_short_terms(self):
+        both_terms = self.setup_bookmark(title="some ab term1 title")
+        one_term = self.setup_bookmark(title="some term1 title")
+
+        bookmarks = Bookmark.objects.annotate(
+            search_rank=self.rank("ab or term1")
+        ).order_by("-search_rank")
+
+        self.assertEqual(list(bookmarks), [both_terms, one_term])
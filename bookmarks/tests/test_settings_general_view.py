@@ -1,8 +1,8 @@
 import hashlib
-import random
 from unittest.mock import Mock, patch
 
 import requests
+from django.core.cache import cache
 from django.test import TestCase, override_settings
 from django.urls import reverse
 from requests import RequestException
@@ -17,6 +17,7 @@ class SettingsGeneralViewTestCase(TestCase, BookmarkFactoryMixin):
     def setUp(self) -> None:
         user = self.get_or_create_test_user()
         self.client.force_login(user)
+        cache.clear()
 
     def create_profile_form_data(self, overrides=None):
         if not overrides:
@@ -440,10 +441,10 @@ class SettingsGeneralViewTestCase(TestCase, BookmarkFactoryMixin):
             status_code=200, json=lambda: {"name": f"v{app_version}"}
         )
         with patch.object(requests, "get", return_value=latest_version_response_mock):
-            # Clear the lru_cache so the view recomputes the version info under
+            # Clear the cache so the view recomputes the version info under
             # the mock instead of returning a value cached by an earlier test
             # that made a real (potentially rate-limited) network call.
-            get_version_info.cache_clear()
+            cache.clear()
             response = self.client.get(reverse("linkding:settings.general"))
             html = response.content.decode()
 
@@ -451,7 +452,7 @@ class SettingsGeneralViewTestCase(TestCase, BookmarkFactoryMixin):
                 f"""
                 <tr>
                     <td>Version</td>
-                    <td>{get_version_info(random.random())}</td>
+                    <td>{get_version_info()}</td>
                 </tr>
             """,
                 html,
@@ -462,7 +463,7 @@ class SettingsGeneralViewTestCase(TestCase, BookmarkFactoryMixin):
             status_code=200, json=lambda: {"name": f"v{app_version}"}
         )
         with patch.object(requests, "get", return_value=latest_version_response_mock):
-            version_info = get_version_info(random.random())
+            version_info = get_version_info()
             self.assertEqual(version_info, f"{app_version} (latest)")
 
     def test_get_version_info_shows_latest_version_when_versions_are_not_equal(self):
@@ -470,23 +471,36 @@ class SettingsGeneralViewTestCase(TestCase, BookmarkFactoryMixin):
             status_code=200, json=lambda: {"name": "v123.0.1"}
         )
         with patch.object(requests, "get", return_value=latest_version_response_mock):
-            version_info = get_version_info(random.random())
+            version_info = get_version_info()
             self.assertEqual(version_info, f"{app_version} (latest: 123.0.1)")
 
+    def test_get_version_info_is_cached(self):
+        latest_version_response_mock = Mock(
+            status_code=200, json=lambda: {"name": "v123.0.1"}
+        )
+        with patch.object(
+            requests, "get", return_value=latest_version_response_mock
+        ) as mock_get:
+            get_version_info()
+            version_info = get_version_info()
+
+            self.assertEqual(version_info, f"{app_version} (latest: 123.0.1)")
+            mock_get.assert_called_once()
+
     def test_get_version_info_silently_ignores_request_errors(self):
         with patch.object(requests, "get", side_effect=RequestException()):
-            version_info = get_version_info(random.random())
+            version_info = get_version_info()
             self.assertEqual(version_info, f"{app_version}")
 
     def test_get_version_info_handles_invalid_response(self):
         latest_version_response_mock = Mock(status_code=403, json=lambda: {})
         with patch.object(requests, "get", return_value=latest_version_response_mock):
-            version_info = get_version_info(random.random())
+            version_info = get_version_info()
             self.assertEqual(version_info, app_version)
 
         latest_version_response_mock = Mock(status_code=200, json=lambda: {})
         with patch.object(requests, "get", return_value=latest_version_response_mock):
-            version_info = get_version_info(random.random())
+            version_info = get_version_info()
             self.assertEqual(version_info, app_version)
 
     @override_settings(LD_ENABLE_SNAPSHOTS=True)
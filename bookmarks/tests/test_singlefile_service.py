@@ -8,39 +8,59 @@ from django.test import TestCase, override_settings
 from bookmarks.services import singlefile
 
 
+class ImmediateTimer:
+    # Timer that expires as soon as it is started
+    def __init__(self, interval, function, args):
+        self.function = function
+        self.args = args
+
+    def start(self):
+        self.function(*self.args)
+
+    def cancel(self):
+        pass
+
+
 class SingleFileServiceTestCase(TestCase):
-    def setUp(self):
-        self.temp_html_filepath = None
+    def create_mock_process(self, chunks=None, running=False):
+        if chunks is None:
+            chunks = [b"<html>", b"</html>"]
+        mock_process = mock.Mock()
+        mock_process.stdout.read.side_effect = [*chunks, b""]
+        mock_process.wait.return_value = 0
+        mock_process.poll.return_value = None if running else 0
+        return mock_process
 
-    def tearDown(self):
-        if self.temp_html_filepath and os.path.exists(self.temp_html_filepath):
-            os.remove(self.temp_html_filepath)
+    def test_stream_snapshot(self):
+        mock_process = self.create_mock_process()
 
-    def create_test_file(self, *args, **kwargs):
-        self.temp_html_filepath = tempfile.mkstemp(suffix=".tmp")[1]
+        with mock.patch("subprocess.Popen", return_value=mock_process):
+            chunks = list(singlefile.stream_snapshot("http://example.com"))
+
+        self.assertEqual(chunks, [b"<html>", b"</html>"])
+        mock_process.stdout.close.assert_called_once()
+        mock_process.terminate.assert_not_called()
 
-    def test_create_snapshot_failure(self):
+    def test_stream_snapshot_failure(self):
         # subprocess fails - which it probably doesn't as single-file doesn't return exit codes
         with mock.patch("subprocess.Popen") as mock_popen:
             mock_popen.side_effect = subprocess.CalledProcessError(1, "command")
 
             with self.assertRaises(singlefile.SingleFileError):
-                singlefile.create_snapshot("http://example.com", "nonexistentfile.tmp")
+                list(singlefile.stream_snapshot("http://example.com"))
 
-        # so also check that it raises error if output file isn't created
+        # so also check that it raises error if there is no output
         with (
-            mock.patch("subprocess.Popen"),
+            mock.patch("subprocess.Popen", return_value=self.create_mock_process([])),
             self.assertRaises(singlefile.SingleFileError),
         ):
-            singlefile.create_snapshot("http://example.com", "nonexistentfile.tmp")
-
-    def test_create_snapshot_empty_options(self):
-        mock_process = mock.Mock()
-        mock_process.wait.return_value = 0
-        self.create_test_file()
+            list(singlefile.stream_snapshot("http://example.com"))
 
-        with mock.patch("subprocess.Popen") as mock_popen:
-            singlefile.create_snapshot("http://example.com", self.temp_html_filepath)
+    def test_stream_snapshot_empty_options(self):
+        with mock.patch(
+            "subprocess.Popen", return_value=self.create_mock_process()
+        ) as mock_popen:
+            list(singlefile.stream_snapshot("http://example.com"))
 
             expected_args = [
                 "single-file",
@@ -48,21 +68,21 @@ class SingleFileServiceTestCase(TestCase):
                 '--browser-arg="--user-data-dir=./chromium-profile"',
                 '--browser-arg="--no-sandbox"',
                 '--browser-arg="--load-extension=uBOLite.chromium.mv3"',
+                "--dump-content",
                 "http://example.com",
-                self.temp_html_filepath,
             ]
-            mock_popen.assert_called_with(expected_args, start_new_session=True)
+            mock_popen.assert_called_with(
+                expected_args, stdout=subprocess.PIPE, start_new_session=True
+            )
 
     @override_settings(
         LD_SINGLEFILE_OPTIONS='--some-option "some value" --another-option "another value" --third-option="third value"'
     )
-    def test_create_snapshot_custom_options(self):
-        mock_process = mock.Mock()
-        mock_process.wait.return_value = 0
-        self.create_test_file()
-
-        with mock.patch("subprocess.Popen") as mock_popen:
-            singlefile.create_snapshot("http://example.com", self.temp_html_filepath)
+    def test_stream_snapshot_custom_options(self):
+        with mock.patch(
+            "subprocess.Popen", return_value=self.create_mock_process()
+        ) as mock_popen:
+            list(singlefile.stream_snapshot("http://example.com"))
 
             expected_args = [
                 "single-file",
@@ -75,28 +95,94 @@ class SingleFileServiceTestCase(TestCase):
                 "--another-option",
                 "another value",
                 "--third-option=third value",
+                "--dump-content",
                 "http://example.com",
-                self.temp_html_filepath,
             ]
-            mock_popen.assert_called_with(expected_args, start_new_session=True)
+            mock_popen.assert_called_with(
+                expected_args, stdout=subprocess.PIPE, start_new_session=True
+            )
 
-    def test_create_snapshot_default_timeout_setting(self):
-        mock_process = mock.Mock()
-        mock_process.wait.return_value = 0
-        self.create_test_file()
+    def test_stream_snapshot_with_home_dir(self):
+        with (
+            tempfile.TemporaryDirectory() as temp_dir,
+            mock.patch(
+                "subprocess.Popen", return_value=self.create_mock_process()
+            ) as mock_popen,
+        ):
+            home_dir = os.path.join(temp_dir, "worker-1")
+            list(singlefile.stream_snapshot("http://example.com", home_dir))
 
-        with mock.patch("subprocess.Popen", return_value=mock_process):
-            singlefile.create_snapshot("http://example.com", self.temp_html_filepath)
+            self.assertTrue(os.path.isdir(home_dir))
+            profile_dir = os.path.join(home_dir, "chromium-profile")
+            expected_args = [
+                "single-file",
+                '--browser-arg="--headless=new"',
+                '--browser-arg="--user-data-dir=./chromium-profile"',
+                '--browser-arg="--no-sandbox"',
+                '--browser-arg="--load-extension=uBOLite.chromium.mv3"',
+                f'--browser-arg="--user-data-dir={profile_dir}"',
+                "--dump-content",
+                "http://example.com",
+            ]
+            self.assertEqual(mock_popen.call_args.args[0], expected_args)
+            self.assertEqual(mock_popen.call_args.kwargs["env"]["HOME"], home_dir)
+            self.assertEqual(
+                mock_popen.call_args.kwargs["env"]["PATH"], os.environ["PATH"]
+            )
 
-            mock_process.wait.assert_called_with(timeout=120)
+    def test_stream_snapshot_default_timeout_setting(self):
+        with (
+            mock.patch("subprocess.Popen", return_value=self.create_mock_process()),
+            mock.patch("threading.Timer") as mock_timer,
+        ):
+            list(singlefile.stream_snapshot("http://example.com"))
+
+            self.assertEqual(mock_timer.call_args.args[0], 120)
+            mock_timer.return_value.cancel.assert_called_once()
 
     @override_settings(LD_SINGLEFILE_TIMEOUT_SEC=180)
-    def test_create_snapshot_custom_timeout_setting(self):
-        mock_process = mock.Mock()
-        mock_process.wait.return_value = 0
-        self.create_test_file()
+    def test_stream_snapshot_custom_timeout_setting(self):
+        with (
+            mock.patch("subprocess.Popen", return_value=self.create_mock_process()),
+            mock.patch("threading.Timer") as mock_timer,
+        ):
+            list(singlefile.stream_snapshot("http://example.com"))
 
-        with mock.patch("subprocess.Popen", return_value=mock_process):
-            singlefile.create_snapshot("http://example.com", self.temp_html_filepath)
+            self.assertEqual(mock_timer.call_args.args[0], 180)
+
+    def test_stream_snapshot_timeout(self):
+        mock_process = self.create_mock_process([])
 
-            mock_process.wait.assert_called_with(timeout=180)
+        with (
+            mock.patch("subprocess.Popen", return_value=mock_process),
+            mock.patch("threading.Timer", ImmediateTimer),
+            self.assertRaisesMessage(
+                singlefile.SingleFileError, "Timeout expired while creating snapshot"
+            ),
+        ):
+            list(singlefile.stream_snapshot("http://example.com"))
+
+        mock_process.terminate.assert_called()
+
+    def test_stream_snapshot_stops_process_when_aborted(self):
+        mock_process = self.create_mock_process(running=True)
+
+        with mock.patch("subprocess.Popen", return_value=mock_process):
+            stream = singlefile.stream_snapshot("http://example.com")
+            next(stream)
+            stream.close()
+
+        mock_process.terminate.assert_called_once()
+        mock_process.stdout.close.assert_called_once()
+
+    def test_strip_saved_date(self):
+        content = (
+            b"<html><!--\n Page saved with SingleFile \n url: http://example.com \n"
+            b" saved date: Fri Oct 16 2026 10:00:00 GMT+0000\n--><head>"
+        )
+
+        self.assertEqual(
+            singlefile.strip_saved_date(content),
+            b"<html><!--\n Page saved with SingleFile \n url: http://example.com \n"
+            b"--><head>",
+        )
@@ -1,3 +1,5 @@
+from unittest.mock import patch
+
 from django.contrib.auth.models import AnonymousUser, User
 from django.http import HttpResponse
 from django.template import RequestContext, Template
@@ -5,6 +7,7 @@ from django.test import RequestFactory, TestCase
 
 from bookmarks.middlewares import LinkdingMiddleware
 from bookmarks.models import BookmarkSearch, UserProfile
+from bookmarks.services.bookmarks import archive_bookmarks, tag_bookmarks
 from bookmarks.tests.helpers import BookmarkFactoryMixin, HtmlTestMixin
 from bookmarks.views import contexts
 
@@ -571,3 +574,123 @@ class TagCloudTemplateTest(TestCase, BookmarkFactoryMixin, HtmlTestMixin):
                 contents.endswith("</span>"),
                 f"unexpected characters before closing anchor tag: {contents!r}",
             )
+
+    def test_caches_unfiltered_tag_cloud(self):
+        tags = [
+            self.setup_tag(name="tag1"),
+            self.setup_tag(name="tag2"),
+        ]
+        self.setup_bookmark(tags=tags)
+        self.render_template()
+
+        with patch.object(
+            contexts.ActiveBookmarksContext, "get_tag_query_set"
+        ) as mock_get_tag_query_set:
+            rendered_template = self.render_template(url="/test?sort=title_asc")
+
+            mock_get_tag_query_set.assert_not_called()
+            self.assertTagGroups(rendered_template, [["tag1", "tag2"]])
+            # Tag links are still created for the current request
+            self.assertInHTML(
+                """
+                <a href="?sort=title_asc&q=%23tag1" class="mr-2" data-is-tag-item>
+                  <span class="highlight-char">t</span><span>ag1</span>
+                </a>
+            """,
+                rendered_template,
+            )
+
+    def test_does_not_cache_filtered_tag_cloud(self):
+        tag = self.setup_tag(name="tag1")
+        self.setup_bookmark(tags=[tag], title="term1")
+        self.render_template(url="/test?q=term1")
+
+        with patch.object(
+            contexts.ActiveBookmarksContext,
+            "get_tag_query_set",
+            wraps=contexts.ActiveBookmarksContext.get_tag_query_set,
+            autospec=True,
+        ) as mock_get_tag_query_set:
+            self.render_template(url="/test?q=term1")
+            self.render_template(url="/test?unread=yes")
+
+            self.assertEqual(mock_get_tag_query_set.call_count, 2)
+
+    def test_cached_tag_cloud_is_invalidated_by_bookmark_changes(self):
+        tag1 = self.setup_tag(name="tag1")
+        bookmark = self.setup_bookmark(tags=[tag1])
+        self.assertTagGroups(self.render_template(), [["tag1"]])
+
+        tag_bookmarks([bookmark.id], "tag2", self.get_or_create_test_user())
+        self.assertTagGroups(self.render_template(), [["tag1", "tag2"]])
+
+        archive_bookmarks([bookmark.id], self.get_or_create_test_user())
+        self.assertTagGroups(self.render_template(), [])
+        self.assertTagGroups(
+            self.render_template(context_type=contexts.ArchivedTagCloudContext),
+            [["tag1", "tag2"]],
+        )
+
+    def test_cached_tag_cloud_is_invalidated_by_tag_changes(self):
+        tag = self.setup_tag(name="tag1")
+        self.setup_bookmark(tags=[tag])
+        self.assertTagGroups(self.render_template(), [["tag1"]])
+
+        tag.name = "renamed"
+        tag.save()
+        self.assertTagGroups(self.render_template(), [["renamed"]])
+
+        tag.delete()
+        self.assertTagGroups(self.render_template(), [])
+
+    def test_cached_tag_cloud_respects_tag_grouping(self):
+        tags = [
+            self.setup_tag(name="Alpaca"),
+            self.setup_tag(name="Badger"),
+        ]
+        self.setup_bookmark(tags=tags)
+        self.assertTagGroups(self.render_template(), [["Alpaca"], ["Badger"]])
+
+        profile = self.get_or_create_test_user().profile
+        profile.tag_grouping = UserProfile.TAG_GROUPING_DISABLED
+        profile.save()
+
+        self.assertTagGroups(
+            self.render_template(), [["Alpaca", "Badger"]], highlight_first_char=False
+        )
+
+    def test_cached_shared_tag_cloud_is_invalidated_by_sharing_settings(self):
+        other_user = self.setup_user(enable_sharing=True)
+        tag = self.setup_tag(name="tag1", user=other_user)
+        self.setup_bookmark(tags=[tag], user=other_user, shared=True)
+        self.assertTagGroups(
+            self.render_template(context_type=contexts.SharedTagCloudContext),
+            [["tag1"]],
+        )
+
+        other_user.profile.enable_sharing = False
+        other_user.profile.save()
+
+        self.assertTagGroups(
+            self.render_template(context_type=contexts.SharedTagCloudContext), []
+        )
+
+    def test_tag_cloud_computed_before_invalidation_is_not_cached(self):
+        tag = self.setup_tag(name="tag1")
+        bookmark = self.setup_bookmark(tags=[tag])
+        get_tag_query_set = contexts.ActiveBookmarksContext.get_tag_query_set
+
+        def get_tag_query_set_and_invalidate(context, search):
+            tags = list(get_tag_query_set(context, search))
+            # Tags change after querying them, but before caching the result
+            tag_bookmarks([bookmark.id], "tag2", self.get_or_create_test_user())
+            return tags
+
+        with patch.object(
+            contexts.ActiveBookmarksContext,
+            "get_tag_query_set",
+            get_tag_query_set_and_invalidate,
+        ):
+            self.assertTagGroups(self.render_template(), [["tag1"]])
+
+        self.assertTagGroups(self.render_template(), [["tag1", "tag2"]])
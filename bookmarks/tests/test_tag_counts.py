@@ -0,0 +1,234 @@
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from bookmarks.models import Bookmark, BookmarkSearch, Tag
+from bookmarks.queries import (
+    query_archived_bookmark_tags,
+    query_bookmark_tags,
+    query_shared_bookmark_tags,
+)
+from bookmarks.services.bookmarks import (
+    archive_bookmark,
+    archive_bookmarks,
+    create_bookmark,
+    delete_bookmark,
+    delete_bookmarks,
+    share_bookmarks,
+    tag_bookmarks,
+    unarchive_bookmarks,
+    unshare_bookmarks,
+    untag_bookmarks,
+    update_bookmark,
+)
+from bookmarks.services.importer import ImportOptions, import_netscape_html
+from bookmarks.services.tags import rebuild_tag_counts
+from bookmarks.tests.helpers import (
+    BookmarkFactoryMixin,
+    BookmarkHtmlTag,
+    ImportTestMixin,
+)
+
+
+class TagCountsTestCase(TestCase, BookmarkFactoryMixin, ImportTestMixin):
+    def setUp(self) -> None:
+        self.get_or_create_test_user()
+
+        self.mock_tasks_patcher = patch("bookmarks.services.bookmarks.tasks")
+        self.mock_tasks_patcher.start()
+
+    def tearDown(self):
+        self.mock_tasks_patcher.stop()
+
+    def assertCounts(self, tag: Tag, active: int, archived: int, shared: int):
+        tag.refresh_from_db()
+        self.assertEqual(tag.active_count, active)
+        self.assertEqual(tag.archived_count, archived)
+        self.assertEqual(tag.shared_count, shared)
+
+    def test_create_and_update_bookmark(self):
+        bookmark = create_bookmark(
+            Bookmark(url="https://example.com", shared=True), "tag1,tag2", self.user
+        )
+        tag1 = Tag.objects.get(name="tag1")
+        tag2 = Tag.objects.get(name="tag2")
+        self.assertCounts(tag1, 1, 0, 1)
+        self.assertCounts(tag2, 1, 0, 1)
+
+        bookmark.shared = False
+        update_bookmark(bookmark, "tag2,tag3", self.user)
+        tag3 = Tag.objects.get(name="tag3")
+        self.assertCounts(tag1, 0, 0, 0)
+        self.assertCounts(tag2, 1, 0, 0)
+        self.assertCounts(tag3, 1, 0, 0)
+
+    def test_archive_and_unarchive(self):
+        tag = self.setup_tag()
+        bookmark1 = self.setup_bookmark(tags=[tag])
+        bookmark2 = self.setup_bookmark(tags=[tag])
+        self.assertCounts(tag, 2, 0, 0)
+
+        archive_bookmark(bookmark1)
+        self.assertCounts(tag, 1, 1, 0)
+
+        archive_bookmarks([bookmark2.id], self.user)
+        self.assertCounts(tag, 0, 2, 0)
+
+        unarchive_bookmarks([bookmark1.id, bookmark2.id], self.user)
+        self.assertCounts(tag, 2, 0, 0)
+
+    def test_share_and_unshare(self):
+        tag = self.setup_tag()
+        bookmark1 = self.setup_bookmark(tags=[tag])
+        bookmark2 = self.setup_bookmark(tags=[tag], is_archived=True)
+
+        share_bookmarks([bookmark1.id, bookmark2.id], self.user)
+        self.assertCounts(tag, 1, 1, 2)
+
+        unshare_bookmarks([bookmark2.id], self.user)
+        self.assertCounts(tag, 1, 1, 1)
+
+    def test_tag_and_untag_bookmarks(self):
+        bookmark1 = self.setup_bookmark()
+        bookmark2 = self.setup_bookmark(is_archived=True)
+
+        tag_bookmarks([bookmark1.id, bookmark2.id], "tag1,tag2", self.user)
+        tag1 = Tag.objects.get(name="tag1")
+        tag2 = Tag.objects.get(name="tag2")
+        self.assertCounts(tag1, 1, 1, 0)
+        self.assertCounts(tag2, 1, 1, 0)
+
+        untag_bookmarks([bookmark2.id], "tag1", self.user)
+        self.assertCounts(tag1, 1, 0, 0)
+        self.assertCounts(tag2, 1, 1, 0)
+
+    def test_delete_bookmarks(self):
+        tag = self.setup_tag()
+        bookmark1 = self.setup_bookmark(tags=[tag])
+        bookmark2 = self.setup_bookmark(tags=[tag], shared=True)
+        bookmark3 = self.setup_bookmark(tags=[tag], is_archived=True)
+
+        delete_bookmark(bookmark1)
+        self.assertCounts(tag, 1, 1, 1)
+
+        delete_bookmarks([bookmark2.id, bookmark3.id], self.user)
+        self.assertCounts(tag, 0, 0, 0)
+
+    def test_import(self):
+        html_tags = [
+            BookmarkHtmlTag(href="https://example.com", tags="tag1,tag2"),
+            BookmarkHtmlTag(href="https://foo.com", tags="tag1", private=False),
+        ]
+        import_html = self.render_html(tags=html_tags)
+        import_netscape_html(
+            import_html, self.user, ImportOptions(map_private_flag=True)
+        )
+
+        self.assertCounts(Tag.objects.get(name="tag1"), 2, 0, 1)
+        self.assertCounts(Tag.objects.get(name="tag2"), 1, 0, 0)
+
+    def test_rebuild_tag_counts(self):
+        tag1 = self.setup_tag()
+        tag2 = self.setup_tag()
+        self.setup_bookmark(tags=[tag1, tag2])
+        self.setup_bookmark(tags=[tag1], is_archived=True, shared=True)
+        Tag.objects.update(active_count=0, archived_count=0, shared_count=0)
+
+        rebuild_tag_counts()
+
+        self.assertCounts(tag1, 1, 1, 1)
+        self.assertCounts(tag2, 1, 0, 0)
+
+    def test_rebuild_tag_counts_command(self):
+        other_user = self.setup_user()
+        tag = self.setup_tag()
+        other_tag = self.setup_tag(user=other_user)
+        self.setup_bookmark(tags=[tag])
+        self.setup_bookmark(tags=[other_tag], user=other_user)
+        Tag.objects.update(active_count=0)
+
+        call_command("rebuild_tag_counts", user=self.user.username)
+        self.assertCounts(tag, 1, 0, 0)
+        self.assertCounts(other_tag, 0, 0, 0)
+
+        call_command("rebuild_tag_counts")
+        self.assertCounts(other_tag, 1, 0, 0)
+
+    def test_unfiltered_tag_queries_use_counts(self):
+        profile = self.user.profile
+        profile.enable_sharing = True
+        profile.save()
+        active_tag = self.setup_tag()
+        archived_tag = self.setup_tag()
+        shared_tag = self.setup_tag()
+        self.setup_tag()
+        self.setup_bookmark(tags=[active_tag, shared_tag])
+        self.setup_bookmark(tags=[archived_tag], is_archived=True)
+        self.setup_bookmark(tags=[shared_tag], shared=True)
+
+        search = BookmarkSearch()
+        with self.assertNumQueries(1):
+            tags = list(query_bookmark_tags(self.user, profile, search))
+        self.assertCountEqual(tags, [active_tag, shared_tag])
+        self.assertCountEqual(
+            query_archived_bookmark_tags(self.user, profile, search), [archived_tag]
+        )
+        self.assertCountEqual(
+            query_shared_bookmark_tags(self.user, profile, search, False),
+            [shared_tag],
+        )
+
+        query = str(query_bookmark_tags(self.user, profile, search).query)
+        self.assertNotIn("bookmarks_bookmark_tags", query)
+
+    def test_saving_tag_does_not_overwrite_counts(self):
+        tag = self.setup_tag(name="tag1")
+        stale_tag = Tag.objects.get(id=tag.id)
+        self.setup_bookmark(tags=[tag])
+
+        stale_tag.name = "renamed"
+        stale_tag.save()
+
+        self.assertCounts(tag, 1, 0, 0)
+        self.assertEqual(tag.name, "renamed")
+
+    def test_admin_change_form(self):
+        self.client.force_login(self.setup_superuser())
+        removed_tag = self.setup_tag(name="removed")
+        kept_tag = self.setup_tag(name="kept")
+        added_tag = self.setup_tag(name="added")
+        bookmark = self.setup_bookmark(tags=[removed_tag, kept_tag])
+        url = reverse("admin:bookmarks_bookmark_change", args=[bookmark.id])
+
+        response = self.client.post(
+            url,
+            {
+                "url": bookmark.url,
+                "is_archived": "on",
+                "shared": "on",
+                "date_added_0": bookmark.date_added.strftime("%Y-%m-%d"),
+                "date_added_1": bookmark.date_added.strftime("%H:%M:%S"),
+                "date_modified_0": bookmark.date_modified.strftime("%Y-%m-%d"),
+                "date_modified_1": bookmark.date_modified.strftime("%H:%M:%S"),
+                "owner": self.user.id,
+                "tags": [kept_tag.id, added_tag.id],
+            },
+        )
+
+        self.assertEqual(response.status_code, 302)
+        self.assertCounts(removed_tag, 0, 0, 0)
+        self.assertCounts(kept_tag, 0, 1, 1)
+        self.assertCounts(added_tag, 0, 1, 1)
+
+    def test_admin_delete_form(self):
+        self.client.force_login(self.setup_superuser())
+        tag = self.setup_tag()
+        bookmark = self.setup_bookmark(tags=[tag])
+        url = reverse("admin:bookmarks_bookmark_delete", args=[bookmark.id])
+
+        response = self.client.post(url, {"post": "yes"})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertCounts(tag, 0, 0, 0)
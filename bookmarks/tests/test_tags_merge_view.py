@@ -57,6 +57,22 @@ class TagsMergeViewTestCase(TestCase, BookmarkFactoryMixin, HtmlTestMixin):
         self.assertCountEqual(list(bookmark2.tags.all()), [target_tag])
         self.assertCountEqual(list(bookmark3.tags.all()), [target_tag])
 
+    def test_merge_tags_updates_counts(self):
+        target_tag = self.setup_tag(name="target_tag")
+        merge_tag = self.setup_tag(name="merge_tag")
+        self.setup_bookmark(tags=[merge_tag])
+        self.setup_bookmark(tags=[merge_tag, target_tag])
+        self.setup_bookmark(tags=[target_tag], is_archived=True)
+
+        self.client.post(
+            reverse("linkding:tags.merge"),
+            {"target_tag": "target_tag", "merge_tags": "merge_tag"},
+        )
+
+        target_tag.refresh_from_db()
+        self.assertEqual(target_tag.active_count, 2)
+        self.assertEqual(target_tag.archived_count, 1)
+
     def test_merge_tags_complex(self):
         target_tag = self.setup_tag(name="target_tag")
         merge_tag1 = self.setup_tag(name="merge_tag1")
@@ -1,9 +1,10 @@
 from unittest.mock import patch
 
-from django.test import TestCase
+from django.test import RequestFactory, TestCase
 from django.utils import timezone
 
 from bookmarks.utils import (
+    accepts_gzip,
     humanize_absolute_date,
     humanize_relative_date,
     normalize_url,
@@ -344,3 +345,22 @@ class UtilsTestCase(TestCase):
             with self.subTest(url=original):
                 result = normalize_url(original)
                 self.assertEqual(expected, result)
+
+    def test_accepts_gzip(self):
+        def accepts(accept_encoding):
+            headers = {}
+            if accept_encoding is not None:
+                headers["Accept-Encoding"] = accept_encoding
+            return accepts_gzip(RequestFactory().get("/", headers=headers))
+
+        self.assertTrue(accepts("gzip"))
+        self.assertTrue(accepts("gzip, deflate, br"))
+        self.assertTrue(accepts("br;q=1.0, GZIP;q=0.5"))
+        self.assertTrue(accepts("x-gzip"))
+        self.assertFalse(accepts(None))
+        self.assertFalse(accepts(""))
+        self.assertFalse(accepts("identity"))
+        self.assertFalse(accepts("deflate, br"))
+        self.assertFalse(accepts("gzip;q=0"))
+        self.assertFalse(accepts("gzip;q=0.0, br"))
+        self.assertFalse(accepts("gzip;q=invalid"))
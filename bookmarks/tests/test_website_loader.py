@@ -1,12 +1,24 @@
+import codecs
+from io import StringIO
 from unittest import mock
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 
-from bookmarks.services import website_loader
+from bookmarks.services import metadata_cache, website_loader
+from bookmarks.services.fetch_scheduler import FetchRateLimited, FetchScheduler
 
 
 class MockStreamingResponse:
-    def __init__(self, num_chunks, chunk_size, insert_head_after_chunk=None):
+    def __init__(
+        self,
+        num_chunks,
+        chunk_size,
+        insert_head_after_chunk=None,
+        content_type="text/html; charset=utf-8",
+    ):
+        self.headers = {"Content-Type": content_type} if content_type else {}
         self.chunks = []
         for index in range(num_chunks):
             chunk = "".zfill(chunk_size)
@@ -28,7 +40,8 @@ class MockStreamingResponse:
 class WebsiteLoaderTestCase(TestCase):
     def setUp(self):
         # clear cached metadata before test run
-        website_loader._load_website_metadata_cached.cache_clear()
+        cache.clear()
+        metadata_cache.reset_stats()
 
     def render_html_document(
         self, title, description="", og_description="", og_image=""
@@ -58,67 +71,221 @@ class WebsiteLoaderTestCase(TestCase):
         </html>
         """
 
+    def render_html_page(self, *args, **kwargs):
+        return website_loader.PageProbe(
+            content_type="text/html", text=self.render_html_document(*args, **kwargs)
+        )
+
     def test_load_page_returns_content(self):
-        with mock.patch("requests.get") as mock_get:
+        with mock.patch("requests.Session.get") as mock_get:
             mock_get.return_value = MockStreamingResponse(
                 num_chunks=10, chunk_size=1024
             )
-            content = website_loader.load_page("https://example.com")
+            page = website_loader.load_page("https://example.com")
 
             expected_content_size = 10 * 1024
-            self.assertEqual(expected_content_size, len(content))
+            self.assertEqual(expected_content_size, len(page.text))
 
     def test_load_page_limits_large_documents(self):
-        with mock.patch("requests.get") as mock_get:
+        with mock.patch("requests.Session.get") as mock_get:
             mock_get.return_value = MockStreamingResponse(
                 num_chunks=10, chunk_size=1024 * 1000
             )
-            content = website_loader.load_page("https://example.com")
+            page = website_loader.load_page("https://example.com")
 
             # Should have read six chunks, after which content exceeds the max of 5MB
             expected_content_size = 6 * 1024 * 1000
-            self.assertEqual(expected_content_size, len(content))
+            self.assertEqual(expected_content_size, len(page.text))
 
     def test_load_page_stops_reading_at_end_of_head(self):
-        with mock.patch("requests.get") as mock_get:
+        with mock.patch("requests.Session.get") as mock_get:
             mock_get.return_value = MockStreamingResponse(
                 num_chunks=10, chunk_size=1024 * 1000, insert_head_after_chunk=0
             )
-            content = website_loader.load_page("https://example.com")
+            page = website_loader.load_page("https://example.com")
 
             # Should have read first chunk, and second chunk containing closing head tag
             expected_content_size = 1 * 1024 * 1000 + len("</head>")
-            self.assertEqual(expected_content_size, len(content))
+            self.assertEqual(expected_content_size, len(page.text))
 
     def test_load_page_removes_bytes_after_end_of_head(self):
-        with mock.patch("requests.get") as mock_get:
+        with mock.patch("requests.Session.get") as mock_get:
             mock_response = MockStreamingResponse(num_chunks=1, chunk_size=0)
             mock_response.chunks[0] = "<head>人</head>".encode()
             # add a single byte that can't be decoded to utf-8
             mock_response.chunks[0] += 0xFF.to_bytes(1, "big")
             mock_get.return_value = mock_response
-            content = website_loader.load_page("https://example.com")
+            page = website_loader.load_page("https://example.com")
 
             # verify that byte after head was removed, content parsed as utf-8
-            self.assertEqual(content, "<head>人</head>")
+            self.assertEqual(page.text, "<head>人</head>")
+
+    def test_load_page_returns_content_type(self):
+        with mock.patch("requests.Session.get") as mock_get:
+            mock_get.return_value = MockStreamingResponse(
+                num_chunks=1, chunk_size=1024, content_type="Text/HTML; charset=utf-8"
+            )
+            page = website_loader.load_page("https://example.com")
+
+            self.assertEqual(page.content_type, "text/html")
+
+    def test_load_page_reads_documents_without_content_type(self):
+        with mock.patch("requests.Session.get") as mock_get:
+            mock_get.return_value = MockStreamingResponse(
+                num_chunks=1, chunk_size=1024, content_type=None
+            )
+            page = website_loader.load_page("https://example.com")
+
+            self.assertIsNone(page.content_type)
+            self.assertEqual(1024, len(page.text))
+
+    def test_load_page_does_not_read_non_text_documents(self):
+        with mock.patch("requests.Session.get") as mock_get:
+            mock_response = MockStreamingResponse(
+                num_chunks=1, chunk_size=1024, content_type="application/pdf"
+            )
+            mock_response.iter_content = mock.Mock()
+            mock_get.return_value = mock_response
+            page = website_loader.load_page("https://example.com/doc.pdf")
+
+            self.assertEqual(page.content_type, "application/pdf")
+            self.assertIsNone(page.text)
+            mock_response.iter_content.assert_not_called()
+
+    def test_decode_page_uses_bom(self):
+        content = codecs.BOM_UTF8 + "<title>Ünïcödé</title>".encode()
+        with mock.patch.object(website_loader, "from_bytes") as mock_from_bytes:
+            self.assertEqual(
+                website_loader.decode_page(content), "<title>Ünïcödé</title>"
+            )
+            mock_from_bytes.assert_not_called()
+
+        content = codecs.BOM_UTF16_LE + "<title>Ünïcödé</title>".encode("utf-16-le")
+        self.assertEqual(website_loader.decode_page(content), "<title>Ünïcödé</title>")
+
+    def test_decode_page_uses_declared_charset(self):
+        documents = [
+            '<meta charset="windows-1252"><title>Café</title>',
+            "<meta charset=windows-1252><title>Café</title>",
+            '<meta http-equiv="Content-Type" content="text/html; charset=windows-1252">'
+            "<title>Café</title>",
+        ]
+        for document in documents:
+            with mock.patch.object(website_loader, "from_bytes") as mock_from_bytes:
+                self.assertEqual(
+                    website_loader.decode_page(document.encode("windows-1252")),
+                    document,
+                )
+                mock_from_bytes.assert_not_called()
+
+    def test_decode_page_decodes_latin1_labels_as_windows_1252(self):
+        for label in ["iso-8859-1", "latin1", "ascii", "us-ascii"]:
+            document = f'<meta charset="{label}"><title>\u201cQuoted\u201d</title>'
+            with mock.patch.object(website_loader, "from_bytes") as mock_from_bytes:
+                self.assertEqual(
+                    website_loader.decode_page(document.encode("cp1252")), document
+                )
+                mock_from_bytes.assert_not_called()
+
+    def test_decode_page_decodes_utf16_labels_as_utf8(self):
+        for label in ["utf-16", "utf-16le", "utf-16be"]:
+            document = f'<meta charset="{label}"><title>Ünïcödé</title>'
+            with mock.patch.object(website_loader, "from_bytes") as mock_from_bytes:
+                self.assertEqual(
+                    website_loader.decode_page(document.encode()), document
+                )
+                mock_from_bytes.assert_not_called()
+
+    def test_decode_page_falls_back_to_detection_for_encoding_errors(self):
+        # utf-16 can't decode content without a BOM, raises UnicodeError
+        content = "<title>Ünïcödé</title>".encode()
+        with mock.patch.object(
+            website_loader, "_get_declared_encoding", return_value=("utf-16", "test")
+        ):
+            self.assertEqual(
+                website_loader.decode_page(content), "<title>Ünïcödé</title>"
+            )
+
+    def test_decode_page_uses_declared_encoding_for_truncated_page(self):
+        # content is cut off in the middle of the multibyte character "é"
+        truncated_char = "é".encode()[:1]
+        pages = [
+            '<meta charset="utf-8"><title>Ünïcödé</title>'.encode() + truncated_char,
+            codecs.BOM_UTF8 + "<title>Ünïcödé</title>".encode() + truncated_char,
+        ]
+        for content in pages:
+            with mock.patch.object(website_loader, "from_bytes") as mock_from_bytes:
+                text = website_loader.decode_page(content)
+
+                self.assertTrue(text.endswith("<title>Ünïcödé</title>"))
+                mock_from_bytes.assert_not_called()
+
+    def test_decode_page_falls_back_to_detection(self):
+        # no declaration
+        content = "<title>Ünïcödé</title>".encode()
+        self.assertEqual(website_loader.decode_page(content), "<title>Ünïcödé</title>")
+
+        # unknown encoding
+        content = '<meta charset="unknown"><title>Ünïcödé</title>'.encode()
+        self.assertEqual(
+            website_loader.decode_page(content),
+            '<meta charset="unknown"><title>Ünïcödé</title>',
+        )
+
+        # content does not match declared encoding
+        content = '<meta charset="utf-8"><title>Café</title>'.encode("windows-1252")
+        with mock.patch.object(
+            website_loader, "from_bytes", wraps=website_loader.from_bytes
+        ) as mock_from_bytes:
+            website_loader.decode_page(content)
+            mock_from_bytes.assert_called_once_with(content)
+
+        # declaration after the first few KB is ignored
+        content = b" " * 5000 + '<meta charset="utf-8"><title>Ünïcödé</title>'.encode()
+        with mock.patch.object(
+            website_loader, "from_bytes", wraps=website_loader.from_bytes
+        ) as mock_from_bytes:
+            website_loader.decode_page(content)
+            mock_from_bytes.assert_called_once_with(content)
 
     def test_load_website_metadata(self):
         with mock.patch(
             "bookmarks.services.website_loader.load_page"
         ) as mock_load_page:
-            mock_load_page.return_value = self.render_html_document(
+            mock_load_page.return_value = self.render_html_page(
                 "test title", "test description"
             )
             metadata = website_loader.load_website_metadata("https://example.com")
             self.assertEqual("test title", metadata.title)
             self.assertEqual("test description", metadata.description)
             self.assertIsNone(metadata.preview_image)
+            self.assertEqual("text/html", metadata.content_type)
+
+    def test_load_website_metadata_for_non_text_documents(self):
+        with mock.patch.object(
+            website_loader,
+            "load_page",
+            return_value=website_loader.PageProbe("application/pdf", None),
+        ):
+            metadata = website_loader.load_website_metadata(
+                "https://example.com/doc.pdf"
+            )
+            self.assertIsNone(metadata.title)
+            self.assertIsNone(metadata.description)
+            self.assertIsNone(metadata.preview_image)
+            self.assertEqual("application/pdf", metadata.content_type)
+
+            # content type is cached along with the other metadata
+            metadata = website_loader.load_website_metadata(
+                "https://example.com/doc.pdf"
+            )
+            self.assertEqual("application/pdf", metadata.content_type)
 
     def test_load_website_metadata_trims_title_and_description(self):
         with mock.patch(
             "bookmarks.services.website_loader.load_page"
         ) as mock_load_page:
-            mock_load_page.return_value = self.render_html_document(
+            mock_load_page.return_value = self.render_html_page(
                 "  test title  ", "  test description  "
             )
             metadata = website_loader.load_website_metadata("https://example.com")
@@ -129,7 +296,7 @@ class WebsiteLoaderTestCase(TestCase):
         with mock.patch(
             "bookmarks.services.website_loader.load_page"
         ) as mock_load_page:
-            mock_load_page.return_value = self.render_html_document(
+            mock_load_page.return_value = self.render_html_page(
                 "test title", "", og_description="test og description"
             )
             metadata = website_loader.load_website_metadata("https://example.com")
@@ -140,7 +307,7 @@ class WebsiteLoaderTestCase(TestCase):
         with mock.patch(
             "bookmarks.services.website_loader.load_page"
         ) as mock_load_page:
-            mock_load_page.return_value = self.render_html_document(
+            mock_load_page.return_value = self.render_html_page(
                 "test title", og_image="http://example.com/image.jpg"
             )
             metadata = website_loader.load_website_metadata("https://example.com")
@@ -152,7 +319,7 @@ class WebsiteLoaderTestCase(TestCase):
         with mock.patch(
             "bookmarks.services.website_loader.load_page"
         ) as mock_load_page:
-            mock_load_page.return_value = self.render_html_document(
+            mock_load_page.return_value = self.render_html_page(
                 "test title", og_image="../image.jpg"
             )
             metadata = website_loader.load_website_metadata(
@@ -166,7 +333,7 @@ class WebsiteLoaderTestCase(TestCase):
         with mock.patch(
             "bookmarks.services.website_loader.load_page"
         ) as mock_load_page:
-            mock_load_page.return_value = self.render_html_document(
+            mock_load_page.return_value = self.render_html_page(
                 "test title", og_image="/image.jpg"
             )
             metadata = website_loader.load_website_metadata(
@@ -178,7 +345,7 @@ class WebsiteLoaderTestCase(TestCase):
         with mock.patch(
             "bookmarks.services.website_loader.load_page"
         ) as mock_load_page:
-            mock_load_page.return_value = self.render_html_document(
+            mock_load_page.return_value = self.render_html_page(
                 "test title", "test description", og_description="test og description"
             )
             metadata = website_loader.load_website_metadata("https://example.com")
@@ -189,7 +356,9 @@ class WebsiteLoaderTestCase(TestCase):
         expected_html = '<html><head><title>Test Title</title><meta name="description" content="Test Description"><meta property="og:image" content="/images/test.jpg"></head></html>'
 
         with mock.patch.object(
-            website_loader, "load_page", return_value=expected_html
+            website_loader,
+            "load_page",
+            return_value=website_loader.PageProbe("text/html", expected_html),
         ) as mock_load_page:
             website_loader.load_website_metadata("https://example.com")
             mock_load_page.assert_called_once()
@@ -202,10 +371,201 @@ class WebsiteLoaderTestCase(TestCase):
             )
             self.assertEqual(mock_load_page.call_count, 2)
 
+    def test_website_metadata_cache_uses_normalized_url(self):
+        page = self.render_html_page("test title")
+
+        with mock.patch.object(
+            website_loader, "load_page", return_value=page
+        ) as mock_load_page:
+            website_loader.load_website_metadata("https://example.com/?b=2&a=1")
+            metadata = website_loader.load_website_metadata(
+                "https://EXAMPLE.com/?a=1&b=2"
+            )
+
+            mock_load_page.assert_called_once()
+            self.assertEqual("test title", metadata.title)
+            self.assertEqual("https://EXAMPLE.com/?a=1&b=2", metadata.url)
+
+    def test_website_metadata_cache_stores_failures(self):
+        with mock.patch.object(
+            website_loader, "load_page", side_effect=Exception("timeout")
+        ) as mock_load_page:
+            metadata = website_loader.load_website_metadata("https://example.com")
+            self.assertIsNone(metadata.title)
+            self.assertIsNone(metadata.description)
+            self.assertIsNone(metadata.preview_image)
+
+            metadata = website_loader.load_website_metadata("https://example.com")
+            mock_load_page.assert_called_once()
+            self.assertEqual("https://example.com", metadata.url)
+            self.assertIsNone(metadata.title)
+
+        page = self.render_html_page("test title")
+        with mock.patch.object(website_loader, "load_page", return_value=page):
+            metadata = website_loader.load_website_metadata(
+                "https://example.com", ignore_cache=True
+            )
+            self.assertEqual("test title", metadata.title)
+
+            metadata = website_loader.load_website_metadata("https://example.com")
+            self.assertEqual("test title", metadata.title)
+
+    def test_website_metadata_does_not_cache_rate_limited_requests(self):
+        with (
+            mock.patch.object(
+                website_loader,
+                "load_page",
+                side_effect=FetchRateLimited("example.com", 30),
+            ),
+            self.assertRaises(FetchRateLimited),
+        ):
+            website_loader.load_website_metadata("https://example.com")
+
+        self.assertIsNone(metadata_cache.get("https://example.com"))
+
+    def test_load_website_metadata_batch(self):
+        def load_page(url):
+            if url == "https://limited.com":
+                raise FetchRateLimited("limited.com", 30)
+            return self.render_html_page(f"title of {url}")
+
+        with mock.patch.object(
+            website_loader, "load_page", side_effect=load_page
+        ) as mock_load_page:
+            results = website_loader.load_website_metadata_batch(
+                [
+                    "https://example.com",
+                    "https://other.com",
+                    "https://example.com",
+                    "https://limited.com",
+                ]
+            )
+
+            self.assertEqual(mock_load_page.call_count, 3)
+        self.assertEqual(
+            results["https://example.com"].title, "title of https://example.com"
+        )
+        self.assertEqual(
+            results["https://other.com"].title, "title of https://other.com"
+        )
+        self.assertIsInstance(results["https://limited.com"], FetchRateLimited)
+
+    def test_load_website_metadata_batch_applies_fetch_limits_to_workers(self):
+        scheduler = FetchScheduler()
+
+        def load_page(url):
+            scheduler.acquire(url)
+            return self.render_html_page("title")
+
+        with (
+            override_settings(LD_FETCH_HOST_RATE=0.1, LD_FETCH_HOST_BURST=1),
+            mock.patch.object(website_loader, "load_page", side_effect=load_page),
+            scheduler.scope(),
+        ):
+            results = website_loader.load_website_metadata_batch(
+                ["https://example.com/1", "https://example.com/2"],
+                ignore_cache=True,
+            )
+
+        rate_limited = [
+            result
+            for result in results.values()
+            if isinstance(result, FetchRateLimited)
+        ]
+        self.assertEqual(len(rate_limited), 1)
+
+    def test_website_metadata_cache_timeouts(self):
+        page = self.render_html_page("test title")
+
+        with (
+            override_settings(
+                LD_METADATA_CACHE_TTL=123, LD_METADATA_CACHE_FAILURE_TTL=45
+            ),
+            mock.patch.object(metadata_cache.cache, "set") as mock_set,
+        ):
+            with mock.patch.object(website_loader, "load_page", return_value=page):
+                website_loader.load_website_metadata("https://example.com")
+            self.assertEqual(mock_set.call_args.args[2], 123)
+
+            with mock.patch.object(
+                website_loader, "load_page", side_effect=Exception("timeout")
+            ):
+                website_loader.load_website_metadata("https://example.com/other")
+            self.assertEqual(
+                mock_set.call_args.args[1:], (metadata_cache.FAILURE_MARKER, 45)
+            )
+
+    def test_website_metadata_cache_stats(self):
+        page = self.render_html_page("test title")
+
+        with mock.patch.object(website_loader, "load_page", return_value=page):
+            website_loader.load_website_metadata("https://example.com")
+            website_loader.load_website_metadata("https://example.com")
+            website_loader.load_website_metadata("https://example.com")
+        with mock.patch.object(
+            website_loader, "load_page", side_effect=Exception("timeout")
+        ):
+            website_loader.load_website_metadata("https://example.com/other")
+            website_loader.load_website_metadata("https://example.com/other")
+
+        self.assertEqual(
+            metadata_cache.get_stats(),
+            {
+                metadata_cache.STAT_HIT: 2,
+                metadata_cache.STAT_FAILURE_HIT: 1,
+                metadata_cache.STAT_MISS: 2,
+            },
+        )
+
+        out = StringIO()
+        call_command("metadata_cache_stats", reset=True, stdout=out)
+        self.assertIn("hit rate: 60.0%", out.getvalue())
+        self.assertEqual(
+            metadata_cache.get_stats(),
+            {stat: 0 for stat in metadata_cache.STATS},
+        )
+
+    def test_website_metadata_cache_stats_are_flushed_in_batches(self):
+        metadata_cache.set(
+            "https://example.com",
+            website_loader.WebsiteMetadata(
+                url="https://example.com",
+                title="test title",
+                description=None,
+                preview_image=None,
+            ),
+        )
+
+        with (
+            mock.patch.object(metadata_cache, "STATS_FLUSH_INTERVAL", 3),
+            mock.patch.object(
+                metadata_cache.cache, "incr", wraps=metadata_cache.cache.incr
+            ) as mock_incr,
+        ):
+            metadata_cache.get("https://example.com")
+            metadata_cache.get("https://example.com")
+            mock_incr.assert_not_called()
+
+            metadata_cache.get("https://example.com/other")
+            self.assertEqual(mock_incr.call_count, 2)
+
+        self.assertEqual(
+            metadata_cache.cache.get_many(
+                [
+                    metadata_cache._make_stat_key(metadata_cache.STAT_HIT),
+                    metadata_cache._make_stat_key(metadata_cache.STAT_MISS),
+                ]
+            ),
+            {
+                metadata_cache._make_stat_key(metadata_cache.STAT_HIT): 2,
+                metadata_cache._make_stat_key(metadata_cache.STAT_MISS): 1,
+            },
+        )
+
 
 class ContentTypeDetectionTestCase(TestCase):
     def test_detect_content_type_returns_content_type_from_head_request(self):
-        with mock.patch("requests.head") as mock_head:
+        with mock.patch("requests.Session.head") as mock_head:
             mock_response = mock.Mock()
             mock_response.status_code = 200
             mock_response.headers = {"Content-Type": "application/pdf"}
@@ -217,7 +577,7 @@ class ContentTypeDetectionTestCase(TestCase):
             mock_head.assert_called_once()
 
     def test_detect_content_type_strips_charset(self):
-        with mock.patch("requests.head") as mock_head:
+        with mock.patch("requests.Session.head") as mock_head:
             mock_response = mock.Mock()
             mock_response.status_code = 200
             mock_response.headers = {"Content-Type": "text/html; charset=utf-8"}
@@ -228,7 +588,7 @@ class ContentTypeDetectionTestCase(TestCase):
             self.assertEqual(result, "text/html")
 
     def test_detect_content_type_returns_lowercase(self):
-        with mock.patch("requests.head") as mock_head:
+        with mock.patch("requests.Session.head") as mock_head:
             mock_response = mock.Mock()
             mock_response.status_code = 200
             mock_response.headers = {"Content-Type": "Application/PDF"}
@@ -240,8 +600,8 @@ class ContentTypeDetectionTestCase(TestCase):
 
     def test_detect_content_type_falls_back_to_get_when_head_fails(self):
         with (
-            mock.patch("requests.head") as mock_head,
-            mock.patch("requests.get") as mock_get,
+            mock.patch("requests.Session.head") as mock_head,
+            mock.patch("requests.Session.get") as mock_get,
         ):
             import requests
 
@@ -262,8 +622,8 @@ class ContentTypeDetectionTestCase(TestCase):
 
     def test_detect_content_type_returns_none_when_both_head_and_get_fail(self):
         with (
-            mock.patch("requests.head") as mock_head,
-            mock.patch("requests.get") as mock_get,
+            mock.patch("requests.Session.head") as mock_head,
+            mock.patch("requests.Session.get") as mock_get,
         ):
             import requests
 
@@ -276,8 +636,8 @@ class ContentTypeDetectionTestCase(TestCase):
 
     def test_detect_content_type_returns_none_for_non_200_status(self):
         with (
-            mock.patch("requests.head") as mock_head,
-            mock.patch("requests.get") as mock_get,
+            mock.patch("requests.Session.head") as mock_head,
+            mock.patch("requests.Session.get") as mock_get,
         ):
             mock_head_response = mock.Mock()
             mock_head_response.status_code = 404
@@ -211,3 +211,17 @@ def normalize_url(url: str) -> str:
 
     except (ValueError, AttributeError):
         return url
+
+
+def accepts_gzip(request) -> bool:
+    """Checks if the Accept-Encoding header of the request allows gzip."""
+    for coding in request.headers.get("Accept-Encoding", "").split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() not in ("gzip", "x-gzip"):
+            continue
+        quality = params.strip().lower().removeprefix("q=")
+        try:
+            return not quality or float(quality) > 0
+        except ValueError:
+            return False
+    return False
@@ -1,37 +1,166 @@
-import gzip
 import os
+import re
 
 from django.conf import settings
 from django.http import (
     Http404,
     HttpResponse,
+    StreamingHttpResponse,
 )
 from django.shortcuts import render
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
 
+from bookmarks.services import asset_codecs
+from bookmarks.utils import accepts_gzip
 from bookmarks.views import access
 
+STREAM_CHUNK_SIZE = 64 * 1024
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
 
-def _get_asset_content(asset):
+
+def _get_asset_filepath(asset):
     filepath = os.path.join(settings.LD_ASSET_FOLDER, asset.file)
 
     if not os.path.exists(filepath):
         raise Http404("Asset file does not exist")
 
+    return filepath
+
+
+def _get_asset_content(asset):
+    filepath = _get_asset_filepath(asset)
+
+    with asset_codecs.open_asset_file(asset, filepath) as f:
+        content = f.read()
+
+    return content
+
+
+def _read_chunks(filepath: str, codec=None, start: int = 0, length=None):
+    with codec.open_reader(filepath) if codec else open(filepath, "rb") as f:
+        if start:
+            f.seek(start)
+        remaining = length
+        while remaining is None or remaining > 0:
+            size = (
+                STREAM_CHUNK_SIZE
+                if remaining is None
+                else min(STREAM_CHUNK_SIZE, remaining)
+            )
+            chunk = f.read(size)
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+
+def _parse_range(range_header: str, size: int):
+    """
+    Parses a range header with a single byte range. Returns a tuple with the
+    first and last byte position, None if the header is not supported, or
+    raises ValueError if the range can not be satisfied.
+    """
+    match = RANGE_PATTERN.match(range_header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+
+    if match.group(1) == "":
+        # Suffix range, e.g. the last 500 bytes
+        suffix_length = int(match.group(2))
+        if suffix_length == 0 or size == 0:
+            raise ValueError()
+        return max(0, size - suffix_length), size - 1
+
+    start = int(match.group(1))
+    end = int(match.group(2)) if match.group(2) else size - 1
+    if match.group(2) and start > end:
+        return None
+    if start >= size:
+        raise ValueError()
+    return start, min(end, size - 1)
+
+
+def _stream_asset(request, asset):
+    """
+    Streams the asset file in chunks, instead of reading it into memory.
+    Supports conditional requests, and range requests for files that are sent
+    as stored, so that browsers can revalidate cached assets and resume
+    downloads. Gzipped files are sent as stored to clients that accept gzip,
+    and only decompressed for other clients.
+    """
+    filepath = _get_asset_filepath(asset)
+    stat = os.stat(filepath)
+    gzip_passthrough = asset.gzip and accepts_gzip(request)
+    # Use separate tags for the compressed and decompressed representations
+    encoding_suffix = "-gzip" if gzip_passthrough else ""
+    etag = f'"{asset.id}-{stat.st_mtime_ns:x}-{stat.st_size:x}{encoding_suffix}"'
+    last_modified = int(stat.st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _create_asset_response(
+            request, asset, filepath, stat.st_size, etag, gzip_passthrough
+        )
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
     if asset.gzip:
-        with gzip.open(filepath, "rb") as f:
-            content = f.read()
+        patch_vary_headers(response, ["Accept-Encoding"])
+    return response
+
+
+def _create_asset_response(request, asset, filepath, size, etag, gzip_passthrough):
+    content_type = asset.content_type
+    codec = asset_codecs.get_asset_codec(asset)
+    if codec and not gzip_passthrough:
+        # Compressed files can not be read from an arbitrary position without
+        # decompressing everything before it, so don't support ranges
+        response = StreamingHttpResponse(
+            _read_chunks(filepath, codec), content_type=content_type
+        )
+        response["Accept-Ranges"] = "none"
+        return response
+
+    byte_range = None
+    range_header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    # Only resume from a range if the file has not changed since then
+    if range_header and (not if_range or if_range == etag):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+    if byte_range:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            _read_chunks(filepath, start=start, length=length),
+            status=206,
+            content_type=content_type,
+        )
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
     else:
-        with open(filepath, "rb") as f:
-            content = f.read()
+        length = size
+        response = StreamingHttpResponse(
+            _read_chunks(filepath), content_type=content_type
+        )
 
-    return content
+    response["Content-Length"] = str(length)
+    response["Accept-Ranges"] = "bytes"
+    if gzip_passthrough:
+        response["Content-Encoding"] = "gzip"
+    return response
 
 
 def view(request, asset_id: int):
     asset = access.asset_read(request, asset_id)
-    content = _get_asset_content(asset)
 
-    response = HttpResponse(content, content_type=asset.content_type)
+    response = _stream_asset(request, asset)
     response["Content-Disposition"] = f'inline; filename="{asset.download_name}"'
     if asset.content_type and asset.content_type.startswith("video/"):
         response["Content-Security-Policy"] = "default-src 'none'; media-src 'self';"
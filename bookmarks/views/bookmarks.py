@@ -23,6 +23,7 @@ from bookmarks.services.bookmarks import (
     archive_bookmark,
     archive_bookmarks,
     create_html_snapshots,
+    delete_bookmark,
     delete_bookmarks,
     mark_bookmarks_as_read,
     mark_bookmarks_as_unread,
@@ -34,6 +35,7 @@ from bookmarks.services.bookmarks import (
     unshare_bookmarks,
     untag_bookmarks,
 )
+from bookmarks.services.tags import update_tag_counts_for_bookmarks
 from bookmarks.type_defs import HttpRequest
 from bookmarks.utils import get_safe_return_url
 from bookmarks.views import access, contexts, turbo
@@ -254,7 +256,7 @@ def edit(request: HttpRequest, bookmark_id: int):
 
 def remove(request: HttpRequest, bookmark_id: int | str):
     bookmark = access.bookmark_write(request, bookmark_id)
-    bookmark.delete()
+    delete_bookmark(bookmark)
 
 
 def archive(request: HttpRequest, bookmark_id: int | str):
@@ -271,6 +273,7 @@ def unshare(request: HttpRequest, bookmark_id: int | str):
     bookmark = access.bookmark_write(request, bookmark_id)
     bookmark.shared = False
     bookmark.save()
+    update_tag_counts_for_bookmarks([bookmark.id])
 
 
 def mark_as_read(request: HttpRequest, bookmark_id: int | str):
@@ -307,6 +310,7 @@ def update_state(request: HttpRequest, bookmark_id: int | str):
     bookmark.unread = request.POST.get("unread") == "on"
     bookmark.shared = request.POST.get("shared") == "on"
     bookmark.save()
+    update_tag_counts_for_bookmarks([bookmark.id])
 
 
 @login_required
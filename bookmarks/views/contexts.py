@@ -18,6 +18,8 @@ from bookmarks.models import (
     User,
     UserProfile,
 )
+from bookmarks.pagination import KeysetPaginator
+from bookmarks.services import tag_cloud_cache
 from bookmarks.services.search_query_parser import (
     OrExpression,
     SearchQueryParseError,
@@ -208,8 +210,24 @@ class BookmarkListContext:
 
         query_set = request_context.get_bookmark_query_set(self.search)
         page_number = request.GET.get("page")
-        paginator = Paginator(query_set, user_profile.items_per_page)
-        bookmarks_page = paginator.get_page(page_number)
+        keyset_ordering = (
+            queries.get_keyset_ordering(self.search)
+            if settings.LD_ENABLE_KEYSET_PAGINATION
+            else None
+        )
+        if keyset_ordering:
+            # The page parameter contains a cursor when using keyset pagination
+            paginator = KeysetPaginator(
+                query_set, keyset_ordering, user_profile.items_per_page
+            )
+            bookmarks_page = paginator.get_page(page_number)
+            bookmarks_total = (
+                None if settings.LD_KEYSET_PAGINATION_SKIP_COUNT else paginator.count
+            )
+        else:
+            paginator = Paginator(query_set, user_profile.items_per_page)
+            bookmarks_page = paginator.get_page(page_number)
+            bookmarks_total = paginator.count
         # Prefetch related objects, this avoids n+1 queries when accessing fields in templates
         models.prefetch_related_objects(bookmarks_page.object_list, "owner", "tags")
 
@@ -217,9 +235,12 @@ class BookmarkListContext:
             BookmarkItem(request_context, bookmark, user, user_profile)
             for bookmark in bookmarks_page
         ]
-        self.is_empty = paginator.count == 0
+        if bookmarks_total is not None:
+            self.is_empty = bookmarks_total == 0
+        else:
+            self.is_empty = not self.items and not bookmarks_page.has_previous()
         self.bookmarks_page = bookmarks_page
-        self.bookmarks_total = paginator.count
+        self.bookmarks_total = bookmarks_total
 
         self.return_url = request_context.index()
         self.action_url = request_context.action()
@@ -417,6 +438,34 @@ class TagGroup:
         else:
             raise ValueError(f"{mode} is not a valid tag grouping mode")
 
+    @staticmethod
+    def get_layout(groups: list["TagGroup"]) -> list[tuple[str, bool, list[int]]]:
+        # Describes the groups with plain values, so that they can be cached
+        # independently of the request they were created for
+        return [
+            (
+                group.char,
+                group.highlight_first_char,
+                [item.tag.id for item in group.tags],
+            )
+            for group in groups
+        ]
+
+    @staticmethod
+    def restore_tag_groups(
+        context: RequestContext,
+        layout: list[tuple[str, bool, list[int]]],
+        tags: list[Tag],
+    ):
+        tags_by_id = {tag.id: tag for tag in tags}
+        groups = []
+        for char, highlight_first_char, tag_ids in layout:
+            group = TagGroup(context, char, highlight_first_char)
+            for tag_id in tag_ids:
+                group.add_tag(tags_by_id[tag_id])
+            groups.append(group)
+        return groups
+
     @staticmethod
     def _create_tag_groups_alphabetical(context: RequestContext, tags: set[Tag]):
         # Ensure groups, as well as tags within groups, are ordered alphabetically
@@ -467,19 +516,43 @@ class TagCloudContext:
         self.request = request
         self.search = search
 
-        query_set = request_context.get_tag_query_set(self.search)
-        tags = list(query_set)
-        selected_tags = self.get_selected_tags()
-        unique_tags = utils.unique(tags, key=lambda x: str.lower(x.name))
-        unique_selected_tags = utils.unique(
-            selected_tags, key=lambda x: str.lower(x.name)
+        # Without filters, there are no selected tags, and the tag cloud only
+        # changes when tags or bookmarks change, so it can be cached
+        cache_scope, cache_key = (
+            self.get_cache_key() if not search.has_filters else (None, None)
         )
-        has_selected_tags = len(unique_selected_tags) > 0
-        unselected_tags = set(unique_tags).symmetric_difference(unique_selected_tags)
-        groups = TagGroup.create_tag_groups(
-            request_context, user_profile.tag_grouping, unselected_tags
+        cached, cache_version = (
+            tag_cloud_cache.get(cache_scope, cache_key) if cache_scope else (None, None)
         )
 
+        if cached is not None:
+            unique_tags, group_layout = cached
+            unique_selected_tags = []
+            groups = TagGroup.restore_tag_groups(
+                request_context, group_layout, unique_tags
+            )
+        else:
+            query_set = request_context.get_tag_query_set(self.search)
+            tags = list(query_set)
+            selected_tags = self.get_selected_tags()
+            unique_tags = utils.unique(tags, key=lambda x: str.lower(x.name))
+            unique_selected_tags = utils.unique(
+                selected_tags, key=lambda x: str.lower(x.name)
+            )
+            unselected_tags = set(unique_tags).symmetric_difference(
+                unique_selected_tags
+            )
+            groups = TagGroup.create_tag_groups(
+                request_context, user_profile.tag_grouping, unselected_tags
+            )
+            if cache_scope:
+                group_layout = TagGroup.get_layout(groups)
+                tag_cloud_cache.set(
+                    cache_scope, cache_version, cache_key, (unique_tags, group_layout)
+                )
+
+        has_selected_tags = len(unique_selected_tags) > 0
+
         selected_tag_items = []
         for tag in unique_selected_tags:
             selected_tag_items.append(RemoveTagItem(request_context, tag))
@@ -492,6 +565,9 @@ class TagCloudContext:
     def get_selected_tags(self):
         raise NotImplementedError("Must be implemented by subclass")
 
+    def get_cache_key(self) -> tuple[str | None, str | None]:
+        return None, None
+
     def get_selected_tags_legacy(self, tags: list[Tag]):
         parsed_query = queries.parse_query_string(self.search.q)
         tag_names = parsed_query["tag_names"]
@@ -505,6 +581,10 @@ class TagCloudContext:
 class ActiveTagCloudContext(TagCloudContext):
     request_context = ActiveBookmarksContext
 
+    def get_cache_key(self):
+        scope = tag_cloud_cache.user_scope(self.request.user.id)
+        return scope, f"active:{self.request.user_profile.tag_grouping}"
+
     def get_selected_tags(self):
         return list(
             queries.get_tags_for_query(
@@ -516,6 +596,10 @@ class ActiveTagCloudContext(TagCloudContext):
 class ArchivedTagCloudContext(TagCloudContext):
     request_context = ArchivedBookmarksContext
 
+    def get_cache_key(self):
+        scope = tag_cloud_cache.user_scope(self.request.user.id)
+        return scope, f"archived:{self.request.user_profile.tag_grouping}"
+
     def get_selected_tags(self):
         return list(
             queries.get_tags_for_query(
@@ -527,6 +611,13 @@ class ArchivedTagCloudContext(TagCloudContext):
 class SharedTagCloudContext(TagCloudContext):
     request_context = SharedBookmarksContext
 
+    def get_cache_key(self):
+        public_only = not self.request.user.is_authenticated
+        key = (
+            f"{self.search.user}:{public_only}:{self.request.user_profile.tag_grouping}"
+        )
+        return tag_cloud_cache.SHARED_SCOPE, key
+
     def get_selected_tags(self):
         user = User.objects.filter(username=self.search.user).first()
         public_only = not self.request.user.is_authenticated
@@ -1,11 +1,10 @@
 import logging
-import time
-from functools import lru_cache
 
 import requests
 from django.conf import settings as django_settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
 from django.db.models import prefetch_related_objects
 from django.http import HttpResponse, HttpResponseRedirect
@@ -38,7 +37,7 @@ def general(request: HttpRequest, status=200, context_overrides=None):
     error_message = _find_message_with_tag(
         messages.get_messages(request), "settings_error_message"
     )
-    version_info = get_version_info(get_ttl_hash())
+    version_info = get_version_info()
 
     profile_form = UserProfileForm(instance=request.user_profile)
     global_settings_form = None
@@ -135,9 +134,20 @@ def update_global_settings(request):
     return form
 
 
-# Cache API call response, for one hour when using get_ttl_hash with default params
-@lru_cache(maxsize=1)
-def get_version_info(ttl_hash=None):
+VERSION_INFO_CACHE_KEY = "version_info"
+VERSION_INFO_CACHE_TIMEOUT = 60 * 60
+
+
+# Cache API call response for one hour
+def get_version_info():
+    version_info = cache.get(VERSION_INFO_CACHE_KEY)
+    if version_info is None:
+        version_info = _load_version_info()
+        cache.set(VERSION_INFO_CACHE_KEY, version_info, VERSION_INFO_CACHE_TIMEOUT)
+    return version_info
+
+
+def _load_version_info():
     latest_version = None
     try:
         latest_version_url = (
@@ -159,11 +169,6 @@ def get_version_info(ttl_hash=None):
     return f"{app_version}{latest_version_info}"
 
 
-def get_ttl_hash(seconds=3600):
-    """Return the same value within `seconds` time period"""
-    return round(time.time() / seconds)
-
-
 @login_required
 def integrations(request):
     application_url = request.build_absolute_uri(reverse("linkding:bookmarks.new"))
@@ -2,13 +2,14 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
 from django.db import transaction
-from django.db.models import Count
+from django.db.models import F
 from django.http import HttpResponseRedirect
 from django.shortcuts import get_object_or_404, render
 from django.urls import reverse
 
 from bookmarks.forms import TagForm, TagMergeForm
 from bookmarks.models import Bookmark, Tag
+from bookmarks.services.tags import update_tag_counts
 from bookmarks.type_defs import HttpRequest
 from bookmarks.utils import redirect_with_query
 from bookmarks.views import turbo
@@ -27,7 +28,7 @@ def tags_index(request: HttpRequest):
     sort = request.GET.get("sort", "name-asc")
 
     tags_queryset = Tag.objects.filter(owner=request.user).annotate(
-        bookmark_count=Count("bookmark")
+        bookmark_count=F("active_count") + F("archived_count")
     )
 
     if sort == "name-desc":
@@ -147,6 +148,7 @@ def tag_merge(request: HttpRequest):
                 # Delete the merged tags
                 tag_names = [tag.name for tag in merge_tags]
                 Tag.objects.filter(id__in=merge_tag_ids).delete()
+                update_tag_counts([target_tag.id])
 
                 messages.success(
                     request,
@@ -17,6 +17,8 @@ mkdir -p data/assets
 python manage.py generate_secret_key
 # Run database migration
 python manage.py migrate
+# Create cache table if using the database cache backend
+python manage.py createcachetable
 # Enable WAL journal mode for SQLite databases
 python manage.py enable_wal
 # Create initial superuser if defined in options / environment variables